@@ -0,0 +1,165 @@
+# ============== asyncio solving with cooperative time budgets ===============
+import asyncio
+import math
+import threading
+import time
+
+from solver import ITER_LIMIT, Result, prepare
+
+
+# ========================== Global variables ================================
+global YIELD_EVERY                          # Iterations between awaits
+
+YIELD_EVERY = 100
+
+
+# ============================== Budget =======================================
+class Budget:
+    """
+    Runs the steps of a solve in slices and keeps the best iterate (the one
+    with the smallest |f(xk)|) seen so far
+
+    Arguments:
+
+        steps {generator} - (k, xk, error) tuples (see solver.iterate)
+        deadline {float} - time.monotonic() limit, None for no limit
+    """
+
+    def __init__(self, steps, deadline=None):
+        self.steps = steps
+        self.deadline = deadline
+        self.iterations = 0
+        self.root = None
+        self.error = math.inf
+        self.last = math.inf                # |f(xk)| of the last step
+        self.finished = False
+
+    @property
+    def expired(self):
+        """True when the deadline is over"""
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def advance(self, n):
+        """
+        Runs up to n steps, stopping earlier when the solve ends or the
+        deadline is over
+
+        Arguments:
+
+            n {int} - amount of steps
+
+        Returns:
+
+            finished {bool} - true if the solve ended
+        """
+        for _ in range(n):
+            step = next(self.steps, None)
+            if step is None:
+                self.finished = True
+                break
+
+            self.iterations, xk, error = step
+            self.last = error
+            if self.root is None or error < self.error:
+                self.root, self.error = xk, error
+
+            if self.expired:
+                break
+
+        return self.finished
+
+
+# =========================== Async solvers ===================================
+async def solve_async(f, x0, method='sne_ud_3', tol=1e-12,
+                      max_iter=ITER_LIMIT, derivative='auto', x1=None,
+                      x2=None, timeout=None, deadline=None,
+                      yield_every=YIELD_EVERY, offload=False, executor=None):
+    """
+    Same as solver.solve, but it doesn't block the event loop. By default
+    the iterations run in the loop and control is given back every
+    yield_every iterations; with offload they run in an executor. When the
+    time runs out the best iterate so far is returned (not converged), and
+    cancelling the task stops the iterations
+
+    Arguments:
+
+        f {string} - polynomial whose solution must be found
+        x0 {float, int} - initial value to start iterations
+        method {string, Method} - name of the method (see solver.METHODS)
+        tol {float, int} - tolerance that indicates the stop condition
+        max_iter {int} - limit of iterations
+        derivative {string} - derivative backend (see Differentiable)
+        x1 {float, int} - interval low value (only sne_fd_2)
+        x2 {float, int} - interval high value (only sne_fd_2)
+        timeout {float, int} - time budget in seconds
+        deadline {float} - time.monotonic() limit (the earliest of timeout
+                           and deadline is used)
+        yield_every {int} - iterations between awaits
+        offload {bool} - true to iterate in an executor
+        executor {Executor} - executor of offload (the default executor of
+                              the loop if None)
+
+    Returns:
+
+        result {Result} - best iterate, iterations done, evaluations,
+                          converged flag, error, elapsed time and reason
+                          (like solver.solve, or 'deadline' when the time
+                          ran out)
+    """
+    if (not isinstance(yield_every, int) or yield_every < 1):
+        raise ValueError('yield_every must be a positive int')
+
+    if (timeout is not None):
+        if (not isinstance(timeout, (int, float))):
+            raise ValueError('timeout must be a int or float')
+        limit = time.monotonic() + timeout
+        deadline = limit if deadline is None else min(deadline, limit)
+
+    start = time.perf_counter()
+    method, counter, fx, steps = prepare(f, x0, method, tol, max_iter,
+                                         derivative, x1, x2)
+    budget = Budget(steps, deadline)
+
+    if offload:
+        await _offload(budget, yield_every, executor)
+    else:
+        while not budget.advance(yield_every) and not budget.expired:
+            await asyncio.sleep(0)
+
+    root = x0 if budget.root is None else budget.root
+
+    if budget.error <= tol:
+        reason = 'converged'
+    elif not budget.finished:
+        reason = 'deadline'
+    elif not math.isfinite(budget.last):
+        reason = 'non finite'
+    elif budget.iterations >= max_iter:
+        reason = 'iteration limit'
+    else:
+        reason = 'division by zero'
+
+    return Result(float(root), budget.iterations,
+                  counter.evaluations + fx.derivative_evaluations,
+                  bool(budget.error <= tol), float(budget.error),
+                  time.perf_counter() - start, method.name, None, reason)
+
+
+async def _offload(budget, yield_every, executor):
+    """
+    Iterates in an executor until the solve ends, the deadline is over or
+    the awaiting task is cancelled
+    """
+    cancelled = threading.Event()
+
+    def run():
+        while not (budget.advance(yield_every) or budget.expired or
+                   cancelled.is_set()):
+            pass
+
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(executor, run)
+    except asyncio.CancelledError:
+        cancelled.set()
+        raise
@@ -0,0 +1,283 @@
+# ========= Basins of attraction of the methods over the complex plane =======
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from derivative import Differentiable
+from polynomial import compile_function, roots as polynomial_roots
+from solver import get_method
+
+
+# ========================== Global variables ================================
+global BASIN_ITER                           # Iterations of every start point
+global CHUNK_POINTS                         # Start points per chunk of rows
+global MATCH_TOL                            # Distance of a point to its root
+
+BASIN_ITER = 50
+CHUNK_POINTS = 1 << 16
+MATCH_TOL = 1e-4
+
+Basins = namedtuple('Basins', ['labels', 'iterations', 'roots', 're', 'im',
+                               'method', 'f'])
+Basins.__doc__ = """
+Basins of attraction of a method over a grid of the complex plane
+
+    labels {ndarray} - index in roots of the root reached from every start
+                       point (rows follow im, columns follow re), -1 when
+                       the method did not converge
+    iterations {ndarray} - iterations done from every start point
+    roots {ndarray} - roots reached (complex)
+    re {ndarray} - real parts of the grid
+    im {ndarray} - imaginary parts of the grid
+    method {string} - name of the method
+    f {string} - expression of x
+"""
+
+
+# ============================== Workers ======================================
+def _basin_rows(f, method, derivative, re, im, tol, max_iter):
+    """
+    Runs a method from every point of some rows of the grid with array
+    operations, like batch.sne_batch over complex values. Lanes stop when
+    |f(z)| <= tol or z is no longer finite
+    """
+    method = get_method(method)
+    fx = Differentiable(compile_function(f), derivative)
+
+    z = (re[np.newaxis, :] + 1j * im[:, np.newaxis]).ravel()
+    _iter = np.zeros(z.size, dtype=np.int32)
+
+    with np.errstate(all='ignore'):
+        fz = fx(z) * np.ones(z.size)
+        error = np.abs(fz)
+        active = np.flatnonzero(error > tol)
+        k = 0
+
+        while (active.size > 0 and k < max_iter):
+            z_next = method.advance(fx, z[active], fz[active])
+
+            z[active] = z_next
+            fz[active] = fx(z_next)
+            error[active] = np.abs(fz[active])
+            _iter[active] += 1
+
+            active = active[error[active] > tol]
+            k += 1
+
+    z[~(error <= tol)] = np.nan
+    return z.reshape(im.size, re.size), _iter.reshape(im.size, re.size)
+
+
+# ============================== Basin maps ===================================
+def basin_map(f, method='sne_ud_3', re=(-2.0, 2.0), im=(-2.0, 2.0), size=512,
+              tol=1e-10, max_iter=BASIN_ITER, derivative='auto', roots=None,
+              processes=None):
+    """
+    Runs a method from every point of a grid of the complex plane and
+    records the root reached and the iterations it took. The grid is split
+    in chunks of rows (CHUNK_POINTS points each) that are solved with array
+    operations, in a pool of processes when there are several chunks.
+    Points are matched with the given roots, with the roots of f when it is
+    a polynomial, or with the roots found by the method otherwise
+
+    Arguments:
+
+        f {string} - expression of x
+        method {string, Method} - name of a method without state (see
+                                  solver.METHODS)
+        re {tuple} - (low, high) real limits of the grid
+        im {tuple} - (low, high) imaginary limits of the grid
+        size {int, tuple} - points per side, or (width, height)
+        tol {float, int} - tolerance that indicates the stop condition
+        max_iter {int} - limit of iterations of every point
+        derivative {string} - derivative backend (see Differentiable)
+        roots {iterable} - known roots of f (found if None)
+        processes {int} - amount of worker processes (os.cpu_count() if
+                          None, 0 or 1 runs in this process)
+
+    Returns:
+
+        basins {Basins} - labels, iterations and roots of the grid
+    """
+    if (not isinstance(f, str)):
+        raise ValueError('f must be a string')
+
+    if (not isinstance(tol, (int, float))):
+        raise ValueError('tol must be a int or float')
+
+    width, height = (size, size) if isinstance(size, int) else size
+    if (not isinstance(width, int) or not isinstance(height, int) or
+            width < 1 or height < 1):
+        raise ValueError('size must be a positive int or a pair of them')
+
+    if (processes is None):
+        processes = os.cpu_count() or 1
+
+    if (not isinstance(processes, int) or processes < 0):
+        raise ValueError('processes must be a non negative int')
+
+    method = get_method(method)
+    if (method.init is not None):
+        raise ValueError(method.name + ' needs an interval')
+
+    re = np.linspace(re[0], re[1], width)
+    im = np.linspace(im[0], im[1], height)
+    rows = max(1, CHUNK_POINTS // width)
+    chunks = [im[i:i + rows] for i in range(0, height, rows)]
+    arguments = (f, method.name, derivative, re)
+
+    if processes <= 1 or len(chunks) == 1:
+        results = [_basin_rows(*arguments, chunk, tol, max_iter)
+                   for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(min(processes, len(chunks))) as pool:
+            futures = [pool.submit(_basin_rows, *arguments, chunk, tol,
+                                   max_iter) for chunk in chunks]
+            results = [future.result() for future in futures]
+
+    z = np.concatenate([result[0] for result in results])
+    iterations = np.concatenate([result[1] for result in results])
+
+    if roots is None:
+        try:
+            roots = polynomial_roots(f)
+        except ValueError:
+            roots = _cluster(z[np.isfinite(z)])
+    roots = np.asarray(roots, dtype=complex).ravel()
+
+    return Basins(_match(z, roots), iterations, roots, re, im, method.name, f)
+
+
+def basin_maps(f, methods, path=None, **options):
+    """
+    Basin maps of several methods over the same grid, for comparison
+
+    Arguments:
+
+        f {string} - expression of x
+        methods {iterable} - names of the methods
+        path {string} - .npz file where the maps are saved (None to skip)
+        options {dict} - other arguments of basin_map
+
+    Returns:
+
+        maps {dict} - Basins of every method
+    """
+    maps = {}
+    for method in methods:
+        basins = basin_map(f, method, **options)
+        maps[basins.method] = basins
+        # The roots of the first map are shared, so the labels agree
+        options.setdefault('roots', basins.roots)
+
+    if path is not None:
+        save_basins(path, maps)
+    return maps
+
+
+def _cluster(z):
+    """
+    Distinct points of z, merging the ones closer than MATCH_TOL
+    """
+    _, first = np.unique(np.round(z, int(-np.log10(MATCH_TOL))),
+                         return_index=True)
+    roots = []
+    for candidate in z[first]:
+        if not any(abs(candidate - r) <= MATCH_TOL * max(1, abs(r))
+                   for r in roots):
+            roots.append(candidate)
+    return np.array(roots, dtype=complex)
+
+
+def _match(z, roots):
+    """
+    Index of the closest root of every point, -1 if none is close enough
+    """
+    labels = np.full(z.shape, -1, dtype=np.int32)
+    distance = np.full(z.shape, np.inf)
+
+    with np.errstate(invalid='ignore'):
+        for index, root in enumerate(roots):
+            d = np.abs(z - root)
+            closer = (d < distance) & (d <= MATCH_TOL * max(1, abs(root)))
+            labels[closer] = index
+            distance[closer] = d[closer]
+
+    return labels
+
+
+def basin_statistics(basins):
+    """
+    Measures of the robustness of a method from its basins
+
+    Arguments:
+
+        basins {Basins} - result of basin_map
+
+    Returns:
+
+        statistics {dict} - fraction of converged points, mean iterations of
+                            the converged points and fraction of the grid
+                            that reaches every root
+    """
+    converged = basins.labels >= 0
+    counts = np.bincount(basins.labels[converged], minlength=len(basins.roots))
+
+    return {
+        'method': basins.method,
+        'converged': float(np.mean(converged)),
+        'iterations': (float(np.mean(basins.iterations[converged]))
+                       if np.any(converged) else None),
+        'basins': (counts / basins.labels.size).tolist(),
+    }
+
+
+# ================================ Files ======================================
+def save_basins(path, maps):
+    """
+    Writes basin maps to a compressed .npz file, with the arrays of every
+    method stored as '<method>/<field>'
+
+    Arguments:
+
+        path {string} - .npz file
+        maps {Basins, dict} - a map, or maps by method (see basin_maps)
+
+    Returns:
+
+        This function doesn't return
+    """
+    if isinstance(maps, Basins):
+        maps = {maps.method: maps}
+
+    arrays = {}
+    for method, basins in maps.items():
+        for field, value in basins._asdict().items():
+            arrays[method + '/' + field] = np.asarray(value)
+
+    np.savez_compressed(path, **arrays)
+
+
+def load_basins(path):
+    """
+    Reads the basin maps written by save_basins
+
+    Arguments:
+
+        path {string} - .npz file
+
+    Returns:
+
+        maps {dict} - Basins of every method
+    """
+    fields = {}
+    with np.load(path) as data:
+        for key in data.files:
+            method, field = key.rsplit('/', 1)
+            fields.setdefault(method, {})[field] = data[key]
+
+    return {method: Basins(**dict(values, method=str(values['method']),
+                                  f=str(values['f'])))
+            for method, values in fields.items()}
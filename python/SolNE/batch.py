@@ -0,0 +1,78 @@
+# ================ Batch solving over arrays of initial values ===============
+import numpy as np
+
+from derivative import Differentiable
+from polynomial import compile_function
+from solver import ITER_LIMIT, get_method
+
+
+# ============================== Batch solver =================================
+def sne_batch(f, x0, tol, method='sne_ud_3', x1=None, x2=None,
+              max_iter=ITER_LIMIT, derivative='auto'):
+    """
+    Runs a method for many initial values at once. Every iteration updates
+    all the lanes that have not converged yet with array operations; lanes
+    that reach the tolerance (or a non finite value) stop updating
+
+    Arguments:
+
+        f {string} - polynomial whose solution must be found
+        x0 {float, int, iterable} - initial values to start iterations
+        tol {float, int} - tolerance that indicates the stop condition
+        method {string, Method} - name of the method (see solver.METHODS)
+        x1 {float, iterable} - interval low value (only sne_fd_2)
+        x2 {float, iterable} - interval high value (only sne_fd_2)
+        max_iter {int} - limit of iterations
+        derivative {string} - derivative backend (see Differentiable)
+
+    Returns:
+
+        xAprox {ndarray} - root approximations, with the shape of x0
+        _iter {ndarray} - amount of iterations required by each lane
+        converged {ndarray} - true where |f(xAprox)| <= tol
+    """
+    if (not isinstance(f, str)):
+        raise ValueError('f must be a string')
+
+    if (not isinstance(tol, (int, float))):
+        raise ValueError('tol must be a int or float')
+
+    method = get_method(method)
+    init = method.init
+
+    x0 = np.asarray(x0, dtype=float)
+    xAprox = x0.ravel().copy()
+    _iter = np.zeros(xAprox.size, dtype=int)
+    state = init(xAprox, x1, x2) if init is not None else ()
+
+    fx = Differentiable(compile_function(f), derivative)
+
+    with np.errstate(all='ignore'):
+        fk = np.empty_like(xAprox)
+        fk[:] = fx(xAprox)
+        error = np.abs(fk)
+        active = np.flatnonzero(error > tol)
+        k = 0
+
+        while (active.size > 0 and k < max_iter):
+            if state:
+                result = method.advance(fx, xAprox[active], fk[active],
+                                        *[s[active] for s in state])
+                xk_next = result[0]
+                for s, value in zip(state, result[1:]):
+                    s[active] = value
+            else:
+                xk_next = method.advance(fx, xAprox[active], fk[active])
+
+            xAprox[active] = xk_next
+            fk[active] = fx(xk_next)
+            error[active] = np.abs(fk[active])
+            _iter[active] += 1
+
+            active = active[error[active] > tol]
+            k += 1
+
+    converged = error <= tol
+
+    return (xAprox.reshape(x0.shape), _iter.reshape(x0.shape),
+            converged.reshape(x0.shape))
@@ -0,0 +1,215 @@
+# ========= Benchmark of every method over a standard set of functions =======
+import argparse
+import json
+import math
+import platform
+import sys
+import time
+
+import numpy as np
+
+from solver import METHODS, prepare
+
+
+# ========================== Global variables ================================
+global REPEAT                               # Timed runs of every case
+global TOL                                  # Tolerance of the benchmark
+
+REPEAT = 5
+TOL = 1e-14
+
+# Standard test functions: (name, expression, known root, initial values).
+# Most come from the papers of the methods (Liu, Ren, Jain, Ostrowski)
+FUNCTIONS = [
+    ('cos(2x)^2 - x^2', 'np.cos(2 * x)**2 - x**2', 0.5149332646611294,
+     [0.75, 1.0]),
+    ('x^3 + 4x^2 - 10', 'x**3 + 4*x**2 - 10', 1.3652300134140969,
+     [1.0, 2.0]),
+    ('sin(x)^2 - x^2 + 1', 'np.sin(x)**2 - x**2 + 1', 1.4044916482153412,
+     [1.0, 2.0]),
+    ('x^2 - exp(x) - 3x + 2', 'x**2 - np.exp(x) - 3*x + 2',
+     0.2575302854398608, [0.5, 1.0]),
+    ('cos(x) - x', 'np.cos(x) - x', 0.7390851332151607, [0.5, 1.5]),
+    ('(x - 1)^3 - 1', '(x - 1)**3 - 1', 2.0, [1.8, 2.5]),
+    ('x exp(x^2) - sin(x)^2 + 3cos(x) + 5',
+     'x * np.exp(x**2) - np.sin(x)**2 + 3 * np.cos(x) + 5',
+     -1.2076478271309189, [-1.0, -1.5]),
+]
+
+
+# ============================ Convergence order ==============================
+def convergence_order(x):
+    """
+    Approximated computational order of convergence from the last four
+    iterates: ln(|d(k+1)| / |d(k)|) / ln(|d(k)| / |d(k-1)|), where d(k) is
+    x(k) - x(k-1). Steps at the level of rounding errors are left out
+
+    Arguments:
+
+        x {iterable} - iterates, x0 first
+
+    Returns:
+
+        order {float} - estimated order, None with too few iterates
+    """
+    x = np.asarray(x, dtype=float)
+    d = np.abs(np.diff(x))
+    d = d[d > 1e-14 * np.maximum(np.abs(x[1:]), 1)]
+
+    if d.size < 3 or np.any(d[-3:] == 0) or d[-2] == d[-3]:
+        return None
+
+    order = math.log(d[-1] / d[-2]) / math.log(d[-2] / d[-3])
+    return order if math.isfinite(order) else None
+
+
+# ============================== Benchmark ====================================
+def run_case(f, x0, method, tol=TOL, repeat=REPEAT, root=None):
+    """
+    Solves one case repeat times (after one warm up run, which compiles f
+    and its derivatives) and measures it. The case runs the registered step
+    of the method through solver.prepare, like solver.solve, so the
+    iterates are available for the order. The steps reuse f(xk) from the
+    stop condition like the sne_fd_3..6 loops, so the evaluations match
+    those functions. Validation and plotting of the sne_* functions are
+    not timed, and sne_ud_1, sne_ud_2 and sne_fd_1 are measured in float
+    precision only
+
+    Arguments:
+
+        f {string} - expression of x
+        x0 {float, int} - initial value to start iterations
+        method {string} - name of the method (see solver.METHODS)
+        tol {float, int} - tolerance that indicates the stop condition
+        repeat {int} - timed runs (the best time is reported)
+        root {float} - known root, None if unknown
+
+    Returns:
+
+        case {dict} - time (best, in seconds), iterations, function and
+                      derivative evaluations, converged flag, error |f(x)|,
+                      distance to the known root and convergence order
+    """
+    times = []
+    for _ in range(repeat + 1):
+        start = time.perf_counter()
+        _, counter, fx, steps = prepare(f, x0, method, tol)
+        steps = list(steps)
+        times.append(time.perf_counter() - start)
+
+    # The error of the last step, evaluating f again would be counted
+    x = [xk for _, xk, _ in steps]
+    error = steps[-1][2]
+
+    return {
+        'method': method,
+        'title': METHODS[method].title,
+        'x0': x0,
+        'time': min(times[1:]),
+        'iterations': len(x) - 1,
+        'function_evaluations': counter.evaluations,
+        'derivative_evaluations': fx.derivative_evaluations,
+        'converged': bool(error <= tol),
+        'root': x[-1],
+        'error': error,
+        'root_error': None if root is None else abs(x[-1] - root),
+        'order': convergence_order(x),
+        'theoretical_order': METHODS[method].order,
+    }
+
+
+def run_benchmark(functions=FUNCTIONS, methods=None, tol=TOL,
+                  repeat=REPEAT):
+    """
+    Runs every method over every function and initial value
+
+    Arguments:
+
+        functions {list} - (name, expression, root, initial values) tuples
+        methods {iterable} - names of the methods (all of METHODS if None)
+        tol {float, int} - tolerance that indicates the stop condition
+        repeat {int} - timed runs of every case
+
+    Returns:
+
+        report {dict} - environment of the run and the list of cases
+    """
+    methods = list(METHODS) if methods is None else list(methods)
+    cases = []
+
+    with np.errstate(all='ignore'):
+        for name, f, root, initial in functions:
+            for x0 in initial:
+                for method in methods:
+                    case = run_case(f, x0, method, tol, repeat, root)
+                    case.update(function=name, expression=f)
+                    cases.append(case)
+
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+        },
+        'tol': tol,
+        'repeat': repeat,
+        'cases': cases,
+    }
+
+
+def summary(report):
+    """
+    One line per method with the totals over all the cases
+
+    Arguments:
+
+        report {dict} - result of run_benchmark
+
+    Returns:
+
+        lines {string} - table of the methods
+    """
+    lines = ['{:<10} {:>9} {:>6} {:>7} {:>7} {:>11}'.format(
+        'method', 'converged', 'iter', 'f evals', 'd evals', 'time (ms)')]
+
+    for method in dict.fromkeys(case['method'] for case in report['cases']):
+        cases = [case for case in report['cases'] if case['method'] == method]
+        lines.append('{:<10} {:>5}/{:<3} {:>6} {:>7} {:>7} {:>11.3f}'.format(
+            method, sum(case['converged'] for case in cases), len(cases),
+            sum(case['iterations'] for case in cases),
+            sum(case['function_evaluations'] for case in cases),
+            sum(case['derivative_evaluations'] for case in cases),
+            1e3 * sum(case['time'] for case in cases)))
+
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    """
+    Command line entry point: python benchmark.py [-o report.json] ...
+
+    Returns:
+
+        This function doesn't return
+    """
+    parser = argparse.ArgumentParser(description='Benchmark of SolNE')
+    parser.add_argument('-o', '--output', help='JSON file of the report')
+    parser.add_argument('-m', '--methods', nargs='+', choices=list(METHODS),
+                        help='methods to run (all by default)')
+    parser.add_argument('-r', '--repeat', type=int, default=REPEAT,
+                        help='timed runs of every case')
+    parser.add_argument('-t', '--tol', type=float, default=TOL,
+                        help='tolerance of the solves')
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(methods=args.methods, tol=args.tol,
+                           repeat=args.repeat)
+    print(summary(report))
+
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
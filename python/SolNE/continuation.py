@@ -0,0 +1,147 @@
+# ============ Continuation over a family of parameterised expressions =======
+import numpy as np
+
+from derivative import Differentiable
+from expression import compile_parametric
+from solver import ITER_LIMIT, get_method
+
+
+# ============================== Bound function ===============================
+class Bound:
+    """
+    A compiled f(x, a) with the parameter a fixed, so the step functions see
+    a function of x only. value can be an array aligned with the lanes of x
+
+    Arguments:
+
+        fx {function} - compiled function f(x, a) (see compile_parametric)
+        value {float, ndarray} - value of the parameter
+    """
+
+    def __init__(self, fx, value=0.0):
+        self.fx = fx
+        self.value = value
+
+    def __call__(self, x):
+        return self.fx(x, self.value)
+
+
+# ============================ Continuation ===================================
+def solve_continuation(f, parameter, values, x0, method='sne_ud_3',
+                       tol=1e-12, max_iter=ITER_LIMIT, derivative='dual',
+                       extrapolate=True, chunk=1):
+    """
+    Solves f(x, a) = 0 for every value of the parameter a, in order. f is
+    compiled once, and every solve starts from the root of the previous
+    value, or from the line through the last two roots when extrapolate is
+    true. chunk values are solved at once with array operations (like
+    batch.sne_batch), all seeded from the roots of the previous chunk; with
+    chunk = 1 every value is seeded from the one before it
+
+    Arguments:
+
+        f {string} - expression of x and the parameter
+        parameter {string} - name of the parameter (like 'a')
+        values {iterable} - values of the parameter, in sweep order
+        x0 {float, int} - initial value of the first solve
+        method {string, Method} - name of a method without state (see
+                                  solver.METHODS)
+        tol {float, int} - tolerance that indicates the stop condition
+        max_iter {int} - limit of iterations of every solve
+        derivative {string} - derivative backend: 'dual' or 'finite' (the
+                              parameter is not known to Sympy)
+        extrapolate {bool} - true to extrapolate the seeds linearly
+        chunk {int} - amount of values solved at once
+
+    Returns:
+
+        xAprox {ndarray} - root of every value
+        _iter {ndarray} - amount of iterations of every value
+        converged {ndarray} - true where |f(xAprox, a)| <= tol
+    """
+    if (not isinstance(f, str)):
+        raise ValueError('f must be a string')
+
+    if (not isinstance(x0, (int, float))):
+        raise ValueError('x0 must be a int or float')
+
+    if (not isinstance(tol, (int, float))):
+        raise ValueError('tol must be a int or float')
+
+    if (not isinstance(chunk, int) or chunk < 1):
+        raise ValueError('chunk must be a positive int')
+
+    if (derivative not in ('dual', 'finite')):
+        raise ValueError("derivative must be 'dual' or 'finite'")
+
+    method = get_method(method)
+    if (method.init is not None):
+        raise ValueError(method.name + ' can not be continued')
+
+    values = np.asarray(values, dtype=float).ravel()
+    xAprox = np.full(values.size, float(x0))
+    _iter = np.zeros(values.size, dtype=int)
+    converged = np.zeros(values.size, dtype=bool)
+
+    bound = Bound(compile_parametric(f, parameter))
+    fx = Differentiable(bound, derivative)
+
+    with np.errstate(all='ignore'):
+        for start in range(0, values.size, chunk):
+            lanes = slice(start, min(start + chunk, values.size))
+            seeds = _seeds(values, xAprox, converged, start, x0,
+                           extrapolate, lanes)
+
+            (xAprox[lanes], _iter[lanes],
+             converged[lanes]) = _solve_lanes(fx, bound, method, seeds,
+                                              values[lanes], tol,
+                                              max_iter)
+
+    return xAprox, _iter, converged
+
+
+def _seeds(values, xAprox, converged, start, x0, extrapolate, lanes):
+    """
+    Initial values of a chunk from the converged roots before it
+    """
+    done = np.flatnonzero(converged[:start])
+    if done.size == 0:
+        return np.full(lanes.stop - lanes.start, float(x0))
+
+    p = done[-1]
+    seeds = np.full(lanes.stop - lanes.start, xAprox[p])
+
+    if extrapolate and done.size > 1:
+        q = done[-2]
+        if values[p] != values[q]:
+            slope = (xAprox[p] - xAprox[q]) / (values[p] - values[q])
+            seeds = seeds + slope * (values[lanes] - values[p])
+
+    return seeds
+
+
+def _solve_lanes(fx, bound, method, xAprox, values, tol, max_iter):
+    """
+    Runs a method over lanes that have their own parameter value
+    """
+    _iter = np.zeros(xAprox.size, dtype=int)
+
+    bound.value = values
+    fk = fx(xAprox) * np.ones(xAprox.size)
+    error = np.abs(fk)
+    active = np.flatnonzero(error > tol)
+    k = 0
+
+    while (active.size > 0 and k < max_iter):
+        bound.value = values[active]
+        xk_next = method.advance(fx, xAprox[active], fk[active])
+
+        xAprox[active] = xk_next
+        fk[active] = fx(xk_next)
+        error[active] = np.abs(fk[active])
+        _iter[active] += 1
+
+        active = active[error[active] > tol]
+        k += 1
+
+    return xAprox, _iter, error <= tol
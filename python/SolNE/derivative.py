@@ -0,0 +1,408 @@
+# ============= Derivatives of compiled expressions for the solvers ==========
+import math
+
+import numpy as np
+
+import metrics
+from expression import compile_derivatives, symbolic_expression
+
+
+# ========================== Global variables ================================
+global DX                                   # Step of finite differences
+
+DX = 1e-6
+
+BACKENDS = ('auto', 'symbolic', 'dual', 'finite')
+
+# Central difference weights (order 3 for n = 1, 2 and order 5 for n = 3),
+# indexed by the offset of the point in steps of DX
+FINITE_WEIGHTS = {
+    1: {-1: -0.5, 1: 0.5},
+    2: {-1: 1.0, 0: -2.0, 1: 1.0},
+    3: {-2: -0.5, -1: 1.0, 1: -1.0, 2: 0.5},
+}
+
+
+# ============================ Differentiable ================================
+class Differentiable:
+    """
+    A compiled function f(x) that also knows how to evaluate its derivatives.
+    derivative_evaluations counts the derivatives evaluated by the symbolic
+    and dual backends (finite differences only evaluate f)
+
+    Backends:
+
+        'symbolic' - derivatives derived once with Sympy and lambdified
+        'dual' - forward-mode automatic differentiation (Jet numbers)
+        'finite' - central finite differences with step DX
+        'auto' - 'symbolic' when Sympy understands f, 'finite' otherwise
+
+    Arguments:
+
+        fx {function} - compiled function f(x) (see compile_expression)
+        backend {string} - one of BACKENDS
+    """
+
+    def __init__(self, fx, backend='auto'):
+        if (backend not in BACKENDS):
+            raise ValueError('derivative must be one of ' +
+                             ', '.join(BACKENDS))
+
+        self.fx = fx
+        self.expression = getattr(fx, 'expression', None)
+
+        if backend == 'symbolic' and not self._parses():
+            raise ValueError('f can not be differentiated symbolically')
+
+        self.auto = backend == 'auto'
+        if self.auto:
+            backend = 'symbolic' if self._parses() else 'finite'
+
+        self.backend = backend
+        self.derivative_evaluations = 0
+        self._lambdified = ()
+
+        if metrics.ENABLED:
+            self.derivatives = metrics.derivatives(self.derivatives, self)
+
+    def __call__(self, x):
+        return self.fx(x)
+
+    def derivatives(self, x, n):
+        """
+        Evaluates f and its derivatives up to order n
+
+        Arguments:
+
+            x {float, ndarray} - point(s) where derivatives are evaluated
+            n {int} - highest derivative required (at most 3 for 'finite')
+
+        Returns:
+
+            values {tuple} - f(x), f'(x), ..., f^(n)(x)
+        """
+        if self.backend == 'symbolic':
+            self.derivative_evaluations += n * np.size(x)
+            return self._symbolic(x, n)
+        if self.backend == 'dual':
+            self.derivative_evaluations += n * np.size(x)
+            return self._dual(x, n)
+        return self._finite(x, n)
+
+    def derivative(self, x, n=1):
+        """
+        Evaluates the n-th derivative of f
+
+        Arguments:
+
+            x {float, ndarray} - point(s) where the derivative is evaluated
+            n {int} - order of the derivative
+
+        Returns:
+
+            value {float, ndarray} - f^(n)(x)
+        """
+        if self.backend == 'symbolic' and n > 0:
+            if len(self._lambdified) <= n:
+                return self.derivatives(x, n)[n]
+            self.derivative_evaluations += np.size(x)
+            return self._lambdified[n](x)
+        return self.derivatives(x, n)[n]
+
+    def functions(self, n):
+        """
+        f and its derivatives up to order n as separate functions of x, as
+        expected by the update functions of the Sympy-based methods
+
+        Arguments:
+
+            n {int} - highest derivative required
+
+        Returns:
+
+            functions {tuple} - f, f', ..., f^(n)
+        """
+        return (self,) + tuple(
+            lambda x, k=k: self.derivative(x, k) for k in range(1, n + 1))
+
+    # ------------------------------ Backends --------------------------------
+    def _parses(self):
+        if self.expression is None:
+            return False
+        try:
+            symbolic_expression(self.expression)
+            return True
+        except Exception:
+            return False
+
+    def _symbolic(self, x, n):
+        if len(self._lambdified) <= n:
+            try:
+                self._lambdified = compile_derivatives(self.expression, n)
+            except Exception:
+                if not self.auto:
+                    raise
+                self.backend = 'finite'
+                return self._finite(x, n)
+
+        return (self.fx(x),) + tuple(
+            derivative(x) for derivative in self._lambdified[1:n + 1])
+
+    def _dual(self, x, n):
+        value = self.fx(Jet.variable(x, n))
+
+        if not isinstance(value, Jet):
+            return (value,) + (0 * x,) * n
+        return tuple(value.coefficients[k] * math.factorial(k)
+                     for k in range(n + 1))
+
+    def _finite(self, x, n):
+        if (n > 3):
+            raise ValueError('finite differences support up to n = 3')
+
+        values = {0: self.fx(x)}
+        result = [values[0]]
+
+        for order in range(1, n + 1):
+            total = 0
+            for offset, weight in FINITE_WEIGHTS[order].items():
+                if offset not in values:
+                    values[offset] = self.fx(x + offset * DX)
+                total = total + weight * values[offset]
+            result.append(total / DX**order)
+
+        return tuple(result)
+
+
+# ============================== Jet numbers ==================================
+class Jet:
+    """
+    Truncated Taylor series f(x0 + t) = c0 + c1 t + ... + cn t^n used for
+    forward-mode automatic differentiation. The coefficients can be floats
+    or numpy arrays, and numpy functions (np.cos, np.exp, ...) are supported
+    through __array_ufunc__
+
+    Arguments:
+
+        coefficients {list} - Taylor coefficients c0, ..., cn
+    """
+
+    __array_priority__ = 100
+
+    def __init__(self, coefficients):
+        self.coefficients = list(coefficients)
+
+    @classmethod
+    def variable(cls, x, n):
+        """
+        The jet of the identity function at x, truncated at order n
+        """
+        zero = 0 * np.asarray(np.real(x), dtype=float)
+        return cls([x] + [zero + 1.0] * min(n, 1) + [zero] * (n - 1))
+
+    @property
+    def order(self):
+        return len(self.coefficients) - 1
+
+    def _lift(self, other):
+        if isinstance(other, Jet):
+            return other
+        return Jet([other] + [0] * self.order)
+
+    # ----------------------------- Arithmetic -------------------------------
+    def __add__(self, other):
+        other = self._lift(other)
+        return Jet([a + b for a, b in zip(self.coefficients,
+                                          other.coefficients)])
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return self + (-self._lift(other))
+
+    def __rsub__(self, other):
+        return self._lift(other) - self
+
+    def __neg__(self):
+        return Jet([-a for a in self.coefficients])
+
+    def __pos__(self):
+        return self
+
+    def __mul__(self, other):
+        if not isinstance(other, Jet):
+            return Jet([a * other for a in self.coefficients])
+
+        a, b = self.coefficients, other.coefficients
+        return Jet([sum(a[j] * b[k - j] for j in range(k + 1))
+                    for k in range(self.order + 1)])
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        if not isinstance(other, Jet):
+            return Jet([a / other for a in self.coefficients])
+
+        a, b = self.coefficients, other.coefficients
+        q = []
+        for k in range(self.order + 1):
+            q.append((a[k] - sum(b[j] * q[k - j]
+                                 for j in range(1, k + 1))) / b[0])
+        return Jet(q)
+
+    def __rtruediv__(self, other):
+        return self._lift(other) / self
+
+    def __pow__(self, other):
+        if isinstance(other, Jet):
+            return exp(other * log(self))
+
+        if np.ndim(other) == 0 and float(other).is_integer() and other >= 0:
+            result = self._lift(1)
+            for _ in range(int(other)):
+                result = result * self
+            return result
+
+        return _power(self, self.coefficients[0]**other, other)
+
+    def __rpow__(self, other):
+        return exp(self * np.log(other))
+
+    def __abs__(self):
+        return self * np.sign(self.coefficients[0])
+
+    # ------------------------- Numpy functions ------------------------------
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        if method != '__call__' or ufunc not in UFUNCS:
+            return NotImplemented
+
+        # Constant exponents keep the cheaper (and sign safe) power rule
+        if ufunc is np.power and not isinstance(inputs[1], Jet):
+            return inputs[0] ** inputs[1]
+
+        return UFUNCS[ufunc](*[self._lift(value) for value in inputs])
+
+
+def _integrate(a, value, derivative):
+    """
+    Jet of g(a) given g(a0) and the jet of g'(a), using g(a)' = g'(a) a'
+    """
+    a = a.coefficients
+    h = derivative.coefficients
+    g = [value]
+    for k in range(1, len(a)):
+        g.append(sum(j * a[j] * h[k - j] for j in range(1, k + 1)) / k)
+    return Jet(g)
+
+
+def _power(a, value, exponent):
+    """
+    Jet of a**exponent for a constant exponent, given a0**exponent
+    """
+    a = a.coefficients
+    p = [value]
+    for k in range(1, len(a)):
+        p.append(sum(((exponent + 1) * j - k) * a[j] * p[k - j]
+                     for j in range(1, k + 1)) / (k * a[0]))
+    return Jet(p)
+
+
+def _truncated(a):
+    return Jet(a.coefficients[:-1]) if a.order > 0 else a
+
+
+def exp(a):
+    a_ = a.coefficients
+    e = [np.exp(a_[0])]
+    for k in range(1, a.order + 1):
+        e.append(sum(j * a_[j] * e[k - j] for j in range(1, k + 1)) / k)
+    return Jet(e)
+
+
+def log(a):
+    return _integrate(a, np.log(a.coefficients[0]), 1 / _truncated(a))
+
+
+def sin_cos(a):
+    a_ = a.coefficients
+    s, c = [np.sin(a_[0])], [np.cos(a_[0])]
+    for k in range(1, a.order + 1):
+        s.append(sum(j * a_[j] * c[k - j] for j in range(1, k + 1)) / k)
+        c.append(-sum(j * a_[j] * s[k - j] for j in range(1, k + 1)) / k)
+    return Jet(s), Jet(c)
+
+
+def _arcsin(a):
+    b = _truncated(a)
+    return _integrate(a, np.arcsin(a.coefficients[0]), (1 - b * b)**-0.5)
+
+
+def _arccos(a):
+    b = _truncated(a)
+    return _integrate(a, np.arccos(a.coefficients[0]), -(1 - b * b)**-0.5)
+
+
+def _arctan(a):
+    b = _truncated(a)
+    return _integrate(a, np.arctan(a.coefficients[0]), 1 / (1 + b * b))
+
+
+def _arcsinh(a):
+    b = _truncated(a)
+    return _integrate(a, np.arcsinh(a.coefficients[0]), (1 + b * b)**-0.5)
+
+
+def _arccosh(a):
+    b = _truncated(a)
+    return _integrate(a, np.arccosh(a.coefficients[0]), (b * b - 1)**-0.5)
+
+
+def _arctanh(a):
+    b = _truncated(a)
+    return _integrate(a, np.arctanh(a.coefficients[0]), 1 / (1 - b * b))
+
+
+def _sign(a):
+    # Constant wherever it is differentiable
+    return a._lift(np.sign(a.coefficients[0]))
+
+
+def _tan(a):
+    s, c = sin_cos(a)
+    return s / c
+
+
+def _tanh(a):
+    return (exp(a) - exp(-a)) / (exp(a) + exp(-a))
+
+
+# Numpy functions that can receive Jet numbers
+UFUNCS = {
+    np.add: lambda a, b: a + b,
+    np.subtract: lambda a, b: a - b,
+    np.multiply: lambda a, b: a * b,
+    np.true_divide: lambda a, b: a / b,
+    np.power: lambda a, b: a ** b,
+    np.negative: lambda a: -a,
+    np.positive: lambda a: a,
+    np.absolute: abs,
+    np.square: lambda a: a * a,
+    np.sqrt: lambda a: a ** 0.5,
+    np.cbrt: lambda a: _power(a, np.cbrt(a.coefficients[0]), 1 / 3),
+    np.sign: _sign,
+    np.exp: exp,
+    np.log: log,
+    np.log10: lambda a: log(a) / np.log(10),
+    np.sin: lambda a: sin_cos(a)[0],
+    np.cos: lambda a: sin_cos(a)[1],
+    np.tan: _tan,
+    np.arcsin: _arcsin,
+    np.arccos: _arccos,
+    np.arctan: _arctan,
+    np.sinh: lambda a: (exp(a) - exp(-a)) / 2,
+    np.cosh: lambda a: (exp(a) + exp(-a)) / 2,
+    np.tanh: _tanh,
+    np.arcsinh: _arcsinh,
+    np.arccosh: _arccosh,
+    np.arctanh: _arctanh,
+}
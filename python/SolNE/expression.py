@@ -0,0 +1,522 @@
+# ============ Compiled expressions shared by every SolNE solver =============
+import ast
+import io
+import tokenize
+from functools import lru_cache
+
+import numpy as np
+
+import metrics
+
+
+# ========================== Global variables ================================
+global CACHE_SIZE                           # Amount of cached expressions
+
+CACHE_SIZE = 512
+
+# Functions of the expressions (with or without the 'np.' prefix), by the
+# names of their numpy, Sympy and mpmath versions and their arguments
+FUNCTIONS = {
+    'sin': ('sin', 'sin', 'sin', 1),
+    'cos': ('cos', 'cos', 'cos', 1),
+    'tan': ('tan', 'tan', 'tan', 1),
+    'asin': ('arcsin', 'asin', 'asin', 1),
+    'acos': ('arccos', 'acos', 'acos', 1),
+    'atan': ('arctan', 'atan', 'atan', 1),
+    'arcsin': ('arcsin', 'asin', 'asin', 1),
+    'arccos': ('arccos', 'acos', 'acos', 1),
+    'arctan': ('arctan', 'atan', 'atan', 1),
+    'sinh': ('sinh', 'sinh', 'sinh', 1),
+    'cosh': ('cosh', 'cosh', 'cosh', 1),
+    'tanh': ('tanh', 'tanh', 'tanh', 1),
+    'arcsinh': ('arcsinh', 'asinh', 'asinh', 1),
+    'arccosh': ('arccosh', 'acosh', 'acosh', 1),
+    'arctanh': ('arctanh', 'atanh', 'atanh', 1),
+    'exp': ('exp', 'exp', 'exp', 1),
+    'log': ('log', 'log', 'log', 1),
+    'ln': ('log', 'log', 'log', 1),
+    'log10': ('log10', None, 'log10', 1),
+    'sqrt': ('sqrt', 'sqrt', 'sqrt', 1),
+    'cbrt': ('cbrt', 'cbrt', 'cbrt', 1),
+    'abs': ('abs', 'Abs', 'fabs', 1),
+    'absolute': ('abs', 'Abs', 'fabs', 1),
+    'sign': ('sign', 'sign', 'sign', 1),
+    'power': ('power', 'Pow', 'power', 2),
+}
+
+# Names of the constants of the expressions
+CONSTANTS = ('pi', 'e')
+
+# Builtins of the compiled expressions. The trees never name them, but
+# numpy imports modules from the caller's frame when it raises some errors
+EVALUATOR_BUILTINS = {'__import__': __import__}
+
+# Names available to numeric expressions besides the ``np`` prefix
+NUMERIC_NAMESPACE = dict(
+    {'np': np, 'numpy': np, 'pi': np.pi, 'e': np.e},
+    **{name: getattr(np, names[0]) for name, names in FUNCTIONS.items()})
+
+
+# ============================ Normalization ==================================
+def normalize(f):
+    """
+    Gives an expression a canonical spacing so that strings which only differ
+    in whitespace share the same cache entry. '^' is read as a power, like
+    Sympy does, so 'cos(2*x)^2-x^2' is 'cos(2*x)**2-x**2'
+
+    Arguments:
+
+        f {string} - expression to normalize
+
+    Returns:
+
+        key {string} - normalized expression
+    """
+    ignored = (tokenize.NEWLINE, tokenize.NL, tokenize.ENDMARKER,
+               tokenize.INDENT, tokenize.DEDENT)
+
+    try:
+        tokens = tokenize.generate_tokens(io.StringIO(f.strip()).readline)
+        return tokenize.untokenize(
+            (token.type, '**' if token.string == '^' else token.string)
+            for token in tokens if token.type not in ignored).strip()
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        return f.strip()
+
+
+# ============================== Front-end ====================================
+def parse(f, names=('x',)):
+    """
+    Parses an expression into a validated syntax tree. Only numbers, the
+    given names, CONSTANTS, calls to FUNCTIONS (with or without 'np.') and
+    the arithmetic operators are accepted, so the evaluators compiled from
+    the tree never run arbitrary code. The tree is cached and shared: it
+    must not be modified
+
+    Arguments:
+
+        f {string} - expression of the names
+        names {tuple} - names of the variables
+
+    Returns:
+
+        tree {Expression} - validated tree, without 'np.' prefixes
+    """
+    if (not isinstance(f, str)):
+        raise ValueError('f must be a string')
+    return _parse(normalize(f), tuple(names))
+
+
+def canonical(f, names=('x',)):
+    """
+    Canonical source of an expression: the validated tree written back, so
+    equivalent spellings ('cos(2*x)^2-x^2' and 'np.cos(2 * x)**2 - x**2')
+    give the same string
+
+    Arguments:
+
+        f {string} - expression of the names
+        names {tuple} - names of the variables
+
+    Returns:
+
+        source {string} - canonical expression
+    """
+    return ast.unparse(parse(f, names))
+
+
+class _Validator(ast.NodeTransformer):
+    """
+    Copies a tree, rejecting everything outside of the whitelist
+    """
+
+    OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.USub,
+                 ast.UAdd)
+
+    def __init__(self, names):
+        self.names = names
+
+    def visit(self, node):
+        visitor = getattr(self, 'visit_' + type(node).__name__, None)
+        if visitor is None:
+            raise ValueError('f has an unsupported expression. ' +
+                             type(node).__name__ + ' is not allowed')
+        return visitor(node)
+
+    def visit_Expression(self, node):
+        return ast.Expression(self.visit(node.body))
+
+    def visit_BinOp(self, node):
+        return ast.BinOp(self.visit(node.left), self._operator(node.op),
+                         self.visit(node.right))
+
+    def visit_UnaryOp(self, node):
+        return ast.UnaryOp(self._operator(node.op), self.visit(node.operand))
+
+    def visit_Constant(self, node):
+        if (isinstance(node.value, bool) or
+                not isinstance(node.value, (int, float, complex))):
+            raise ValueError('f has an unsupported expression. ' +
+                             repr(node.value) + ' is not a number')
+        return ast.Constant(node.value)
+
+    def visit_Name(self, node):
+        if node.id in self.names or node.id in CONSTANTS:
+            return ast.Name(node.id, ast.Load())
+        raise ValueError("f has an unknown symbol. Name '" + node.id +
+                         "' is not defined")
+
+    def visit_Attribute(self, node):
+        # np.pi and np.e
+        if self._prefixed(node) and node.attr in CONSTANTS:
+            return ast.Name(node.attr, ast.Load())
+        raise ValueError("f has an unknown symbol. '" + ast.unparse(node) +
+                         "' is not defined")
+
+    def visit_Call(self, node):
+        func = node.func
+        if isinstance(func, ast.Attribute) and self._prefixed(func):
+            name = func.attr
+        elif isinstance(func, ast.Name) and func.id not in self.names:
+            name = func.id
+        else:
+            name = None
+
+        if name not in FUNCTIONS:
+            raise ValueError("f has an unknown function. '" +
+                             ast.unparse(func) + "' is not supported")
+        if node.keywords:
+            raise ValueError('f has an unsupported expression. ' + name +
+                             ' takes no keywords')
+        if len(node.args) != FUNCTIONS[name][3]:
+            raise ValueError('f has an unsupported expression. {} takes {} '
+                             'argument(s)'.format(name, FUNCTIONS[name][3]))
+
+        return ast.Call(ast.Name(name, ast.Load()),
+                        [self.visit(arg) for arg in node.args], [])
+
+    def _operator(self, op):
+        if not isinstance(op, self.OPERATORS):
+            raise ValueError('f has an unsupported operator. ' +
+                             type(op).__name__ + ' is not allowed')
+        return op
+
+    def _prefixed(self, node):
+        return (isinstance(node.value, ast.Name) and
+                node.value.id in ('np', 'numpy') and
+                node.value.id not in self.names)
+
+
+class _Numbers(ast.NodeTransformer):
+    """
+    Wraps the numbers of a tree in _number('literal') calls, so the Sympy
+    and mpmath evaluators get exact numbers instead of floats
+    """
+
+    def visit_Constant(self, node):
+        return ast.Call(ast.Name('_number', ast.Load()),
+                        [ast.Constant(repr(node.value))], [])
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse(key, names):
+    try:
+        tree = ast.parse(key, mode='eval')
+    except SyntaxError as e:
+        raise ValueError('f is not a valid expression. ' +
+                         str(e.msg).capitalize())
+
+    return _Validator(names).visit(tree)
+
+
+def _evaluator(key, names, namespace, numbers=False):
+    """
+    Compiles the validated tree of an expression into a function of the
+    names, with the functions and constants taken from namespace
+    """
+    tree = _parse(key, names)
+    body = tree.body
+    if numbers:
+        body = _Numbers().visit(ast.parse(ast.unparse(tree), mode='eval'))
+
+    source = 'lambda {}: ({})'.format(', '.join(names), ast.unparse(body))
+    return eval(compile(source, '<SolNE: ' + key + '>', 'eval'),
+                dict(namespace, __builtins__=EVALUATOR_BUILTINS))
+
+
+# ========================== Compiled functions ===============================
+def compile_expression(f):
+    """
+    Transforms an expression (like 'np.cos(2 * x)**2 - x**2' or
+    'cos(2*x)^2-x^2') into a vectorized numpy callable of x. The expression
+    is parsed and compiled only the first time it is seen, later calls take
+    it from a bounded LRU cache
+
+    Arguments:
+
+        f {string} - expression of x
+
+    Returns:
+
+        fx {function} - compiled function f(x)
+    """
+    with metrics.phase('compile'):
+        fx = _compile_numeric(normalize(f))
+    return metrics.Evaluated(fx) if metrics.ENABLED else fx
+
+
+def compile_parametric(f, parameter):
+    """
+    Same as compile_expression, for expressions of x and a parameter (like
+    'np.cos(a * x)**2 - x**2'). The callable takes the parameter as its
+    second argument, so a family of expressions is compiled only once
+
+    Arguments:
+
+        f {string} - expression of x and the parameter
+        parameter {string} - name of the parameter
+
+    Returns:
+
+        fx {function} - compiled function f(x, parameter)
+    """
+    if (not isinstance(parameter, str) or not parameter.isidentifier() or
+            parameter == 'x' or parameter in NUMERIC_NAMESPACE):
+        raise ValueError('parameter must be a name other than x')
+    return _compile_parametric(normalize(f), parameter)
+
+
+def compile_mpmath(f):
+    """
+    Transforms an expression into a callable of x with mpmath arithmetic.
+    Its numbers are read from their literals at the working precision
+    (0.1 is mpf('0.1'), not the float 0.1)
+
+    Arguments:
+
+        f {string} - expression of x
+
+    Returns:
+
+        fx {function} - compiled function f(x) of mpf values
+    """
+    return _compile_mpmath(normalize(f))
+
+
+def symbolic_expression(f):
+    """
+    Transforms an expression (like 'cos(2*x)^2-x^2') into a Sympy expression.
+    Numeric expressions are accepted too: the 'np.' functions are replaced
+    by their Sympy equivalents. The result is cached the same way as
+    compile_expression
+
+    Arguments:
+
+        f {string} - expression of x
+
+    Returns:
+
+        funct {Expr} - Sympy expression
+    """
+    with metrics.phase('parse'):
+        return _compile_symbolic(normalize(f))
+
+
+def symbolic_derivative(f, n):
+    """
+    n-th derivative of an expression. Every derivative is computed once and
+    cached, the (n+1)-th one is derived from the cached n-th one
+
+    Arguments:
+
+        f {string} - expression of x
+        n {int} - order of the derivative
+
+    Returns:
+
+        fDiff {Expr} - Sympy expression of the derivative
+    """
+    return _differentiate(normalize(f), n)
+
+
+def compile_derivatives(f, order, modules='numpy'):
+    """
+    Lambdifies an expression and its derivatives up to the given order, so
+    evaluating them costs a few float (or mpmath) operations instead of
+    Sympy substitutions
+
+    Arguments:
+
+        f {string} - expression of x
+        order {int} - highest derivative required
+        modules {string} - lambdify backend ('numpy', 'mpmath', 'math')
+
+    Returns:
+
+        derivatives {tuple} - functions f, f', ..., f^(order) of x
+    """
+    with metrics.phase('differentiate'):
+        return _compile_derivatives(normalize(f), order, modules)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _compile_numeric(key):
+    fx = _evaluator(key, ('x',), NUMERIC_NAMESPACE)
+    fx.expression = key
+    return fx
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _compile_parametric(key, parameter):
+    fx = _evaluator(key, ('x', parameter), NUMERIC_NAMESPACE)
+    fx.expression = key
+    fx.parameter = parameter
+    return fx
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _compile_mpmath(key):
+    import mpmath
+
+    def number(literal):
+        value = complex(literal) if literal.endswith('j') else literal
+        return mpmath.mpmathify(value)
+
+    namespace = {name: getattr(mpmath, names[2])
+                 for name, names in FUNCTIONS.items()}
+    namespace.update(pi=mpmath.pi, e=mpmath.e, _number=number)
+
+    fx = _evaluator(key, ('x',), namespace, numbers=True)
+    fx.expression = key
+    return fx
+
+
+@lru_cache(maxsize=None)
+def symbolic_namespace():
+    """
+    Names of the symbolic expressions: the real symbol x, the constants and
+    the Sympy equivalents of FUNCTIONS. Sympy is only imported the first
+    time a symbolic path needs it
+
+    Returns:
+
+        namespace {dict} - names of the Sympy evaluators
+    """
+    import sympy
+
+    namespace = {name: getattr(sympy, names[1])
+                 for name, names in FUNCTIONS.items() if names[1]}
+    namespace.update(
+        log10=lambda a: sympy.log(a, 10),
+        x=sympy.symbols('x', real=True),
+        pi=sympy.pi,
+        e=sympy.E,
+        _number=sympy.sympify,              # Only applied to number literals
+    )
+    return namespace
+
+
+def symbolic_function(f, names):
+    """
+    Sympy expression of an expression of several real variables
+
+    Arguments:
+
+        f {string} - expression of the names
+        names {tuple} - names of the variables
+
+    Returns:
+
+        funct {Expr} - Sympy expression
+    """
+    return _compile_symbolic(normalize(f), tuple(names))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _compile_symbolic(key, names=('x',)):
+    import sympy
+
+    namespace = symbolic_namespace()
+    symbols = [namespace['x'] if name == 'x' else
+               sympy.Symbol(name, real=True) for name in names]
+    return _evaluator(key, names, namespace, numbers=True)(*symbols)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _differentiate(key, n):
+    if n == 0:
+        return _compile_symbolic(key)
+
+    import sympy
+    # Derivatives of abs/sign are evaluated point-wise: DiracDelta is zero
+    return sympy.diff(_differentiate(key, n - 1),
+                      symbolic_namespace()['x']).replace(
+        sympy.DiracDelta, lambda *args: sympy.S.Zero)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _compile_derivatives(key, order, modules):
+    import sympy
+    return tuple(sympy.lambdify(symbolic_namespace()['x'],
+                                _differentiate(key, n), modules)
+                 for n in range(order + 1))
+
+
+# ============================= Statistics ====================================
+def cache_info():
+    """
+    Hits, misses and sizes of the expression caches
+
+    Returns:
+
+        info {dict} - lru_cache statistics of the 'parsed', 'numeric',
+                      'parametric', 'mpmath', 'symbolic', 'derivatives' and
+                      'lambdified' caches
+    """
+    return {
+        'parsed': _parse.cache_info(),
+        'numeric': _compile_numeric.cache_info(),
+        'parametric': _compile_parametric.cache_info(),
+        'mpmath': _compile_mpmath.cache_info(),
+        'symbolic': _compile_symbolic.cache_info(),
+        'derivatives': _differentiate.cache_info(),
+        'lambdified': _compile_derivatives.cache_info(),
+    }
+
+
+def cache_clear():
+    """
+    Empties the expression caches and resets their statistics
+
+    Returns:
+
+        This function doesn't return
+    """
+    _parse.cache_clear()
+    _compile_numeric.cache_clear()
+    _compile_parametric.cache_clear()
+    _compile_mpmath.cache_clear()
+    _compile_symbolic.cache_clear()
+    _differentiate.cache_clear()
+    _compile_derivatives.cache_clear()
+
+
+# ============================ Evaluation counter =============================
+class EvaluationCounter:
+    """
+    Wraps a compiled function and counts how many times f is evaluated. An
+    array argument counts one evaluation per element
+
+    Arguments:
+
+        fx {function} - compiled function f(x)
+    """
+
+    def __init__(self, fx):
+        self.fx = fx
+        self.expression = getattr(fx, 'expression', None)
+        self.evaluations = 0
+
+    def __call__(self, x):
+        self.evaluations += np.size(x)
+        return self.fx(x)
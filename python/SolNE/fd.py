@@ -1,22 +1,42 @@
 # =========== Important: ¡must install Sympy! (pip install sympy) ============
-import matplotlib.pyplot as plt
-import numpy as np
-from scipy import misc
-from sympy import *
+
+from expression import EvaluationCounter, symbolic_expression
+from history import History
+from metrics import instrumented
+from plot import Trace, plot_convergence
+from polynomial import compile_function
+from precision import solve_precision
 
 
 # ========================== Global variables ================================
-global x                                    # x (is a global symbol)
 global ITER_LIMIT                           # Limit of iterations
 global DECIMAL_PRECISION                    # Amount of decimal values
 
-x = symbols('x')
 ITER_LIMIT = 10000
 DECIMAL_PRECISION = 50
 
 
+def __getattr__(name):
+    """
+    Sympy (and the global symbol x) used to be star imported here; it is now
+    only imported the first time one of its names is requested, so the
+    numeric methods don't pay for it
+    """
+    if name.startswith('__'):
+        raise AttributeError(name)
+
+    import sympy
+    if name == 'x':
+        return sympy.symbols('x')
+    if hasattr(sympy, name):
+        return getattr(sympy, name)
+    raise AttributeError(
+        'module {!r} has no attribute {!r}'.format(__name__, name))
+
+
 # ============================== Method 1 ====================================
-def sne_fd_1(f, x0, tol, graf):
+@instrumented
+def sne_fd_1(f, x0, tol, graf, precision='float'):
     """Steffensen's Method
 
     Arguments:
@@ -24,50 +44,43 @@ def sne_fd_1(f, x0, tol, graf):
         x0 {float, int} -- initial value to start iterations
         tol {float, int} -- tolerance that indicates the stop condition
         graf {int} -- flag that indicates if a graf must be done
+        precision {string, int} -- 'float' (float64), 'auto' (float64
+            polished with DECIMAL_PRECISION digits) or an amount of digits
 
     Returns:
-        xAprox {float} -- root approximation
+        xAprox {float, Float} -- root approximation
         _iter {int} -- amount of iterations required
     """
 
     # -------------------------- Validations ---------------------------------
     if (validator(f, x0, tol) != True):
         return x0, 0
-    # ------------------------ Local variables -------------------------------
-    funct = sympify(f)                      # Transforms string to function
-    _iter = 0                               # Amount of iterations
-    xAprox = sympify(x0)                   # xApprox is a Sympy variable
-    xNext = sympify(0)                      # xNext (x_(n+1))
-    error = abs(funct.subs(x, xAprox))          # calculates the error of x0
+    # -------------------- Steffensen's Method -------------------------------
+    return solve_precision(steffensen_update, f, x0, tol, 0, precision,
+                           ITER_LIMIT, DECIMAL_PRECISION)
 
-    try:
-        # -------------------- Steffensen's Method ---------------------------
-        while (error > tol):
-            if(_iter >= ITER_LIMIT):
-                print("WARNING: Iteration limit reached")
-                return N(xAprox, DECIMAL_PRECISION), _iter
-            div = funct.subs(x, xAprox + funct.subs(x, xAprox)) - \
-                funct.subs(x, xAprox)
-            if (div != 0):
-                xNext = xAprox - (funct.subs(x, xAprox) *
-                                  funct.subs(x, xAprox)) / div
-            else:
-                print("WARNING: [Math error] Division by zero")
-                return N(xAprox, DECIMAL_PRECISION), _iter
-            xAprox = N(xNext, DECIMAL_PRECISION)
-            error = abs(funct.subs(x, xAprox))
-            _iter += 1                      # New iteration
 
-    except Exception as exception:
-        print("WARNING: [Math error]", type(
-            exception).__name__, "-", str(exception))
+def steffensen_update(functions, xAprox):
+    """
+    One iteration of Steffensen's Method
+
+    Arguments:
+        functions {tuple} -- lambdified f
+        xAprox {float, mpf} -- current iterate
+
+    Returns:
+        xNext {float, mpf} -- next iterate
+    """
+    funct, = functions
+    fx = funct(xAprox)
 
-    return N(xAprox, DECIMAL_PRECISION), _iter
+    return xAprox - (fx * fx) / (funct(xAprox + fx) - fx)
 
 # ============================== Method 2 ====================================
 
 
-def sne_fd_2(f, x0, x1, x2, tol, graf=1):
+@instrumented
+def sne_fd_2(f, x0, x1, x2, tol, graf=1, evals=0):
     """
     Yun-Petkovic Method
 
@@ -81,11 +94,14 @@ def sne_fd_2(f, x0, x1, x2, tol, graf=1):
         x2 {float, int} - interval high value
         tol {float, int} - tolerance that indicates the stop condition
         graf {int} - flag that indicates if a plot must be done
+        evals {int} - flag that indicates if the amount of evaluations of f
+                      must be returned
 
     Returns:
 
         xAprox {float} - root approximation
         _iter {int} - amount of iterations required
+        evaluations {int} - amount of evaluations of f (only if evals is 1)
     """
     if (not isinstance(f, str)):
         raise ValueError('f must be a string')
@@ -99,45 +115,72 @@ def sne_fd_2(f, x0, x1, x2, tol, graf=1):
     if (graf != 0 and graf != 1):
         raise ValueError('graf must be 0 or 1')
 
-    xAprox = np.array([0, x0])
+    if (evals != 0 and evals != 1):
+        raise ValueError('evals must be 0 or 1')
+
+    xAprox = x0
     _iter = 0
 
     try:
-        fx = lambda x: eval(f)
-        error = np.array([abs(fx(xAprox[-1]))])
+        fx = compile_function(f)
+        if evals == 1:
+            fx = EvaluationCounter(fx)
+        error = abs(fx(xAprox))
+        history = History(xAprox, error, graf == 1)
 
         hk = 1
         ak = x1
         bk = x2
 
-        while (abs(fx(xAprox[-1])) > tol):
-            xk = xAprox[-1]
-
-            xk_next = xk - fx(xk)*(2 * hk / (fx(bk) - fx(ak)))
-
-            xAprox = np.append(xAprox, xk_next)
-            error = np.append(error, abs(fx(xk_next)))
-
-            hk = xk_next - xk
-            ak = xk_next - hk
-            bk = xk_next + hk
+        while (error > tol):
+            xAprox, hk, ak, bk = yun_petkovic_step(fx, xAprox, hk, ak, bk)
+            error = abs(fx(xAprox))
 
+            history.append(xAprox, error)
             _iter += 1
 
         if graf == 1:
-            k = np.linspace(0, _iter, _iter + 1)
-            plotFunction(k, error, 'Yun-Petkovic Method')
+            plot_convergence(Trace('Yun-Petkovic Method', history.x,
+                                   history.error), image=False)
 
-        return xAprox[-1], _iter
+        if evals == 1:
+            return xAprox, _iter, fx.evaluations
+        return xAprox, _iter
     except AttributeError as e:
         raise ValueError('f has an unknown function. ' + str(e).capitalize())
     except TypeError as e:
         raise ValueError('f has an unknown symbol. ' + str(e).capitalize())
 
+
+def yun_petkovic_step(fx, xk, hk, ak, bk):
+    """
+    One iteration of Yun-Petkovic Method. All the arguments can be floats or
+    numpy arrays of iterates, which are updated element-wise
+
+    Arguments:
+
+        fx {function} - compiled function f(x)
+        xk {float, ndarray} - current iterate
+        hk {float, ndarray} - half width of the current interval
+        ak {float, ndarray} - current interval low value
+        bk {float, ndarray} - current interval high value
+
+    Returns:
+
+        xk_next {float, ndarray} - next iterate
+        hk, ak, bk {float, ndarray} - interval for the next iteration
+    """
+    xk_next = xk - fx(xk)*(2 * hk / (fx(bk) - fx(ak)))
+
+    hk = xk_next - xk
+
+    return xk_next, hk, xk_next - hk, xk_next + hk
+
 # ============================== Method 3 ====================================
 
 
-def sne_fd_3(f, x0, tol, graf=1):
+@instrumented
+def sne_fd_3(f, x0, tol, graf=1, evals=0):
     """
     Jain Method
 
@@ -149,11 +192,14 @@ def sne_fd_3(f, x0, tol, graf=1):
         x0 {float, int} - initial value to start iterations
         tol {float, int} - tolerance that indicates the stop condition
         graf {int} - flag that indicates if a plot must be done
+        evals {int} - flag that indicates if the amount of evaluations of f
+                      must be returned
 
     Returns:
 
         xAprox {float} - root approximation
         _iter {int} - amount of iterations required
+        evaluations {int} - amount of evaluations of f (only if evals is 1)
     """
     if (not isinstance(f, str)):
         raise ValueError('f must be a string')
@@ -167,40 +213,68 @@ def sne_fd_3(f, x0, tol, graf=1):
     if (graf != 0 and graf != 1):
         raise ValueError('graf must be 0 or 1')
 
-    xAprox = np.array([x0])
+    if (evals != 0 and evals != 1):
+        raise ValueError('evals must be 0 or 1')
+
+    xAprox = x0
     _iter = 0
 
     try:
-        fx = lambda x: eval(f)
-        error = np.array([abs(fx(xAprox[-1]))])
-
-        while (abs(fx(xAprox[-1])) > tol):
-            xk = xAprox[-1]
-
-            y = fx(xk)
-            yk = steffensen_method(f, x0, _iter)
-
-            xk_next = xk - y**3 / ((fx(xk + y) - y) * (y - fx(yk)))
+        fx = compile_function(f)
+        if evals == 1:
+            fx = EvaluationCounter(fx)
+        fk = fx(xAprox)
+        error = abs(fk)
+        history = History(xAprox, error, graf == 1)
 
-            xAprox = np.append(xAprox, xk_next)
-            error = np.append(error, abs(fx(xk_next)))
+        while (error > tol):
+            xAprox = jain_step(fx, xAprox, fk)
+            fk = fx(xAprox)
+            error = abs(fk)
 
+            history.append(xAprox, error)
             _iter += 1
 
         if graf == 1:
-            k = np.linspace(0, _iter, _iter + 1)
-            plotFunction(k, error, 'Jain Method')
+            plot_convergence(Trace('Jain Method', history.x,
+                                   history.error), image=False)
 
-        return xAprox[-1], _iter
+        if evals == 1:
+            return xAprox, _iter, fx.evaluations
+        return xAprox, _iter
     except AttributeError as e:
         raise ValueError('f has an unknown function. ' + str(e).capitalize())
     except TypeError as e:
         raise ValueError('f has an unknown symbol. ' + str(e).capitalize())
 
+
+def jain_step(fx, xk, fk=None):
+    """
+    One iteration of Jain Method. The Steffensen point yk comes from f(xk)
+    and f(xk + f(xk)), and the step needs f(yk) besides. xk can be a float
+    or a numpy array of iterates, which are updated element-wise
+
+    Arguments:
+
+        fx {function} - compiled function f(x)
+        xk {float, ndarray} - current iterate
+        fk {float, ndarray} - f(xk), evaluated if None
+
+    Returns:
+
+        xk_next {float, ndarray} - next iterate
+    """
+    y = fx(xk) if fk is None else fk
+    div = fx(xk + y) - y
+    yk = xk - y**2 / div
+
+    return xk - y**3 / (div * (y - fx(yk)))
+
 # ============================== Method 4 ====================================
 
 
-def sne_fd_4(f, x0, tol, graf=1):
+@instrumented
+def sne_fd_4(f, x0, tol, graf=1, evals=0):
     """
     Liu Method
 
@@ -212,11 +286,14 @@ def sne_fd_4(f, x0, tol, graf=1):
         x0 {float, int} - initial value to start iterations
         tol {float, int} - tolerance that indicates the stop condition
         graf {int} - flag that indicates if a plot must be done
+        evals {int} - flag that indicates if the amount of evaluations of f
+                      must be returned
 
     Returns:
 
         xAprox {float} - root approximation
         _iter {int} - amount of iterations required
+        evaluations {int} - amount of evaluations of f (only if evals is 1)
     """
     if (not isinstance(f, str)):
         raise ValueError('f must be a string')
@@ -230,44 +307,75 @@ def sne_fd_4(f, x0, tol, graf=1):
     if (graf != 0 and graf != 1):
         raise ValueError('graf must be 0 or 1')
 
-    xAprox = np.array([x0])
+    if (evals != 0 and evals != 1):
+        raise ValueError('evals must be 0 or 1')
+
+    xAprox = x0
     _iter = 0
 
     try:
-        fx = lambda x: eval(f)
-        error = np.array([abs(fx(xAprox[-1]))])
-
-        while (abs(fx(xAprox[-1])) > tol):
-            xk = xAprox[-1]
-
-            yk = steffensen_method(f, x0, _iter)
-            zk = xk + fx(xk)
+        fx = compile_function(f)
+        if evals == 1:
+            fx = EvaluationCounter(fx)
+        fk = fx(xAprox)
+        error = abs(fk)
+        history = History(xAprox, error, graf == 1)
 
-            f_xk_yk = (fx(yk) - fx(xk)) / (yk - xk)
-            f_yk_zk = (fx(zk) - fx(yk)) / (zk - yk)
-            f_xk_zk = (fx(zk) - fx(xk)) / (zk - xk)
-
-            xk_next = yk - fx(yk)*((f_xk_yk - f_yk_zk + f_xk_zk) / f_xk_yk**2)
-
-            xAprox = np.append(xAprox, xk_next)
-            error = np.append(error, abs(fx(xk_next)))
+        while (error > tol):
+            xAprox = liu_step(fx, xAprox, fk)
+            fk = fx(xAprox)
+            error = abs(fk)
 
+            history.append(xAprox, error)
             _iter += 1
 
         if graf == 1:
-            k = np.linspace(0, _iter, _iter + 1)
-            plotFunction(k, error, 'Liu Method')
+            plot_convergence(Trace('Liu Method', history.x,
+                                   history.error), image=False)
 
-        return xAprox[-1], _iter
+        if evals == 1:
+            return xAprox, _iter, fx.evaluations
+        return xAprox, _iter
     except AttributeError as e:
         raise ValueError('f has an unknown function. ' + str(e).capitalize())
     except TypeError as e:
         raise ValueError('f has an unknown symbol. ' + str(e).capitalize())
 
+
+def liu_step(fx, xk, fk=None):
+    """
+    One iteration of Liu Method: a Newton-like correction of the
+    Steffensen point yk with the divided differences of f over xk, yk and
+    zk = xk + f(xk). xk can be a float or a numpy array of iterates, which
+    are updated element-wise
+
+    Arguments:
+
+        fx {function} - compiled function f(x)
+        xk {float, ndarray} - current iterate
+        fk {float, ndarray} - f(xk), evaluated if None
+
+    Returns:
+
+        xk_next {float, ndarray} - next iterate
+    """
+    y = fx(xk) if fk is None else fk
+    zk = xk + y
+    fz = fx(zk)
+    yk = xk - y**2 / (fz - y)
+    fy = fx(yk)
+
+    f_xk_yk = (fy - y) / (yk - xk)
+    f_yk_zk = (fz - fy) / (zk - yk)
+    f_xk_zk = (fz - y) / (zk - xk)
+
+    return yk - fy*((f_xk_yk - f_yk_zk + f_xk_zk) / f_xk_yk**2)
+
 # ============================== Method 5 ====================================
 
 
-def sne_fd_5(f, x0, tol, graf=1):
+@instrumented
+def sne_fd_5(f, x0, tol, graf=1, evals=0):
     """
     Ren Method
 
@@ -279,11 +387,14 @@ def sne_fd_5(f, x0, tol, graf=1):
         x0 {float, int} - initial value to start iterations
         tol {float, int} - tolerance that indicates the stop condition
         graf {int} - flag that indicates if a plot must be done
+        evals {int} - flag that indicates if the amount of evaluations of f
+                      must be returned
 
     Returns:
 
         xAprox {float} - root approximation
         _iter {int} - amount of iterations required
+        evaluations {int} - amount of evaluations of f (only if evals is 1)
     """
     if (not isinstance(f, str)):
         raise ValueError('f must be a string')
@@ -297,45 +408,77 @@ def sne_fd_5(f, x0, tol, graf=1):
     if (graf != 0 and graf != 1):
         raise ValueError('graf must be 0 or 1')
 
-    xAprox = np.array([x0])
+    if (evals != 0 and evals != 1):
+        raise ValueError('evals must be 0 or 1')
+
+    xAprox = x0
     _iter = 0
 
     try:
-        fx = lambda x: eval(f)
-        error = np.array([abs(fx(xAprox[-1]))])
-
-        while (abs(fx(xAprox[-1])) > tol):
-            xk = xAprox[-1]
-
-            yk = steffensen_method(f, x0, _iter)
-            zk = xk + fx(xk)
+        fx = compile_function(f)
+        if evals == 1:
+            fx = EvaluationCounter(fx)
+        fk = fx(xAprox)
+        error = abs(fk)
+        history = History(xAprox, error, graf == 1)
 
-            f_xk_yk = (fx(yk) - fx(xk)) / (yk - xk)
-            f_yk_zk = (fx(zk) - fx(yk)) / (zk - yk)
-            f_xk_zk = (fx(zk) - fx(xk)) / (zk - xk)
-
-            div = f_xk_yk + f_yk_zk - f_xk_zk + (yk - xk) * (yk - zk)
-            xk_next = yk - fx(yk) / div
-
-            xAprox = np.append(xAprox, xk_next)
-            error = np.append(error, abs(fx(xk_next)))
+        while (error > tol):
+            xAprox = ren_step(fx, xAprox, fk)
+            fk = fx(xAprox)
+            error = abs(fk)
 
+            history.append(xAprox, error)
             _iter += 1
 
         if graf == 1:
-            k = np.linspace(0, _iter, _iter + 1)
-            plotFunction(k, error, 'Ren Method')
+            plot_convergence(Trace('Ren Method', history.x,
+                                   history.error), image=False)
 
-        return xAprox[-1], _iter
+        if evals == 1:
+            return xAprox, _iter, fx.evaluations
+        return xAprox, _iter
     except AttributeError as e:
         raise ValueError('f has an unknown function. ' + str(e).capitalize())
     except TypeError as e:
         raise ValueError('f has an unknown symbol. ' + str(e).capitalize())
 
+
+def ren_step(fx, xk, fk=None):
+    """
+    One iteration of Ren Method. Like Liu Method it corrects the
+    Steffensen point yk with divided differences over xk, yk and
+    zk = xk + f(xk), with a different denominator. xk can be a float or a
+    numpy array of iterates, which are updated element-wise
+
+    Arguments:
+
+        fx {function} - compiled function f(x)
+        xk {float, ndarray} - current iterate
+        fk {float, ndarray} - f(xk), evaluated if None
+
+    Returns:
+
+        xk_next {float, ndarray} - next iterate
+    """
+    y = fx(xk) if fk is None else fk
+    zk = xk + y
+    fz = fx(zk)
+    yk = xk - y**2 / (fz - y)
+    fy = fx(yk)
+
+    f_xk_yk = (fy - y) / (yk - xk)
+    f_yk_zk = (fz - fy) / (zk - yk)
+    f_xk_zk = (fz - y) / (zk - xk)
+
+    div = f_xk_yk + f_yk_zk - f_xk_zk + (yk - xk) * (yk - zk)
+
+    return yk - fy / div
+
 # ============================== Method 6 ====================================
 
 
-def sne_fd_6(f, x0, tol, graf=1):
+@instrumented
+def sne_fd_6(f, x0, tol, graf=1, evals=0):
     """
     Free Derivative Ostrowski Method
 
@@ -347,11 +490,14 @@ def sne_fd_6(f, x0, tol, graf=1):
         x0 {float, int} - initial value to start iterations
         tol {float, int} - tolerance that indicates the stop condition
         graf {int} - flag that indicates if a plot must be done
+        evals {int} - flag that indicates if the amount of evaluations of f
+                      must be returned
 
     Returns:
 
         xAprox {float} - root approximation
         _iter {int} - amount of iterations required
+        evaluations {int} - amount of evaluations of f (only if evals is 1)
     """
     if (not isinstance(f, str)):
         raise ValueError('f must be a string')
@@ -365,36 +511,64 @@ def sne_fd_6(f, x0, tol, graf=1):
     if (graf != 0 and graf != 1):
         raise ValueError('graf must be 0 or 1')
 
-    xAprox = np.array([x0])
+    if (evals != 0 and evals != 1):
+        raise ValueError('evals must be 0 or 1')
+
+    xAprox = x0
     _iter = 0
 
     try:
-        fx = lambda x: eval(f)
-        error = np.array([abs(fx(xAprox[-1]))])
-
-        while (abs(fx(xAprox[-1])) > tol):
-            xk = xAprox[-1]
+        fx = compile_function(f)
+        if evals == 1:
+            fx = EvaluationCounter(fx)
+        fk = fx(xAprox)
+        error = abs(fk)
+        history = History(xAprox, error, graf == 1)
 
-            y = fx(xk)
-            yk = xk - (2 * y**2) / (fx(xk + y) - fx(xk - y))
-
-            xk_next = yk * (fx(yk) - y) / (2 * fx(yk) - y)
-
-            xAprox = np.append(xAprox, xk_next)
-            error = np.append(error, abs(fx(xk_next)))
+        while (error > tol):
+            xAprox = ostrowski_step(fx, xAprox, fk)
+            fk = fx(xAprox)
+            error = abs(fk)
 
+            history.append(xAprox, error)
             _iter += 1
 
         if graf == 1:
-            k = np.linspace(0, _iter, _iter + 1)
-            plotFunction(k, error, 'Free Derivative Ostrowski Method')
+            plot_convergence(Trace('Free Derivative Ostrowski Method',
+                                   history.x, history.error),
+                             image=False)
 
-        return xAprox[-1], _iter
+        if evals == 1:
+            return xAprox, _iter, fx.evaluations
+        return xAprox, _iter
     except AttributeError as e:
         raise ValueError('f has an unknown function. ' + str(e).capitalize())
     except TypeError as e:
         raise ValueError('f has an unknown symbol. ' + str(e).capitalize())
 
+
+def ostrowski_step(fx, xk, fk=None):
+    """
+    One iteration of Free Derivative Ostrowski Method, with the central
+    difference of f at xk as its derivative. xk can be a float or a numpy
+    array of iterates, which are updated element-wise
+
+    Arguments:
+
+        fx {function} - compiled function f(x)
+        xk {float, ndarray} - current iterate
+        fk {float, ndarray} - f(xk), evaluated if None
+
+    Returns:
+
+        xk_next {float, ndarray} - next iterate
+    """
+    y = fx(xk) if fk is None else fk
+    yk = xk - (2 * y**2) / (fx(xk + y) - fx(xk - y))
+    fy = fx(yk)
+
+    return yk * (fy - y) / (2 * fy - y)
+
 # =========================== Auxiliary function =============================
 
 
@@ -424,7 +598,7 @@ def validator(f, x0, tol):
         return False
 
     try:
-        f = sympify(f)
+        f = symbolic_expression(f)
     except Exception as exception:
         print("WARNING: [invalid expression]: ", type(
             exception).__name__, "-", str(exception))
@@ -432,52 +606,21 @@ def validator(f, x0, tol):
     return True
 
 
-def steffensen_method(exp, x0, n):
-    """
-    Steffensen Method
-
-    This function is used to calculate some necessary values for other functions
-
-    Arguments:
-
-        exp {string} - polynomial whose solution must be found
-        x0 {float, int} - initial value to start iterations
-        n {int} - number of iterations
-
-    Returns:
-
-        xn {float} - root approximation
-    """
-    f = lambda x: eval(exp)
-    _iter = 0
-    xAprox = x0
-
-    while (_iter <= n):
-        df = misc.derivative(f, xAprox, dx=1e-6)
-        df2 = misc.derivative(f, xAprox, n=2, dx=1e-6)
-        div = (2 * df**2 - f(xAprox) * df2)
-
-        xAprox = xAprox - (2 * f(xAprox) * df) / div
-        _iter += 1
-    return xAprox
-
-
 def plotFunction(k, error, title):
     """
-    This function is used to plot iterations vs error
+    This function is used to plot iterations vs error. The plot is drawn
+    in the background (see plot.plot_convergence) instead of being shown,
+    so it doesn't block (or need a display)
 
     Arguments:
 
-        k {iterable} - an iterable with x axis values
+        k {iterable} - an iterable with x axis values (the iterations)
         error {iterable} - an iterable with y axis values
         title {string} - plot title
 
     Returns:
 
-        This function doesn't return
+        future {Future} - its result is the image, or its path when
+                          plot.PLOT_DIRECTORY is set
     """
-    plt.title(title)
-    plt.xlabel('Iterations k')
-    plt.ylabel('Error |f(xk)|')
-    plt.plot(k, error)
-    plt.show()
+    return plot_convergence(Trace(title, None, error))
@@ -0,0 +1,69 @@
+# ====================== Iteration history of the solvers ====================
+import numpy as np
+
+
+class History:
+    """
+    Growable buffer with the iterates and errors of a solver
+
+    The arrays are preallocated and doubled when they are full, so storing n
+    iterations costs O(n) time and memory instead of the O(n^2) of calling
+    np.append on every iteration. A disabled history stores nothing and
+    only counts the iterations, which is what the solvers use when no graph
+    is requested
+
+    Arguments:
+
+        x0 {float, int} - initial value
+        error0 {float, int} - error of the initial value
+        enabled {bool} - false to skip storing the values
+        capacity {int} - amount of values preallocated
+    """
+
+    def __init__(self, x0, error0, enabled=True, capacity=64):
+        self.enabled = enabled
+        self.size = 0
+
+        if enabled:
+            self._x = np.empty(max(capacity, 1))
+            self._error = np.empty(max(capacity, 1))
+        else:
+            self._x = self._error = None
+
+        self.append(x0, error0)
+
+    def append(self, xk, error):
+        """
+        Stores a new iterate
+
+        Arguments:
+
+            xk {float} - iterate
+            error {float} - error of the iterate
+
+        Returns:
+
+            This function doesn't return
+        """
+        if self.enabled:
+            if self.size == self._x.size:
+                self._x = np.resize(self._x, 2 * self.size)
+                self._error = np.resize(self._error, 2 * self.size)
+
+            self._x[self.size] = xk
+            self._error[self.size] = error
+
+        self.size += 1
+
+    @property
+    def x(self):
+        """Stored iterates (x0 first)"""
+        return self._x[:self.size] if self.enabled else np.empty(0)
+
+    @property
+    def error(self):
+        """Stored errors |f(xk)| (the one of x0 first)"""
+        return self._error[:self.size] if self.enabled else np.empty(0)
+
+    def __len__(self):
+        return self.size
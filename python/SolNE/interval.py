@@ -0,0 +1,133 @@
+# ================ Every real root of a function in an interval ==============
+import numpy as np
+
+from derivative import Differentiable
+from polynomial import compile_function
+from solver import ITER_LIMIT, get_method
+
+
+# ========================== Global variables ================================
+global GRID_POINTS                          # Samples of the interval
+global DUPLICATE_TOL                        # Relative distance of duplicates
+
+GRID_POINTS = 10000
+DUPLICATE_TOL = 1e-9
+
+
+# ============================== Root finder ==================================
+def find_roots(f, x1, x2, tol=1e-12, points=GRID_POINTS, method='sne_fd_4',
+               max_iter=ITER_LIMIT, derivative='auto'):
+    """
+    Finds the real roots of f in [x1, x2]. f is sampled over a grid with a
+    single array evaluation, every sign change gives a bracket and all the
+    brackets are refined at once with a method of the registry. The method
+    is safeguarded: an iterate that leaves its bracket (or is not finite)
+    is replaced by the bisection midpoint, and the bracket shrinks around
+    the sign change on every iteration. Roots closer than DUPLICATE_TOL
+    (relative) are merged
+
+    Roots where f touches zero without changing sign are only found if
+    they fall on the grid. Sign changes at poles are discarded
+
+    Arguments:
+
+        f {string} - function whose roots must be found
+        x1 {float, int} - interval low value
+        x2 {float, int} - interval high value
+        tol {float, int} - tolerance that indicates the stop condition
+        points {int} - amount of samples of the grid
+        method {string, Method} - name of a method without state (see
+                                  solver.METHODS)
+        max_iter {int} - limit of iterations
+        derivative {string} - derivative backend (see Differentiable)
+
+    Returns:
+
+        roots {ndarray} - sorted roots
+    """
+    if (not isinstance(f, str)):
+        raise ValueError('f must be a string')
+
+    if (not isinstance(x1, (int, float)) or not isinstance(x2, (int, float))
+            or not x1 < x2):
+        raise ValueError('x1 and x2 must be numbers with x1 < x2')
+
+    if (not isinstance(tol, (int, float))):
+        raise ValueError('tol must be a int or float')
+
+    if (not isinstance(points, int) or points < 2):
+        raise ValueError('points must be a int greater than 1')
+
+    method = get_method(method)
+    if (method.init is not None):
+        raise ValueError(method.name + ' can not refine brackets')
+
+    fx = Differentiable(compile_function(f), derivative)
+
+    with np.errstate(all='ignore'):
+        grid = np.linspace(x1, x2, points)
+        values = np.broadcast_to(fx(grid), grid.shape)
+
+        exact = grid[values == 0]
+        sign = np.sign(values)
+        brackets = np.flatnonzero(sign[:-1] * sign[1:] < 0)
+
+        roots = _refine(fx, method, grid[brackets],
+                        grid[brackets + 1], values[brackets],
+                        values[brackets + 1], tol, max_iter)
+
+    return _unique(np.concatenate([exact, roots]))
+
+
+def _refine(fx, method, a, b, fa, fb, tol, max_iter):
+    """
+    Safeguarded iterations over all the brackets [a, b] at once, like
+    batch.sne_batch but keeping every iterate inside its bracket
+    """
+    bound = np.minimum(np.abs(fa), np.abs(fb))
+    xAprox = (a + b) / 2
+    fAprox = fx(xAprox)
+    error = np.abs(fAprox)
+    a, b, fa = a.copy(), b.copy(), fa.copy()
+
+    width = 4 * np.finfo(float).eps * np.maximum(np.abs(a), np.abs(b))
+    active = np.flatnonzero((error > tol) & (b - a > width))
+    k = 0
+
+    while (active.size > 0 and k < max_iter):
+        xk, ak, bk = xAprox[active], a[active], b[active]
+
+        # The bracket is updated with the current iterate first
+        left = np.sign(fAprox[active]) == np.sign(fa[active])
+        a[active] = np.where(left, xk, ak)
+        fa[active] = np.where(left, fAprox[active], fa[active])
+        b[active] = np.where(left, bk, xk)
+        ak, bk = a[active], b[active]
+
+        xk_next = method.advance(fx, xk, fAprox[active])
+        outside = ~((xk_next > ak) & (xk_next < bk))
+        xk_next = np.where(outside, (ak + bk) / 2, xk_next)
+
+        xAprox[active] = xk_next
+        fAprox[active] = fx(xk_next)
+        error[active] = np.abs(fAprox[active])
+
+        active = active[(error[active] > tol) &
+                        (b[active] - a[active] > width[active])]
+        k += 1
+
+    # A collapsed bracket around a pole has a large |f|
+    return xAprox[(error <= tol) | (error <= bound)]
+
+
+def _unique(roots):
+    """
+    Sorts the roots and merges the ones closer than DUPLICATE_TOL
+    """
+    roots = np.sort(roots)
+    if roots.size < 2:
+        return roots
+
+    scale = np.maximum(1, np.abs(roots[1:]))
+    keep = np.concatenate([[True], np.diff(roots) > DUPLICATE_TOL * scale])
+    return roots[keep]
@@ -0,0 +1,386 @@
+# ========== Native iteration kernels compiled with Numba (optional) =========
+import ast
+import inspect
+import textwrap
+import time
+from functools import lru_cache
+
+import numpy as np
+
+from batch import sne_batch
+from expression import CACHE_SIZE, normalize
+from solver import ITER_LIMIT, Result, get_method, solve
+
+
+# ============================== Numba ========================================
+@lru_cache(maxsize=None)
+def _numba():
+    """
+    The numba module, None when it is not installed. It is only imported
+    the first time a kernel is requested
+    """
+    try:
+        import numba
+    except ImportError:
+        return None
+    return numba
+
+
+def jit_available():
+    """
+    Tells if kernels can be compiled (Numba is installed)
+
+    Returns:
+
+        available {bool} - true if numba can be imported
+    """
+    return _numba() is not None
+
+
+# ============================ Code generation ================================
+class _ScalarStep(ast.NodeTransformer):
+    """
+    Turns a step(fx, xk) or update(functions, xk) function of the registry
+    into a scalar _step(xk) that calls the generated _f, _d<n> and
+    _derivatives_<n> functions instead of a Differentiable
+    """
+
+    def __init__(self, fx, renames):
+        self.fx = fx
+        self.renames = renames
+
+    def visit_Call(self, node):
+        func = node.func
+
+        # fx.derivatives(x, n) and fx.derivative(x, n)
+        if (isinstance(func, ast.Attribute) and
+                isinstance(func.value, ast.Name) and
+                func.value.id == self.fx):
+            n = node.args[1].value if len(node.args) > 1 else 1
+            name = '_derivatives_{}' if func.attr == 'derivatives' else '_d{}'
+            return ast.Call(ast.Name(name.format(n), ast.Load()),
+                            [self.visit(node.args[0])], [])
+
+        return self.generic_visit(node)
+
+    def visit_Name(self, node):
+        if node.id == self.fx:
+            return ast.Name('_f', node.ctx)
+        if node.id in self.renames:
+            return ast.Name(self.renames[node.id], node.ctx)
+        return node
+
+
+def _step_source(step):
+    """
+    Source of the scalar _step(xk) of a stateless method
+    """
+    function = getattr(step, 'update', step)
+    tree = ast.parse(textwrap.dedent(inspect.getsource(function)))
+    definition = tree.body[0]
+
+    fx = definition.args.args[0].arg
+    renames = {}
+    body = []
+
+    for statement in definition.body:
+        if (isinstance(statement, ast.Expr) and
+                isinstance(statement.value, ast.Constant)):
+            continue                        # Docstring
+
+        # funct, fDiff, ... = functions (the Sympy-based updates)
+        if (isinstance(statement, ast.Assign) and
+                isinstance(statement.value, ast.Name) and
+                statement.value.id == fx and
+                isinstance(statement.targets[0], ast.Tuple)):
+            for n, target in enumerate(statement.targets[0].elts):
+                renames[target.id] = '_d{}'.format(n) if n else '_f'
+            continue
+
+        body.append(statement)
+
+    definition.name = '_step'
+    definition.args.args = definition.args.args[1:]
+    definition.body = body
+    definition.decorator_list = []
+
+    return ast.unparse(_ScalarStep(fx, renames).visit(definition))
+
+
+def kernel_source(f, method='sne_ud_3'):
+    """
+    Python source of the kernel of a method: f and its derivatives (derived
+    once with Sympy and printed with numpy functions), the step of the
+    method rewritten for scalars, a whole solve and a batch of solves
+
+    Arguments:
+
+        f {string} - expression of x
+        method {string, Method} - name of a method without state (see
+                                  solver.METHODS)
+
+    Returns:
+
+        source {string} - source of _f, _step, _solve and _batch
+    """
+    from sympy.printing.numpy import NumPyPrinter
+
+    from expression import symbolic_derivative
+
+    method = get_method(method)
+    if (method.init is not None):
+        raise ValueError(method.name + ' has no kernel (it has a state)')
+
+    printer = NumPyPrinter({'fully_qualified_modules': True})
+    order = method.derivatives
+    lines = []
+
+    for n in range(order + 1):
+        name = '_d{}'.format(n) if n else '_f'
+        lines += ['def {}(x):'.format(name),
+                  '    return ' + printer.doprint(symbolic_derivative(f, n)),
+                  '']
+
+    for n in range(1, order + 1):
+        lines += ['def _derivatives_{}(x):'.format(n),
+                  '    return _f(x), ' + ', '.join(
+                      '_d{}(x)'.format(k) for k in range(1, n + 1)),
+                  '']
+
+    value = ', fk' if method.takes_value else ''
+    lines += [_step_source(method.step), '',
+              _KERNELS.replace('{value}', value)]
+    return '\n'.join(lines)
+
+
+_KERNELS = '''
+def _solve(x, tol, max_iter):
+    fk = _f(x)
+    error = abs(fk)
+    k = 0
+    while error > tol and k < max_iter:
+        x = _step(x{value})
+        fk = _f(x)
+        error = abs(fk)
+        k += 1
+        if not (numpy.isfinite(x) and numpy.isfinite(error)):
+            break
+    return x, k, error
+
+
+def _batch(x0, tol, max_iter):
+    x = numpy.empty(x0.size)
+    k = numpy.zeros(x0.size, dtype=numpy.int64)
+    error = numpy.empty(x0.size)
+    for i in prange(x0.size):
+        x[i], k[i], error[i] = _solve(x0[i], tol, max_iter)
+    return x, k, error
+'''
+
+
+# =============================== Kernels =====================================
+class Kernel:
+    """
+    A method fused with an expression and its derivatives, compiled to
+    native code with Numba when it is built (or run as plain Python when
+    jit is false, which is only useful to inspect the kernels)
+
+    Arguments:
+
+        f {string} - expression of x
+        method {Method} - method without state
+        jit {bool} - true to compile with numba.njit
+    """
+
+    def __init__(self, f, method, jit=True):
+        self.f = f
+        self.method = method
+        self.source = kernel_source(f, method)
+        self.jitted = jit
+
+        numba = _numba() if jit else None
+        if (jit and numba is None):
+            raise ValueError('numba is not installed')
+
+        namespace = {'numpy': np,
+                     'prange': numba.prange if jit else range}
+        exec(compile(self.source, '<SolNE kernel: ' + f + '>', 'exec'),
+             namespace)
+
+        if jit:
+            # Globals are read when a kernel is compiled (on its first call),
+            # so every function is replaced by its compiled version first
+            for name, value in list(namespace.items()):
+                if name.startswith('_') and inspect.isfunction(value):
+                    namespace[name] = numba.njit(
+                        value, error_model='numpy',
+                        parallel=name == '_batch')
+
+        self._solve = namespace['_solve']
+        self._batch = namespace['_batch']
+
+        if jit:
+            # njit compiles on the first call: typing errors must surface
+            # here, where compile_kernel callers can still fall back
+            self.solve(1.0, 0.0, 0)
+            self.batch([1.0], 0.0, 0)
+
+    def solve(self, x0, tol, max_iter=ITER_LIMIT):
+        """
+        Runs a whole solve inside the kernel
+
+        Arguments:
+
+            x0 {float, int} - initial value to start iterations
+            tol {float, int} - tolerance that indicates the stop condition
+            max_iter {int} - limit of iterations
+
+        Returns:
+
+            xAprox {float} - root approximation
+            _iter {int} - amount of iterations done
+            error {float} - |f(xAprox)|
+        """
+        with np.errstate(all='ignore'):
+            x, k, error = self._solve(np.float64(x0), float(tol),
+                                      int(max_iter))
+        return float(x), int(k), float(error)
+
+    def batch(self, x0, tol, max_iter=ITER_LIMIT):
+        """
+        Runs a solve from every initial value inside the kernel (the lanes
+        run in parallel threads when compiled)
+
+        Arguments:
+
+            x0 {iterable} - initial values
+            tol {float, int} - tolerance that indicates the stop condition
+            max_iter {int} - limit of iterations
+
+        Returns:
+
+            xAprox {ndarray} - root approximations, with the shape of x0
+            _iter {ndarray} - amount of iterations of every lane
+            error {ndarray} - |f(xAprox)| of every lane
+        """
+        x0 = np.asarray(x0, dtype=float)
+        with np.errstate(all='ignore'):
+            x, k, error = self._batch(x0.ravel(), float(tol), int(max_iter))
+        return (x.reshape(x0.shape), k.reshape(x0.shape),
+                error.reshape(x0.shape))
+
+
+def compile_kernel(f, method='sne_ud_3', jit=True):
+    """
+    Kernel of a method and an expression, cached by both
+
+    Arguments:
+
+        f {string} - expression of x
+        method {string, Method} - name of a method without state (see
+                                  solver.METHODS)
+        jit {bool} - true to compile with Numba (it must be installed)
+
+    Returns:
+
+        kernel {Kernel} - compiled kernel
+    """
+    if (not isinstance(f, str)):
+        raise ValueError('f must be a string')
+
+    return _compile_kernel(normalize(f), get_method(method).name, jit)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _compile_kernel(key, method, jit):
+    return Kernel(key, get_method(method), jit)
+
+
+def _kernel(f, method):
+    """
+    Compiled kernel, None when Numba is missing or f or the method can not
+    be compiled (the callers fall back to the interpreted solvers)
+    """
+    if not jit_available():
+        return None
+
+    try:
+        return compile_kernel(f, method)
+    except Exception:
+        return None
+
+
+# =============================== Solvers =====================================
+def solve_jit(f, x0, method='sne_ud_3', tol=1e-12, max_iter=ITER_LIMIT):
+    """
+    solver.solve running inside a native kernel when Numba is installed,
+    so the iterations never go back to the interpreter. It falls back to
+    solver.solve when Numba is missing or f can't be compiled
+
+    Arguments:
+
+        f {string} - polynomial whose solution must be found
+        x0 {float, int} - initial value to start iterations
+        method {string, Method} - name of the method (see solver.METHODS)
+        tol {float, int} - tolerance that indicates the stop condition
+        max_iter {int} - limit of iterations
+
+    Returns:
+
+        result {Result} - root, iterations, evaluations (counted from
+                          Method.evaluations), converged flag and error
+    """
+    if (not isinstance(x0, (int, float)) or not isinstance(tol, (int, float))):
+        raise ValueError('x0 and tol must be int or float')
+
+    method = get_method(method)
+    kernel = _kernel(f, method)
+    if kernel is None:
+        return solve(f, x0, method, tol, max_iter)
+
+    start = time.perf_counter()
+    xAprox, _iter, error = kernel.solve(x0, tol, max_iter)
+
+    if error <= tol:
+        reason = 'converged'
+    elif not (np.isfinite(xAprox) and np.isfinite(error)):
+        reason = 'non finite'
+    else:
+        reason = 'iteration limit'
+
+    # Steps that don't take f(xk) evaluate it again
+    evaluations = method.evaluations + (not method.takes_value)
+    return Result(xAprox, _iter, 1 + _iter * evaluations,
+                  bool(error <= tol), error, time.perf_counter() - start,
+                  method.name, None, reason)
+
+
+def batch_jit(f, x0, tol, method='sne_ud_3', max_iter=ITER_LIMIT):
+    """
+    batch.sne_batch running inside a native kernel (with the lanes spread
+    over threads) when Numba is installed. It falls back to sne_batch when
+    Numba is missing or f can't be compiled
+
+    Arguments:
+
+        f {string} - polynomial whose solution must be found
+        x0 {float, int, iterable} - initial values to start iterations
+        tol {float, int} - tolerance that indicates the stop condition
+        method {string, Method} - name of the method (see solver.METHODS)
+        max_iter {int} - limit of iterations
+
+    Returns:
+
+        xAprox {ndarray} - root approximations, with the shape of x0
+        _iter {ndarray} - amount of iterations required by each lane
+        converged {ndarray} - true where |f(xAprox)| <= tol
+    """
+    if (not isinstance(tol, (int, float))):
+        raise ValueError('tol must be a int or float')
+
+    kernel = _kernel(f, method)
+    if kernel is None:
+        return sne_batch(f, x0, tol, method, max_iter=max_iter)
+
+    xAprox, _iter, error = kernel.batch(x0, tol, max_iter)
+    return xAprox, _iter, error <= tol
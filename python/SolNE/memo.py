@@ -0,0 +1,218 @@
+# ================ Memoization of solver results by expression ===============
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from expression import CACHE_SIZE, canonical as canonical_expression
+from expression import normalize
+from solver import Result, get_method, solve
+
+
+# ============================ Canonical keys =================================
+def canonical(f):
+    """
+    Canonical form of an expression, so equivalent spellings share a cache
+    entry (see expression.canonical: 'cos(2*x)^2-x^2' and
+    'np.cos(2 * x)**2 - x**2' are the same). The result can be solved like
+    the original expression; invalid expressions are only normalized, so
+    solving them still reports the error
+
+    Arguments:
+
+        f {string} - expression of x
+
+    Returns:
+
+        key {string} - canonical expression
+    """
+    try:
+        return canonical_expression(f)
+    except ValueError:
+        return normalize(f)
+
+
+# ============================== Result cache =================================
+class ResultCache:
+    """
+    Cache of solver results: a bounded LRU in memory, optionally backed by
+    a sqlite file that survives the process. Entries older than ttl seconds
+    are treated as missing
+
+    Arguments:
+
+        maxsize {int} - amount of results kept in memory
+        ttl {float, int} - lifetime of the results in seconds (None for no
+                           limit)
+        path {string} - sqlite file of the disk cache (None for memory only)
+    """
+
+    def __init__(self, maxsize=CACHE_SIZE, ttl=None, path=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._database = None
+
+        if path is not None:
+            self._database = sqlite3.connect(path, check_same_thread=False)
+            self._database.execute('CREATE TABLE IF NOT EXISTS results '
+                                   '(key TEXT PRIMARY KEY, created REAL, '
+                                   'value TEXT)')
+            self._database.commit()
+
+    def get(self, key):
+        """
+        Cached result of a key
+
+        Arguments:
+
+            key {string} - key of the solve (see solve_cached)
+
+        Returns:
+
+            result {Result} - cached result, None if missing or expired
+        """
+        with self._lock:
+            result = self._get(key)
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return result
+
+    def put(self, key, result):
+        """
+        Stores a result (without its trace)
+
+        Arguments:
+
+            key {string} - key of the solve (see solve_cached)
+            result {Result} - result of the solve
+
+        Returns:
+
+            This function doesn't return
+        """
+        result = result._replace(trace=None)
+        created = time.time()
+
+        with self._lock:
+            self._remember(key, created, result)
+            if self._database is not None:
+                self._database.execute(
+                    'INSERT OR REPLACE INTO results VALUES (?, ?, ?)',
+                    (key, created, json.dumps(result._asdict())))
+                self._database.commit()
+
+    def clear(self):
+        """
+        Removes every result (the disk ones too) and resets the statistics
+
+        Returns:
+
+            This function doesn't return
+        """
+        with self._lock:
+            self._memory.clear()
+            self.hits = self.misses = 0
+            if self._database is not None:
+                self._database.execute('DELETE FROM results')
+                self._database.commit()
+
+    def close(self):
+        """
+        Closes the disk cache
+
+        Returns:
+
+            This function doesn't return
+        """
+        if self._database is not None:
+            self._database.close()
+            self._database = None
+
+    def __len__(self):
+        return len(self._memory)
+
+    def _expired(self, created):
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def _get(self, key):
+        if key in self._memory:
+            created, result = self._memory[key]
+            if not self._expired(created):
+                self._memory.move_to_end(key)
+                return result
+            del self._memory[key]
+
+        if self._database is None:
+            return None
+
+        row = self._database.execute(
+            'SELECT created, value FROM results WHERE key = ?',
+            (key,)).fetchone()
+        if row is None or self._expired(row[0]):
+            return None
+
+        result = Result(**json.loads(row[1]))
+        self._remember(key, row[0], result)
+        return result
+
+    def _remember(self, key, created, result):
+        self._memory[key] = (created, result)
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+
+# Cache of solve_cached when no other one is given
+default_cache = ResultCache()
+
+
+# =============================== Solver ======================================
+def solve_cached(f, x0, method='sne_ud_3', tol=1e-12, cache=None,
+                 **options):
+    """
+    solver.solve behind a result cache. The key is made of the canonical
+    expression, the method, x0, tol and the other options, so repeated
+    solves (even of differently written expressions) are only run once
+
+    Arguments:
+
+        f {string} - polynomial whose solution must be found
+        x0 {float, int} - initial value to start iterations
+        method {string, Method} - name of the method (see solver.METHODS)
+        tol {float, int} - tolerance that indicates the stop condition
+        cache {ResultCache} - cache to use (default_cache if None)
+        options {dict} - other arguments of solver.solve (max_iter,
+                         derivative, x1, x2)
+
+    Returns:
+
+        result {Result} - cached or new result (elapsed is the time of the
+                          original solve)
+    """
+    if (not isinstance(f, str)):
+        raise ValueError('f must be a string')
+
+    if (not isinstance(x0, (int, float)) or not isinstance(tol, (int, float))):
+        raise ValueError('x0 and tol must be int or float')
+
+    if ('trace' in options):
+        raise ValueError('traces are not cached')
+
+    cache = default_cache if cache is None else cache
+    f = canonical(f)
+    key = json.dumps([f, get_method(method).name, float(x0), float(tol),
+                      sorted(options.items())])
+
+    result = cache.get(key)
+    if result is None:
+        result = solve(f, x0, method, tol, **options)
+        cache.put(key, result)
+    return result
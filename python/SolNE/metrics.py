@@ -0,0 +1,446 @@
+# ============ Opt-in instrumentation of the solvers (counters, timers) ======
+import bisect
+import functools
+import json
+import math
+import threading
+import time
+
+import numpy as np
+
+
+# ========================== Global variables ================================
+global ENABLED                              # True while recording
+
+ENABLED = False
+
+# Upper bounds of the histogram buckets (the +Inf bucket is implicit)
+TIME_BUCKETS = (1e-6, 1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1.0, 10.0)
+COUNT_BUCKETS = (1, 10, 100, 1000, 10000, 100000, 1000000)
+
+# Phases where evaluations of f belong to a derivative
+DERIVATIVE_PHASES = ('derivative', 'finite_difference')
+
+HISTOGRAMS = {
+    'solne_solve_seconds': ('Time of every solve', TIME_BUCKETS),
+    'solne_phase_seconds': ('Time of every phase of a solve (exclusive of '
+                            'nested phases)', TIME_BUCKETS),
+    'solne_evaluations': ('Evaluations of f and of its derivatives per '
+                          'solve', COUNT_BUCKETS),
+}
+
+
+# ============================== Histograms ===================================
+class Histogram:
+    """
+    Distribution of observed values in fixed buckets, like a Prometheus
+    histogram
+
+    Arguments:
+
+        buckets {tuple} - sorted upper bounds of the buckets
+    """
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        """
+        Adds a value
+
+        Arguments:
+
+            value {float, int} - observed value
+
+        Returns:
+
+            This function doesn't return
+        """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """Counts of values <= every bound, +Inf last"""
+        total, counts = 0, []
+        for count in self.counts:
+            total += count
+            counts.append(total)
+        return counts
+
+
+_histograms = {}
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def observe(name, value, **labels):
+    """
+    Adds a value to the histogram of a metric and its labels
+
+    Arguments:
+
+        name {string} - name of the metric (one of HISTOGRAMS)
+        value {float, int} - observed value
+        labels {dict} - labels of the series (like method and phase)
+
+    Returns:
+
+        This function doesn't return
+    """
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram(HISTOGRAMS[name][1])
+        histogram.observe(value)
+
+
+# ============================ Phases and solves ==============================
+class _Record:
+    """
+    Phase times and evaluation counts of the solve running in a thread
+    """
+
+    def __init__(self, method):
+        self.method = method
+        self.phases = {}
+        self.counts = {'function': 0, 'derivative': 0}
+
+
+class _Frame:
+    def __init__(self, name):
+        self.name = name
+        self.nested = 0.0
+        self.start = time.perf_counter()
+
+
+class _Phase:
+    """
+    Context manager that times a phase. Time spent in nested phases is
+    given to them, so the phases of a solve add up to its time
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        _stack().append(_Frame(self.name))
+        return self
+
+    def __exit__(self, *exc):
+        stack = _stack()
+        frame = stack.pop()
+        elapsed = time.perf_counter() - frame.start
+
+        if stack:
+            stack[-1].nested += elapsed
+
+        record = getattr(_local, 'record', None)
+        if record is not None:
+            record.phases[frame.name] = (record.phases.get(frame.name, 0) +
+                                         elapsed - frame.nested)
+        else:
+            observe('solne_phase_seconds', elapsed - frame.nested,
+                    method='', phase=frame.name)
+        return False
+
+
+class _Disabled:
+    """Shared do-nothing context of the phases while disabled"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_DISABLED = _Disabled()
+
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def phase(name):
+    """
+    Times a phase of the running solve (or a standalone one):
+
+        with metrics.phase('parse'):
+            ...
+
+    While disabled it returns a shared context that does nothing
+
+    Arguments:
+
+        name {string} - name of the phase
+
+    Returns:
+
+        context {object} - context manager
+    """
+    return _Phase(name) if ENABLED else _DISABLED
+
+
+def count(kind, n):
+    """
+    Counts evaluations of the running solve
+
+    Arguments:
+
+        kind {string} - 'function' or 'derivative'
+        n {int} - amount of evaluations
+
+    Returns:
+
+        This function doesn't return
+    """
+    record = getattr(_local, 'record', None)
+    if record is not None:
+        record.counts[kind] = record.counts.get(kind, 0) + n
+
+
+def instrumented(function):
+    """
+    Decorator of the sne_* functions: while enabled, every call is a solve
+    whose time, phases and evaluations are observed with the name of the
+    function as method label. While disabled it only costs one check
+
+    Arguments:
+
+        function {function} - solver
+
+    Returns:
+
+        wrapper {function} - instrumented solver
+    """
+    method = function.__name__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not ENABLED or getattr(_local, 'record', None) is not None:
+            return function(*args, **kwargs)
+
+        record = _local.record = _Record(method)
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            _local.record = None
+
+            # Whatever is not in a phase is the arithmetic of the method
+            record.phases['iterate'] = max(
+                0.0, elapsed - sum(record.phases.values()))
+
+            observe('solne_solve_seconds', elapsed, method=method)
+            for name, value in record.phases.items():
+                observe('solne_phase_seconds', value, method=method,
+                        phase=name)
+            for kind, value in record.counts.items():
+                observe('solne_evaluations', value, method=method, kind=kind)
+
+    return wrapper
+
+
+# ========================== Instrumented functions ===========================
+class Evaluated:
+    """
+    A compiled f(x) (or one of its derivatives) that counts and times its
+    evaluations, in phase 'evaluate' (or 'derivative'). Evaluations of f
+    made inside a derivative phase (finite differences) are counted but
+    timed as part of that phase, and the ones of Jet numbers are left to
+    the derivatives
+
+    Arguments:
+
+        fx {function} - compiled function of x
+        kind {string} - 'function' or 'derivative'
+    """
+
+    def __init__(self, fx, kind='function'):
+        self.fx = fx
+        self.kind = kind
+        self.expression = getattr(fx, 'expression', None)
+
+    def __call__(self, x):
+        if not hasattr(x, 'coefficients'):   # Jet numbers are derivatives
+            count(self.kind, np.size(x))
+
+        stack = _stack()
+        if not ENABLED or (stack and stack[-1].name in DERIVATIVE_PHASES):
+            return self.fx(x)
+
+        with _Phase('evaluate' if self.kind == 'function' else 'derivative'):
+            return self.fx(x)
+
+
+def derivatives(function, differentiable):
+    """
+    Wraps Differentiable.derivatives so it counts the derivatives and times
+    them (phase 'finite_difference' for that backend, 'derivative' for the
+    others). Like Differentiable, finite differences count evaluations of
+    f instead of derivatives
+
+    Arguments:
+
+        function {function} - bound derivatives method
+        differentiable {Differentiable} - its function
+
+    Returns:
+
+        wrapper {function} - instrumented derivatives(x, n)
+    """
+    @functools.wraps(function)
+    def wrapper(x, n):
+        # Finite differences only evaluate f, which counts them itself
+        if differentiable.backend == 'finite':
+            name = 'finite_difference'
+        else:
+            name = 'derivative'
+            count('derivative', n * np.size(x))
+
+        with phase(name):
+            return function(x, n)
+
+    return wrapper
+
+
+# ============================== Control ======================================
+def enable(reset=False):
+    """
+    Starts recording (solvers already running are not recorded)
+
+    Arguments:
+
+        reset {bool} - true to discard what was recorded before
+
+    Returns:
+
+        This function doesn't return
+    """
+    global ENABLED
+
+    if reset:
+        clear()
+    ENABLED = True
+
+
+def disable():
+    """
+    Stops recording. What was recorded is kept
+
+    Returns:
+
+        This function doesn't return
+    """
+    global ENABLED
+
+    ENABLED = False
+
+
+def clear():
+    """
+    Discards every observation
+
+    Returns:
+
+        This function doesn't return
+    """
+    with _lock:
+        _histograms.clear()
+
+
+# =============================== Export ======================================
+def snapshot():
+    """
+    Copy of every histogram
+
+    Returns:
+
+        metrics {list} - one dict per series with name, labels, buckets,
+                         cumulative counts, sum and count
+    """
+    with _lock:
+        return [{
+            'name': name,
+            'labels': dict(labels),
+            'buckets': list(histogram.buckets) + [math.inf],
+            'counts': histogram.cumulative(),
+            'sum': histogram.sum,
+            'count': histogram.count,
+        } for (name, labels), histogram in sorted(_histograms.items())]
+
+
+def to_json():
+    """
+    Histograms as a JSON document (the +Inf bound is written as null)
+
+    Returns:
+
+        text {string} - JSON text
+    """
+    series = snapshot()
+    for entry in series:
+        entry['buckets'][-1] = None
+    return json.dumps({'metrics': series}, indent=2)
+
+
+def to_prometheus():
+    """
+    Histograms in the Prometheus text exposition format
+
+    Returns:
+
+        text {string} - Prometheus text
+    """
+    series = snapshot()
+    lines = []
+
+    for name, (description, _) in HISTOGRAMS.items():
+        entries = [entry for entry in series if entry['name'] == name]
+        if not entries:
+            continue
+
+        lines += ['# HELP {} {}'.format(name, description),
+                  '# TYPE {} histogram'.format(name)]
+        for entry in entries:
+            labels = ','.join('{}="{}"'.format(key, value) for key, value in
+                              entry['labels'].items())
+            prefix = labels + ',' if labels else ''
+            for bound, value in zip(entry['buckets'], entry['counts']):
+                le = '+Inf' if math.isinf(bound) else repr(float(bound))
+                lines.append('{}_bucket{{{}le="{}"}} {}'.format(
+                    name, prefix, le, value))
+            lines.append('{}_sum{{{}}} {}'.format(name, labels,
+                                                  repr(entry['sum'])))
+            lines.append('{}_count{{{}}} {}'.format(name, labels,
+                                                    entry['count']))
+
+    return '\n'.join(lines) + '\n'
+
+
+def export(path):
+    """
+    Writes the histograms to a file: JSON for .json, Prometheus text
+    otherwise (like .prom or .txt)
+
+    Arguments:
+
+        path {string} - output file
+
+    Returns:
+
+        path {string} - output file
+    """
+    text = to_json() if path.endswith('.json') else to_prometheus()
+    with open(path, 'w') as file:
+        file.write(text)
+    return path
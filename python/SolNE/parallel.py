@@ -0,0 +1,134 @@
+# ============ Parallel solving of many expressions with processes ===========
+import os
+import signal
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from solver import ITER_LIMIT, get_method, solve
+
+
+# ========================== Global variables ================================
+global CHUNKS_PER_WORKER                    # Chunks submitted to each worker
+
+CHUNKS_PER_WORKER = 4
+
+
+class Failure(namedtuple('Failure', ['f', 'x0', 'reason'])):
+    """
+    A task of solve_many that raised an exception or timed out
+
+        f {string} - expression of the task
+        x0 {float, int} - initial value of the task
+        reason {string} - exception name and message
+    """
+
+    converged = False
+
+
+# ============================== Workers ======================================
+def _timeout(signum, frame):
+    raise TimeoutError('task took too long')
+
+
+def _solve_task(f, x0, method, tol, max_iter, derivative, timeout):
+    """
+    Solves a single task, turning any exception into a Failure
+    """
+    # Signal handlers can only be set from the main thread
+    alarm = (timeout is not None and hasattr(signal, 'setitimer') and
+             threading.current_thread() is threading.main_thread())
+    if alarm:
+        previous = signal.signal(signal.SIGALRM, _timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+
+    try:
+        return solve(f, x0, method, tol, max_iter, derivative)
+    except Exception as exception:
+        return Failure(f, x0, type(exception).__name__ + ' - ' +
+                       str(exception))
+    finally:
+        if alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+
+
+def _solve_chunk(tasks, method, tol, max_iter, derivative, timeout):
+    """
+    Solves a chunk of tasks in a worker. The compiled expressions stay in the
+    caches of the worker process, so repeated expressions are compiled once
+    per worker
+    """
+    return [_solve_task(f, x0, method, tol, max_iter, derivative, timeout)
+            for f, x0 in tasks]
+
+
+# =========================== Parallel solver =================================
+def solve_many(tasks, method='sne_ud_3', tol=1e-12, max_iter=ITER_LIMIT,
+               derivative='auto', processes=None, chunksize=None,
+               timeout=None):
+    """
+    Solves many independent (f, x0) tasks with a pool of processes. Tasks
+    are submitted in chunks and the results keep the order of the tasks. A
+    task that fails or times out gives a Failure in its place and doesn't
+    stop the rest of the batch
+
+    Arguments:
+
+        tasks {iterable} - (f, x0) pairs
+        method {string} - name of the method (see solver.METHODS)
+        tol {float, int} - tolerance that indicates the stop condition
+        max_iter {int} - limit of iterations
+        derivative {string} - derivative backend (see Differentiable)
+        processes {int} - amount of worker processes (os.cpu_count() if
+                          None, 0 or 1 solves in this process)
+        chunksize {int} - tasks per submission (the tasks are split in
+                          CHUNKS_PER_WORKER chunks per worker if None)
+        timeout {float, int} - limit in seconds of every task (needs
+                               SIGALRM, it is ignored where it is missing)
+
+    Returns:
+
+        results {list} - Result or Failure of every task
+    """
+    tasks = list(tasks)
+
+    if (processes is None):
+        processes = os.cpu_count() or 1
+
+    if (not isinstance(processes, int) or processes < 0):
+        raise ValueError('processes must be a non negative int')
+
+    if (chunksize is not None and
+            (not isinstance(chunksize, int) or chunksize < 1)):
+        raise ValueError('chunksize must be a positive int')
+
+    if (timeout is not None and
+            (not isinstance(timeout, (int, float)) or timeout <= 0)):
+        raise ValueError('timeout must be a positive int or float')
+
+    arguments = (get_method(method).name, tol, max_iter, derivative, timeout)
+
+    if processes <= 1 or len(tasks) <= 1:
+        return _solve_chunk(tasks, *arguments)
+
+    if chunksize is None:
+        chunksize = max(1, -(-len(tasks) // (processes * CHUNKS_PER_WORKER)))
+
+    chunks = [tasks[i:i + chunksize] for i in range(0, len(tasks), chunksize)]
+    results = []
+
+    with ProcessPoolExecutor(min(processes, len(chunks))) as pool:
+        futures = [pool.submit(_solve_chunk, chunk, *arguments)
+                   for chunk in chunks]
+
+        for chunk, future in zip(chunks, futures):
+            try:
+                results.extend(future.result())
+            except BrokenProcessPool as exception:
+                # A worker died (e.g. killed by the system) with the chunk
+                results.extend(Failure(f, x0, 'BrokenProcessPool - ' +
+                                       str(exception)) for f, x0 in chunk)
+
+    return results
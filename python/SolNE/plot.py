@@ -0,0 +1,241 @@
+# ============== Headless convergence plots and trace export =================
+import csv
+import io
+import itertools
+import json
+import os
+import re
+import threading
+from collections import namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+
+import metrics
+
+
+# ========================== Global variables ================================
+global PLOT_DIRECTORY                       # Folder of the graf=1 plots
+global PLOT_FORMAT                          # Image format of the graf=1 plots
+
+PLOT_DIRECTORY = None                       # None keeps them in memory
+PLOT_FORMAT = 'png'
+
+# Plots are drawn one at a time outside the solver thread
+_renderer = ThreadPoolExecutor(max_workers=1,
+                               thread_name_prefix='SolNE-plot')
+_counter = itertools.count()
+
+# Latest in-memory plot waiting for the renderer (a newer one replaces it)
+_pending = None
+_pending_lock = threading.Lock()
+
+Trace = namedtuple('Trace', ['title', 'x', 'error'])
+Trace.__doc__ = """
+Convergence history of a solve
+
+    title {string} - label of the solve (usually the method)
+    x {ndarray} - iterates, x0 first (None if they were not kept)
+    error {ndarray} - errors |f(xk)|, the one of x0 first
+"""
+
+
+# ============================== Figures ======================================
+def figure(traces, title=None):
+    """
+    Draws the error of every trace against its iterations in one figure.
+    The figure is built without pyplot (on the non interactive Agg canvas),
+    so it never opens a window
+
+    Arguments:
+
+        traces {iterable} - Trace of every solve
+        title {string} - figure title (the title of the trace if None and
+                         there is only one)
+
+    Returns:
+
+        figure {Figure} - matplotlib figure
+    """
+    from matplotlib.figure import Figure
+
+    traces = list(traces)
+    fig = Figure()
+    axes = fig.add_subplot()
+
+    for trace in traces:
+        error = np.asarray(trace.error, dtype=float)
+        axes.plot(np.arange(error.size), error, label=trace.title)
+
+    if title is None and len(traces) == 1:
+        title = traces[0].title
+    if title is not None:
+        axes.set_title(title)
+    if len(traces) > 1:
+        axes.legend()
+
+    axes.set_xlabel('Iterations k')
+    axes.set_ylabel('Error |f(xk)|')
+    return fig
+
+
+def save(traces, path, title=None):
+    """
+    Saves the figure of the traces. The format (PNG, SVG, PDF, ...) is
+    taken from the extension of path
+
+    Arguments:
+
+        traces {iterable} - Trace of every solve
+        path {string} - image file
+        title {string} - figure title (see figure)
+
+    Returns:
+
+        path {string} - image file
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    with metrics.phase('render'):
+        figure(traces, title).savefig(path)
+    return path
+
+
+def save_async(traces, path, title=None):
+    """
+    Same as save, but the figure is drawn by a background thread
+
+    Arguments:
+
+        traces {iterable} - Trace of every solve
+        path {string} - image file
+        title {string} - figure title (see figure)
+
+    Returns:
+
+        future {Future} - its result is path once the file is written
+    """
+    # Copies, so later changes of the arrays don't reach the plot
+    traces = [Trace(trace.title,
+                    None if trace.x is None else np.array(trace.x, float),
+                    np.array(trace.error, float)) for trace in traces]
+    return _renderer.submit(save, traces, path, title)
+
+
+def plot_convergence(trace, image=True):
+    """
+    Plot of the graf=1 flag of the solvers: the trace is rendered in the
+    background with PLOT_FORMAT, so the solver returns without waiting for
+    matplotlib. When PLOT_DIRECTORY is set every plot is written to a new
+    file. Otherwise the image is kept in memory, and only the latest one
+    waits for the renderer: a pending one is cancelled when a newer one
+    arrives, so many solves in a row cost one or two renders
+
+    Arguments:
+
+        trace {Trace} - convergence history of the solve
+        image {bool} - false to skip the render when PLOT_DIRECTORY is not
+                       set (nobody reads the image, like in the sne_*
+                       functions)
+
+    Returns:
+
+        future {Future} - its result is the image (bytes), or its path when
+                          PLOT_DIRECTORY is set. None when nothing is drawn
+    """
+    global _pending
+
+    trace = Trace(trace.title, None if trace.x is None else
+                  np.array(trace.x, float), np.array(trace.error, float))
+
+    if PLOT_DIRECTORY is not None:
+        path = os.path.join(PLOT_DIRECTORY, '{}-{}-{}.{}'.format(
+            re.sub(r'\W+', '-', trace.title).strip('-').lower(),
+            os.getpid(), next(_counter), PLOT_FORMAT))
+        with metrics.phase('plot'):
+            return _renderer.submit(save, [trace], path)
+
+    if not image:
+        return None
+
+    future = Future()
+    with metrics.phase('plot'), _pending_lock:
+        if _pending is None:
+            _renderer.submit(_render_pending)
+        else:
+            _pending[0].cancel()
+        _pending = (future, trace, PLOT_FORMAT)
+
+    return future
+
+
+def _render_pending():
+    """
+    Renders the latest in-memory plot of plot_convergence (in the renderer
+    thread)
+    """
+    global _pending
+
+    with _pending_lock:
+        future, trace, image_format = _pending
+        _pending = None
+
+    if not future.set_running_or_notify_cancel():
+        return
+
+    try:
+        buffer = io.BytesIO()
+        with metrics.phase('render'):
+            figure([trace]).savefig(buffer, format=image_format)
+        future.set_result(buffer.getvalue())
+    except Exception as e:
+        future.set_exception(e)
+
+
+def wait():
+    """
+    Waits until every pending plot is written
+
+    Returns:
+
+        This function doesn't return
+    """
+    _renderer.submit(lambda: None).result()
+
+
+# ============================== Export =======================================
+def export_traces(traces, path):
+    """
+    Writes the traces as JSON (a list of objects with title, x and error)
+    or as CSV (title, k, x, error rows), depending on the extension of path
+
+    Arguments:
+
+        traces {iterable} - Trace of every solve
+        path {string} - '.json' or '.csv' file
+
+    Returns:
+
+        This function doesn't return
+    """
+    extension = os.path.splitext(path)[1].lower()
+
+    if (extension not in ('.json', '.csv')):
+        raise ValueError('path must be a .json or .csv file')
+
+    with open(path, 'w', newline='') as file:
+        if extension == '.json':
+            json.dump([{'title': trace.title,
+                        'x': (None if trace.x is None else
+                              np.asarray(trace.x, dtype=float).tolist()),
+                        'error': np.asarray(trace.error, dtype=float).tolist()}
+                       for trace in traces], file)
+        else:
+            writer = csv.writer(file)
+            writer.writerow(['title', 'k', 'x', 'error'])
+            for trace in traces:
+                x = [''] * len(trace.error) if trace.x is None else trace.x
+                for k, (xk, error) in enumerate(zip(x, trace.error)):
+                    writer.writerow([trace.title, k, xk, error])
@@ -0,0 +1,348 @@
+# ================= Polynomials: Horner evaluation and all roots =============
+import ast
+import io
+import tokenize
+from functools import lru_cache
+
+import numpy as np
+
+import metrics
+from expression import (CACHE_SIZE, compile_expression, normalize, parse,
+                        symbolic_expression)
+
+
+# ========================== Global variables ================================
+global ROOTS_TOL                            # Relative tolerance of Aberth
+global ROOTS_ITER                           # Limit of iterations of Aberth
+
+ROOTS_TOL = 1e-15
+ROOTS_ITER = 10000
+
+# Tokens of the expressions that may be polynomials
+POLYNOMIAL_OPERATORS = ('+', '-', '*', '/', '**', '(', ')')
+
+
+# ============================== Detection ====================================
+def polynomial_coefficients(f):
+    """
+    Coefficients of f when it is a polynomial of x with real coefficients
+    (like '3*x**2 - (x - 1)*(x + 2)'). A cheap look at the tokens discards
+    most other expressions before Sympy is asked (with Poly), and the result
+    is cached
+
+    Arguments:
+
+        f {string} - expression of x
+
+    Returns:
+
+        coefficients {tuple} - floats from the highest degree to the
+                               constant term, None if f is not a polynomial
+    """
+    return _coefficients(normalize(f))
+
+
+def compile_polynomial(f):
+    """
+    Compiles a polynomial into its Horner form, ((c0*x + c1)*x + c2)..., which
+    needs one product and one sum per degree instead of the powers of the
+    generic expression. It works with floats, arrays and Jet numbers
+
+    Arguments:
+
+        f {string} - expression of x
+
+    Returns:
+
+        fx {function} - compiled function f(x) (with the coefficients in
+                        fx.coefficients), None if f is not a polynomial
+    """
+    key = normalize(f)
+    if _coefficients(key) is None:
+        return None
+    return _compile_horner(key, _coefficients(key))
+
+
+def compile_function(f):
+    """
+    Compiled f for the iterative methods (the sne_* functions and the
+    solvers of the registry): the Horner form when f is a polynomial
+    already written as a sum of monomials, compile_expression otherwise.
+    The monomials are read from the syntax tree, so Sympy is not needed.
+    Factored polynomials like (x - 2)**9 are not expanded, since their
+    expanded form loses the accuracy near the roots (use
+    compile_polynomial to ask for Horner anyway)
+
+    Arguments:
+
+        f {string} - expression of x
+
+    Returns:
+
+        fx {function} - compiled function f(x)
+    """
+    key = normalize(f)
+    coefficients = _monomials(key)
+    if coefficients is None:
+        return compile_expression(f)
+
+    with metrics.phase('compile'):
+        fx = _compile_horner(key, coefficients)
+    return metrics.Evaluated(fx) if metrics.ENABLED else fx
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _coefficients(key):
+    try:
+        tokens = list(tokenize.generate_tokens(io.StringIO(key).readline))
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        return None
+
+    for token in tokens:
+        if ((token.type == tokenize.NAME and token.string != 'x') or
+                (token.type == tokenize.OP and
+                 token.string not in POLYNOMIAL_OPERATORS) or
+                token.type == tokenize.STRING):
+            return None
+
+    import sympy
+
+    try:
+        expr = symbolic_expression(key)
+        variable, = expr.free_symbols or (sympy.Symbol('x', real=True),)
+        poly = sympy.Poly(expr, variable)
+        coefficients = tuple(float(c) for c in poly.all_coeffs())
+    except (sympy.PolynomialError, sympy.SympifyError, TypeError, ValueError):
+        return None
+
+    return coefficients if np.all(np.isfinite(coefficients)) else None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _monomials(key):
+    """
+    Coefficients of f when it is a sum of monomials c*x**n with real
+    numbers c (like '3*x**2 - 2.5*x + 1'), read from its syntax tree
+    without Sympy. None otherwise (or for constants)
+    """
+    try:
+        tree = parse(key)
+    except ValueError:
+        return None
+
+    terms = {}
+    pending = [(1, tree.body)]
+    while pending:
+        sign, node = pending.pop()
+        if (isinstance(node, ast.BinOp) and
+                isinstance(node.op, (ast.Add, ast.Sub))):
+            pending.append((sign, node.left))
+            pending.append((-sign if isinstance(node.op, ast.Sub) else sign,
+                            node.right))
+            continue
+
+        term = _monomial(node)
+        if term is None:
+            return None
+        degree, c = term
+        terms[degree] = terms.get(degree, 0.0) + sign * c
+
+    degree = max(terms)
+    if degree < 1:
+        return None
+    return tuple(float(terms.get(n, 0.0)) for n in range(degree, -1, -1))
+
+
+def _monomial(node):
+    """
+    (degree, coefficient) of c, x, x**n, c*x or c*x**n, None otherwise
+    """
+    if isinstance(node, ast.UnaryOp):
+        term = _monomial(node.operand)
+        if term is None:
+            return None
+        return term[0], (-term[1] if isinstance(node.op, ast.USub) else
+                         term[1])
+
+    if (isinstance(node, ast.Constant) and
+            isinstance(node.value, (int, float))):
+        return 0, node.value
+
+    if isinstance(node, ast.Name) and node.id == 'x':
+        return 1, 1
+
+    if (isinstance(node, ast.BinOp) and isinstance(node.op, ast.Pow) and
+            isinstance(node.left, ast.Name) and node.left.id == 'x' and
+            isinstance(node.right, ast.Constant) and
+            isinstance(node.right.value, int) and node.right.value >= 0):
+        return node.right.value, 1
+
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Mult):
+        left, right = _monomial(node.left), _monomial(node.right)
+        if left is None or right is None:
+            return None
+        # A number times a power of x
+        if left[0] == 0 or right[0] == 0:
+            return left[0] + right[0], left[1] * right[1]
+
+    return None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _compile_horner(key, coefficients):
+    # Unit leading coefficients and zero terms are left out of the code
+    code = repr(coefficients[0])
+    for k, c in enumerate(coefficients[1:]):
+        code = 'x' if k == 0 and coefficients[0] == 1 else \
+            '({}) * x'.format(code)
+        if c != 0:
+            code = '{} + {}'.format(code, repr(c))
+
+    fx = eval(compile('lambda x: ' + code, '<SolNE: ' + key + '>', 'eval'))
+    fx.expression = key
+    fx.coefficients = coefficients
+    return fx
+
+
+def horner(coefficients, x):
+    """
+    Evaluates a polynomial and its derivative with Horner's rule
+
+    Arguments:
+
+        coefficients {iterable} - from the highest degree to the constant
+        x {float, complex, ndarray} - point(s) of evaluation
+
+    Returns:
+
+        p {float, complex, ndarray} - value of the polynomial
+        dp {float, complex, ndarray} - value of its derivative
+    """
+    p = 0 * x
+    dp = 0 * x
+    for c in coefficients:
+        dp = dp * x + p
+        p = p * x + c
+    return p, dp
+
+
+# ================================ Roots ======================================
+def roots(f, method='aberth', tol=ROOTS_TOL, max_iter=ROOTS_ITER):
+    """
+    Every root (complex ones included, repeated by multiplicity) of a
+    polynomial at once
+
+    Methods:
+
+        'aberth' - Aberth-Ehrlich simultaneous iteration (order 3)
+        'companion' - eigenvalues of the companion matrix
+
+    Arguments:
+
+        f {string} - polynomial whose solutions must be found
+        method {string} - 'aberth' or 'companion'
+        tol {float} - relative tolerance of the Aberth corrections
+        max_iter {int} - limit of Aberth iterations
+
+    Returns:
+
+        roots {ndarray} - complex roots sorted by real and imaginary part
+    """
+    if (not isinstance(f, str)):
+        raise ValueError('f must be a string')
+
+    if (method not in ('aberth', 'companion')):
+        raise ValueError("method must be 'aberth' or 'companion'")
+
+    coefficients = polynomial_coefficients(f)
+    if coefficients is None:
+        raise ValueError('f is not a polynomial of x')
+
+    coefficients = np.trim_zeros(np.array(coefficients), 'f')
+    if coefficients.size == 0:
+        raise ValueError('f is the zero polynomial')
+
+    if method == 'companion':
+        z = companion_roots(coefficients)
+    else:
+        z = aberth_roots(coefficients, tol, max_iter)
+
+    return np.sort_complex(z)
+
+
+def companion_roots(coefficients):
+    """
+    Eigenvalues of the companion matrix of a polynomial
+
+    Arguments:
+
+        coefficients {ndarray} - from the highest degree (not zero) to the
+                                 constant term
+
+    Returns:
+
+        roots {ndarray} - complex roots
+    """
+    n = coefficients.size - 1
+    if n < 1:
+        return np.empty(0, dtype=complex)
+
+    matrix = np.zeros((n, n))
+    matrix[0] = -coefficients[1:] / coefficients[0]
+    matrix[np.arange(1, n), np.arange(n - 1)] = 1
+    return np.linalg.eigvals(matrix).astype(complex)
+
+
+def aberth_roots(coefficients, tol=ROOTS_TOL, max_iter=ROOTS_ITER):
+    """
+    Aberth-Ehrlich Method: Newton corrections of all the roots at once, each
+    one repelled by the others. The starting points lie on a circle whose
+    radius is the mean size of the roots, turned so that none is real
+
+    Arguments:
+
+        coefficients {ndarray} - from the highest degree (not zero) to the
+                                 constant term
+        tol {float} - relative tolerance of the corrections
+        max_iter {int} - limit of iterations
+
+    Returns:
+
+        roots {ndarray} - complex roots
+    """
+    n = coefficients.size - 1
+    if n < 1:
+        return np.empty(0, dtype=complex)
+
+    # Zero roots are split off, so the radius below is well defined
+    zeros = n - np.trim_zeros(coefficients, 'b').size + 1
+    coefficients = coefficients[:coefficients.size - zeros]
+    n -= zeros
+
+    z = np.empty(0, dtype=complex)
+    if n > 0:
+        radius = abs(coefficients[-1] / coefficients[0]) ** (1 / n)
+        z = radius * np.exp(1j * (2 * np.pi * np.arange(n) / n + 0.4))
+        active = np.ones(n, dtype=bool)
+
+        with np.errstate(all='ignore'):
+            for _ in range(max_iter):
+                p, dp = horner(coefficients, z[active])
+                ratio = p / dp
+
+                difference = z[active, None] - z[None, :]
+                difference[np.arange(difference.shape[0]),
+                           np.flatnonzero(active)] = np.inf
+                repulsion = np.sum(1 / difference, axis=1)
+
+                correction = ratio / (1 - ratio * repulsion)
+                correction[~np.isfinite(correction) & (p == 0)] = 0
+                z[active] -= correction
+
+                scale = np.maximum(np.abs(z[active]), 1)
+                done = np.abs(correction) <= tol * scale
+                active[np.flatnonzero(active)[done]] = False
+                if not active.any():
+                    break
+
+    return np.concatenate([z, np.zeros(zeros, dtype=complex)])
@@ -0,0 +1,157 @@
+# ============ Precision tiers of the Sympy-based solvers ====================
+import metrics
+from expression import compile_derivatives, compile_mpmath
+
+
+# ========================== Global variables ================================
+global POLISH_STEPS                         # High precision steps of 'auto'
+
+POLISH_STEPS = 3
+
+
+# ============================== Solver ======================================
+def solve_precision(update, f, x0, tol, order, precision, limit, digits):
+    """
+    Runs an iterative method with the requested precision
+
+    Precisions:
+
+        'float' - float64 arithmetic (lambdified with the math module)
+        int - mpmath arithmetic with that amount of decimal digits
+        'auto' - float64 until |f(xAprox)| <= tol, then POLISH_STEPS
+                 iterations with mpmath at the given digits
+
+    Arguments:
+
+        update {function} - update(functions, xAprox) gives the next iterate
+                            from the functions f, f', ..., f^(order)
+        f {string} - polynomial whose solution must be found
+        x0 {float, int} - initial value to start iterations
+        tol {float, int} - tolerance that indicates the stop condition
+        order {int} - highest derivative required by update
+        precision {string, int} - 'float', 'auto' or an amount of digits
+        limit {int} - limit of iterations
+        digits {int} - decimal digits of the polish of 'auto'
+
+    Returns:
+
+        xAprox {float, Float} - root approximation (a Sympy Float with the
+                                requested digits unless precision is 'float')
+        _iter {int} - amount of iterations required
+    """
+    if (precision not in ('float', 'auto') and
+            (not isinstance(precision, int) or isinstance(precision, bool)
+             or precision < 1)):
+        print("WARNING: precision must be 'float', 'auto' or a positive int")
+        return x0, 0
+
+    if precision == 'float' or precision == 'auto':
+        functions = _instrumented(compile_derivatives(f, order, 'math'))
+        xAprox, _iter = iterate(update, functions, float(x0), tol, 0, limit)
+
+        if precision == 'float':
+            return xAprox, _iter
+        precision = digits
+        steps = POLISH_STEPS
+    else:
+        xAprox, _iter = x0, 0
+        steps = None
+
+    import mpmath
+    from sympy import Float
+
+    # f itself comes from the front-end, with its numbers read at precision
+    functions = _instrumented((compile_mpmath(f),) +
+                              compile_derivatives(f, order, 'mpmath')[1:])
+
+    with mpmath.workdps(precision):
+        xAprox = mpmath.mpf(xAprox)
+        if steps is None:
+            xAprox, _iter = iterate(update, functions, xAprox, tol, _iter,
+                                    limit)
+        else:
+            xAprox, _iter = polish(update, functions, xAprox, _iter, steps)
+
+        return Float(xAprox, precision), _iter
+
+
+def _instrumented(functions):
+    """
+    f and its derivatives counted and timed while metrics are enabled
+    """
+    if not metrics.ENABLED:
+        return functions
+    return (metrics.Evaluated(functions[0]),) + tuple(
+        metrics.Evaluated(function, 'derivative')
+        for function in functions[1:])
+
+
+def iterate(update, functions, xAprox, tol, _iter, limit):
+    """
+    Iterates until |f(xAprox)| <= tol, printing a warning and returning the
+    last iterate when the limit is reached or the method fails
+
+    Arguments:
+
+        update {function} - update(functions, xAprox) gives the next iterate
+        functions {tuple} - lambdified f, f', ..., f^(order)
+        xAprox {float, mpf} - initial value
+        tol {float, int} - tolerance that indicates the stop condition
+        _iter {int} - amount of iterations already done
+        limit {int} - limit of iterations
+
+    Returns:
+
+        xAprox {float, mpf} - root approximation
+        _iter {int} - amount of iterations required
+    """
+    funct = functions[0]
+
+    try:
+        error = abs(funct(xAprox))          # calculates the error of x0
+
+        while (error > tol):
+            if(_iter >= limit):
+                print("WARNING: Iteration limit reached")
+                return xAprox, _iter
+            xAprox = update(functions, xAprox)
+            error = abs(funct(xAprox))
+            _iter += 1                      # New iteration
+
+    except ZeroDivisionError:
+        print("WARNING: [Math error] Division by zero")
+    except Exception as exception:
+        print("WARNING: [Math error]", type(
+            exception).__name__, "-", str(exception))
+
+    return xAprox, _iter
+
+
+def polish(update, functions, xAprox, _iter, steps):
+    """
+    Refines a root approximation with a fixed amount of iterations, stopping
+    early when f(xAprox) is exactly zero or the method fails
+
+    Arguments:
+
+        update {function} - update(functions, xAprox) gives the next iterate
+        functions {tuple} - lambdified f, f', ..., f^(order)
+        xAprox {mpf} - root approximation
+        _iter {int} - amount of iterations already done
+        steps {int} - amount of iterations of the polish
+
+    Returns:
+
+        xAprox {mpf} - refined root approximation
+        _iter {int} - amount of iterations, polish included
+    """
+    for _ in range(steps):
+        try:
+            if functions[0](xAprox) == 0:
+                break
+            xAprox = update(functions, xAprox)
+            _iter += 1
+        except (ZeroDivisionError, ValueError, OverflowError):
+            break
+
+    return xAprox, _iter
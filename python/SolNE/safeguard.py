@@ -0,0 +1,254 @@
+# ============ Safeguarded solving with bracketing fall back =================
+import math
+import time
+
+import numpy as np
+
+from solver import ITER_LIMIT, Result, prepare
+
+
+# ========================== Global variables ================================
+global STALL_STEPS                          # Steps without a better |f(x)|
+global DIVERGENCE_FACTOR                    # Growth of |f(x)| that diverges
+global BRACKET_STEPS                        # Doublings of the bracket search
+
+STALL_STEPS = 8
+DIVERGENCE_FACTOR = 1e6
+BRACKET_STEPS = 16
+
+
+# ============================== Tracker ======================================
+class Tracker:
+    """
+    Remembers the best point found so far and the closest points with
+    positive and negative f(x), which give a bracket as soon as both exist
+
+    Arguments:
+
+        x0 {float} - initial value
+        f0 {float} - f(x0)
+    """
+
+    def __init__(self, x0, f0):
+        self.x = x0
+        self.error = abs(f0)
+        self.error0 = abs(f0)
+        self.stall = 0
+        self.positive = self.negative = None
+        self.add(x0, f0)
+
+    def add(self, x, fx):
+        """
+        Stores an evaluated point
+
+        Arguments:
+
+            x {float} - point
+            fx {float} - f(x)
+
+        Returns:
+
+            This function doesn't return
+        """
+        if not (math.isfinite(x) and math.isfinite(fx)):
+            return
+
+        if abs(fx) < self.error:
+            self.x, self.error, self.stall = x, abs(fx), 0
+        else:
+            self.stall += 1
+
+        if fx > 0 and (self.positive is None or fx < self.positive[1]):
+            self.positive = (x, fx)
+        elif fx < 0 and (self.negative is None or fx > self.negative[1]):
+            self.negative = (x, fx)
+
+    @property
+    def bracket(self):
+        """(a, f(a), b, f(b)) with a < b and a sign change, None if unknown"""
+        if self.positive is None or self.negative is None:
+            return None
+        (a, fa), (b, fb) = sorted([self.positive, self.negative])
+        return a, fa, b, fb
+
+
+# =========================== Safeguarded solver ==============================
+def solve_safe(f, x0, method='sne_ud_3', tol=1e-12, max_iter=ITER_LIMIT,
+               derivative='auto', x1=None, x2=None):
+    """
+    Solves f with a registered method, watching every iteration. The method
+    is stopped as soon as it gives non finite values, divides by zero,
+    diverges (|f(x)| grows DIVERGENCE_FACTOR times over |f(x0)|) or
+    stagnates (STALL_STEPS steps without a smaller |f(x)|). Then a bracket
+    is taken from the points already seen or searched around the best one
+    (BRACKET_STEPS doublings), and the solve goes on with secant steps
+    inside the bracket, falling back to bisection when the bracket doesn't
+    shrink fast enough
+
+    Arguments:
+
+        f {string} - polynomial whose solution must be found
+        x0 {float, int} - initial value to start iterations
+        method {string, Method} - name of the method (see solver.METHODS)
+        tol {float, int} - tolerance that indicates the stop condition
+        max_iter {int} - limit of iterations
+        derivative {string} - derivative backend (see Differentiable)
+        x1 {float, int} - interval low value (sne_fd_2 and bracket)
+        x2 {float, int} - interval high value (sne_fd_2 and bracket)
+
+    Returns:
+
+        result {Result} - best point found; the reason is 'converged',
+                          'iteration limit', or the problem found ('non
+                          finite', 'division by zero', 'diverged',
+                          'stagnated') followed by ', no bracket' or
+                          ', bracket failed' when there was no way to
+                          recover, or preceded by 'bracketed after ' when
+                          the bracket converged
+    """
+    start = time.perf_counter()
+    method, counter, fx, steps = prepare(f, x0, method, tol, max_iter,
+                                         derivative, x1, x2)
+    steps.close()
+    state = method.init(x0, x1, x2) if method.init is not None else ()
+
+    with np.errstate(all='ignore'):
+        f0 = _evaluate(fx, x0)
+        tracker = Tracker(float(x0), f0)
+
+        for x in (x1, x2):
+            if x is not None:
+                tracker.add(float(x), _evaluate(fx, x))
+
+        problem, _iter = _iterate(fx, method, float(x0), f0, state,
+                                  tracker, tol, max_iter)
+
+        if problem is None:
+            reason = 'converged'
+        elif problem == 'iteration limit':
+            reason = problem
+        elif _search(fx, tracker):
+            _iter = _bracketed(fx, tracker, tol, _iter, max_iter)
+            if tracker.error <= tol:
+                reason = 'bracketed after ' + problem
+            elif _iter >= max_iter:
+                reason = 'iteration limit'
+            else:
+                reason = problem + ', bracket failed'
+        else:
+            reason = problem + ', no bracket'
+
+    return Result(tracker.x, _iter,
+                  counter.evaluations + fx.derivative_evaluations,
+                  bool(tracker.error <= tol), tracker.error,
+                  time.perf_counter() - start, method.name, None, reason)
+
+
+def _iterate(fx, method, xk, fk, state, tracker, tol, max_iter):
+    """
+    Iterations of the method until it converges or shows a problem
+    """
+    _iter = 0
+    error = tracker.error
+
+    while (error > tol):
+        if _iter >= max_iter:
+            return 'iteration limit', _iter
+
+        try:
+            if state:
+                xk, *state = method.advance(fx, xk, fk, *state)
+            else:
+                xk = method.advance(fx, xk, fk)
+        except ZeroDivisionError:
+            return 'division by zero', _iter
+        except (OverflowError, ValueError):
+            return 'non finite', _iter
+        _iter += 1
+
+        xk = _real(xk)
+        fk = _evaluate(fx, xk)
+        if not (math.isfinite(xk) and math.isfinite(fk)):
+            return 'non finite', _iter
+
+        tracker.add(xk, fk)
+        error = abs(fk)
+
+        if error > DIVERGENCE_FACTOR * max(tracker.error0, tol):
+            return 'diverged', _iter
+        if tracker.stall >= STALL_STEPS:
+            return 'stagnated', _iter
+
+    return None, _iter
+
+
+def _real(value):
+    """
+    value as a float, NaN when it is complex (like (-1)**(1/3))
+    """
+    return math.nan if isinstance(value, complex) else float(value)
+
+
+def _evaluate(fx, x):
+    """
+    f(x) as a float, NaN when it can not be evaluated
+    """
+    try:
+        return _real(fx(x))
+    except (ZeroDivisionError, OverflowError, ValueError):
+        return math.nan
+
+
+def _search(fx, tracker):
+    """
+    Looks for a sign change around the best point, doubling the distance
+    on both sides. Returns true once there is a bracket
+    """
+    h = 1e-2 * max(abs(tracker.x), 1)
+    center = tracker.x
+
+    for _ in range(BRACKET_STEPS):
+        if tracker.bracket is not None:
+            return True
+        for x in (center - h, center + h):
+            tracker.add(x, _evaluate(fx, x))
+        h *= 2
+
+    return tracker.bracket is not None
+
+
+def _bracketed(fx, tracker, tol, _iter, max_iter):
+    """
+    Secant steps inside the bracket, with a bisection whenever the bracket
+    is not halved by two consecutive steps. It stops early when |f(x)| does
+    not get smaller in STALL_STEPS steps (a pole inside the bracket)
+    """
+    a, fa, b, fb = tracker.bracket
+    width = b - a
+    tracker.stall = 0
+
+    while (tracker.error > tol and _iter < max_iter and
+           tracker.stall < STALL_STEPS and
+           b - a > 4 * np.finfo(float).eps * max(abs(a), abs(b))):
+        x = b - fb * (b - a) / (fb - fa)
+        if not a < x < b or (_iter % 2 == 0 and b - a > width / 2):
+            x = (a + b) / 2
+        if _iter % 2 == 0:
+            width = b - a
+
+        value = _evaluate(fx, x)
+        if not math.isfinite(value):
+            x = (a + b) / 2
+            value = _evaluate(fx, x)
+        _iter += 1
+
+        if not math.isfinite(value):
+            break
+        tracker.add(x, value)
+
+        if (value > 0) == (fb > 0):
+            b, fb = x, value
+        else:
+            a, fa = x, value
+
+    return _iter
@@ -0,0 +1,145 @@
+# ============= Automatic method selection by measured cost ==================
+import math
+from collections import OrderedDict, namedtuple
+
+from expression import CACHE_SIZE, compile_expression, normalize
+from solver import ITER_LIMIT, METHODS, get_method, solve
+
+
+# ========================== Global variables ================================
+global PROBE_ITER                           # Iteration limit of the probes
+global PROBE_REPEAT                         # Timed runs of every probe
+
+PROBE_ITER = 50
+PROBE_REPEAT = 3
+
+# Winning method of every expression, least recently used first
+_selected = OrderedDict()
+
+Probe = namedtuple('Probe', ['method', 'digits', 'evaluations', 'elapsed',
+                             'evaluations_per_digit', 'time_per_digit'])
+Probe.__doc__ = """
+Measured cost of a method on one expression
+
+    method {string} - name of the method
+    digits {float} - correct digits gained: log10(|f(x0)| / |f(root)|),
+                     between 1 and 16
+    evaluations {int} - evaluations of f and of its derivatives
+    elapsed {float} - best wall time of PROBE_REPEAT runs in seconds
+    evaluations_per_digit {float} - evaluations / digits
+    time_per_digit {float} - elapsed / digits
+"""
+
+
+# ============================== Probes ======================================
+def probe(f, x0, tol=1e-12, methods=None, derivative='auto'):
+    """
+    Runs short solves of f with every method and measures their cost per
+    correct digit. Methods that do not converge within PROBE_ITER
+    iterations are left out
+
+    Arguments:
+
+        f {string} - polynomial whose solution must be found
+        x0 {float, int} - initial value to start iterations
+        tol {float, int} - tolerance that indicates the stop condition
+        methods {iterable} - names of the methods (all of METHODS if None)
+        derivative {string} - derivative backend (see Differentiable)
+
+    Returns:
+
+        probes {list} - Probe of every converged method, cheapest first
+    """
+    probes = []
+    error0 = abs(compile_expression(f)(x0))
+
+    for method in (METHODS if methods is None else methods):
+        # The first run also compiles f and its derivatives
+        runs = [solve(f, x0, method, tol, PROBE_ITER, derivative)
+                for _ in range(PROBE_REPEAT + 1)]
+        result = runs[-1]
+
+        if not result.converged:
+            continue
+
+        # float64 can not give more than ~16 digits, even if f(root) is 0
+        digits = max(math.log10(error0 / max(result.error, error0 * 1e-16))
+                     if error0 > 0 else 0, 1)
+        elapsed = min(run.elapsed for run in runs[1:])
+
+        probes.append(Probe(result.method, digits, result.evaluations,
+                            elapsed, result.evaluations / digits,
+                            elapsed / digits))
+
+    return sorted(probes, key=lambda p: (p.time_per_digit,
+                                         p.evaluations_per_digit))
+
+
+def select_method(f, x0, tol=1e-12, methods=None, derivative='auto'):
+    """
+    Cheapest method for f. The probes only run the first time an expression
+    is seen with the same candidates, derivative backend and tolerance,
+    later calls take the winner from a bounded LRU cache
+
+    Arguments:
+
+        f {string} - polynomial whose solution must be found
+        x0 {float, int} - initial value of the probes
+        tol {float, int} - tolerance that indicates the stop condition
+        methods {iterable} - names of the candidates (all if None)
+        derivative {string} - derivative backend (see Differentiable)
+
+    Returns:
+
+        method {string} - name of the method, None if no method converged
+    """
+    key = (normalize(f),
+           None if methods is None else
+           tuple(get_method(method).name for method in methods),
+           derivative, tol)
+
+    if key in _selected:
+        _selected.move_to_end(key)
+        return _selected[key]
+
+    probes = probe(f, x0, tol, methods, derivative)
+    if not probes:
+        return None
+
+    _selected[key] = probes[0].method
+    if len(_selected) > CACHE_SIZE:
+        _selected.popitem(last=False)
+
+    return probes[0].method
+
+
+def solve_auto(f, x0, tol=1e-12, max_iter=ITER_LIMIT, derivative='auto'):
+    """
+    Solves f with the method chosen by select_method, falling back to
+    sne_ud_3 when no probe converged
+
+    Arguments:
+
+        f {string} - polynomial whose solution must be found
+        x0 {float, int} - initial value to start iterations
+        tol {float, int} - tolerance that indicates the stop condition
+        max_iter {int} - limit of iterations
+        derivative {string} - derivative backend (see Differentiable)
+
+    Returns:
+
+        result {Result} - see solver.solve
+    """
+    method = select_method(f, x0, tol, derivative=derivative) or 'sne_ud_3'
+    return solve(f, x0, method, tol, max_iter, derivative)
+
+
+def selection_clear():
+    """
+    Forgets the methods selected for every expression
+
+    Returns:
+
+        This function doesn't return
+    """
+    _selected.clear()
@@ -0,0 +1,349 @@
+# ================= Registry of methods and unified solver ===================
+import inspect
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from derivative import Differentiable
+from expression import EvaluationCounter
+from fd import (jain_step, liu_step, ostrowski_step, ren_step,
+                steffensen_update, yun_petkovic_step)
+from history import History
+from plot import Trace
+from polynomial import compile_function
+from ud import (ITER_LIMIT, chebyshev_step, danby_burkardt_step,
+                frontini_sormani_update, halley_update, newton_secant_step,
+                richmond_step)
+
+
+# ============================== Results ======================================
+Result = namedtuple('Result', ['root', 'iterations', 'evaluations',
+                               'converged', 'error', 'elapsed', 'method',
+                               'trace', 'reason'], defaults=[None, None])
+Result.__doc__ = """
+Outcome of solve
+
+    root {float} - root approximation
+    iterations {int} - amount of iterations done
+    evaluations {int} - evaluations of f and of its derivatives
+    converged {bool} - true if |f(root)| <= tol
+    error {float} - |f(root)|
+    elapsed {float} - wall time of the solve in seconds
+    method {string} - name of the method used
+    trace {Trace} - convergence history (only when solve is asked for it)
+    reason {string} - why the solve stopped: 'converged', 'iteration limit',
+                      'non finite', 'division by zero', 'deadline' (see
+                      asynchronous.solve_async), ... (see also
+                      safeguard.solve_safe)
+"""
+
+
+# ============================== Methods ======================================
+class Method:
+    """
+    Description of an iterative method
+
+    Arguments:
+
+        name {string} - name of the sne_* function
+        title {string} - name of the method
+        step {function} - step(fx, xk, *state) gives the next iterate (and
+                          the next state when the method has one). Steps
+                          with a fk argument take f(xk), which the solvers
+                          already have from their stop condition
+        order {int} - order of convergence
+        derivatives {int} - highest derivative of f required
+        evaluations {int} - evaluations of f and its derivatives per
+                            iteration, f(xk) included once
+        init {function} - init(x0, x1, x2) gives the initial state, None
+                          for methods without state
+    """
+
+    def __init__(self, name, title, step, order, derivatives, evaluations,
+                 init=None):
+        self.name = name
+        self.title = title
+        self.step = step
+        self.order = order
+        self.derivatives = derivatives
+        self.evaluations = evaluations
+        self.init = init
+        self.takes_value = 'fk' in inspect.signature(step).parameters
+
+    def advance(self, fx, xk, fk, *state):
+        """
+        Runs the step from xk, giving it f(xk) when it takes it
+
+        Arguments:
+
+            fx {Differentiable} - function f(x) with its derivatives
+            xk {float, ndarray} - current iterate
+            fk {float, ndarray} - f(xk)
+            state {tuple} - state of the method (if it has one)
+
+        Returns:
+
+            xk_next {float, ndarray, tuple} - next iterate (and next state)
+        """
+        if self.takes_value:
+            return self.step(fx, xk, *state, fk=fk)
+        return self.step(fx, xk, *state)
+
+    @property
+    def efficiency(self):
+        """Efficiency index order^(1 / evaluations)"""
+        return self.order ** (1 / self.evaluations)
+
+    def __repr__(self):
+        return 'Method({!r}, {!r})'.format(self.name, self.title)
+
+
+def update_step(update, order):
+    """
+    Adapts the update(functions, xAprox) of the Sympy-based methods to the
+    step(fx, xk) signature of the registry
+
+    Arguments:
+
+        update {function} - update function of the method
+        order {int} - highest derivative required by update
+
+    Returns:
+
+        step {function} - step function
+    """
+    def step(fx, xk):
+        return update(fx.functions(order), xk)
+    step.update = update
+    return step
+
+
+def interval_state(x0, x1, x2):
+    """
+    Initial state of Yun-Petkovic Method: (hk, ak, bk) for every lane. The
+    interval defaults to [x0 - 1, x0 + 1], which matches hk = 1
+
+    Arguments:
+
+        x0 {float, ndarray} - initial values
+        x1 {float, ndarray} - interval low value
+        x2 {float, ndarray} - interval high value
+
+    Returns:
+
+        state {tuple} - arrays with the shape of x0
+    """
+    x0 = np.asarray(x0, dtype=float)
+    x1 = x0 - 1 if x1 is None else x1
+    x2 = x0 + 1 if x2 is None else x2
+
+    return (np.ones_like(x0),
+            np.broadcast_to(np.asarray(x1, dtype=float), x0.shape).copy(),
+            np.broadcast_to(np.asarray(x2, dtype=float), x0.shape).copy())
+
+
+# Every method of the package, by the name of its sne_* function
+METHODS = {method.name: method for method in [
+    Method('sne_ud_1', "Halley's Method", update_step(halley_update, 2),
+           3, 2, 3),
+    Method('sne_ud_2', "Frontini's y Sormani's Method",
+           update_step(frontini_sormani_update, 1), 3, 1, 3),
+    Method('sne_ud_3', 'Chebyshev Method', chebyshev_step, 3, 2, 3),
+    Method('sne_ud_4', 'Newton-Secant Method', newton_secant_step, 3, 1, 3),
+    Method('sne_ud_5', 'Danby Burkardt Method', danby_burkardt_step,
+           4, 3, 4),
+    Method('sne_ud_6', 'Richmond Method', richmond_step, 3, 2, 3),
+    Method('sne_fd_1', "Steffensen's Method",
+           update_step(steffensen_update, 0), 2, 0, 2),
+    Method('sne_fd_2', 'Yun-Petkovic Method', yun_petkovic_step, 2, 0, 3,
+           interval_state),
+    Method('sne_fd_3', 'Jain Method', jain_step, 3, 0, 3),
+    Method('sne_fd_4', 'Liu Method', liu_step, 4, 0, 3),
+    Method('sne_fd_5', 'Ren Method', ren_step, 4, 0, 3),
+    Method('sne_fd_6', 'Free Derivative Ostrowski Method', ostrowski_step,
+           4, 0, 4),
+]}
+
+
+def get_method(method):
+    """
+    Looks a method up in the registry
+
+    Arguments:
+
+        method {string, Method} - name of the method or the method itself
+
+    Returns:
+
+        method {Method} - registered method
+    """
+    if isinstance(method, Method):
+        return method
+    if (method not in METHODS):
+        raise ValueError('method must be one of ' + ', '.join(METHODS))
+    return METHODS[method]
+
+
+# =============================== Solver ======================================
+def solve(f, x0, method='sne_ud_3', tol=1e-12, max_iter=ITER_LIMIT,
+          derivative='auto', x1=None, x2=None, trace=False):
+    """
+    Finds a root of f with any registered method. Unlike the sne_*
+    functions, invalid arguments always raise ValueError and a failed solve
+    (iteration limit or non finite values) is reported in the result
+
+    Arguments:
+
+        f {string} - polynomial whose solution must be found
+        x0 {float, int} - initial value to start iterations
+        method {string, Method} - name of the method (see METHODS)
+        tol {float, int} - tolerance that indicates the stop condition
+        max_iter {int} - limit of iterations
+        derivative {string} - derivative backend (see Differentiable)
+        x1 {float, int} - interval low value (only sne_fd_2)
+        x2 {float, int} - interval high value (only sne_fd_2)
+        trace {bool} - true to keep the iterates and errors in the result
+
+    Returns:
+
+        result {Result} - root, iterations, evaluations, converged flag,
+                          error, elapsed time and trace
+    """
+    start = time.perf_counter()
+    method, counter, fx, steps = prepare(f, x0, method, tol, max_iter,
+                                         derivative, x1, x2)
+
+    xAprox = x0
+    _iter = 0
+    error = float('inf')
+    history = None
+
+    for _iter, xAprox, error in steps:
+        if history is None:
+            history = History(xAprox, error, trace)
+        else:
+            history.append(xAprox, error)
+
+    if trace and history is not None:
+        trace = Trace(method.title, history.x, history.error)
+    else:
+        trace = None
+
+    if error <= tol:
+        reason = 'converged'
+    elif not np.isfinite(error):
+        reason = 'non finite'
+    elif _iter >= max_iter:
+        reason = 'iteration limit'
+    else:
+        reason = 'division by zero'
+
+    return Result(float(xAprox), _iter,
+                  counter.evaluations + fx.derivative_evaluations,
+                  bool(error <= tol), float(error),
+                  time.perf_counter() - start, method.name, trace, reason)
+
+
+# ============================== Iterators ====================================
+def iterate(f, x0, method='sne_ud_3', tol=0, max_iter=ITER_LIMIT,
+            derivative='auto', x1=None, x2=None):
+    """
+    Runs a registered method one step at a time. The iterator yields
+    (k, xk, |f(xk)|) for x0 and every new iterate, and keeps nothing else,
+    so the caller can stop it with any criteria, monitor the iterates or
+    advance many solves in turns. It ends by itself when |f(xk)| <= tol,
+    after max_iter steps, on non finite values or on a division by zero
+
+    Arguments:
+
+        f {string} - polynomial whose solution must be found
+        x0 {float, int} - initial value to start iterations
+        method {string, Method} - name of the method (see METHODS)
+        tol {float, int} - tolerance that indicates the stop condition
+        max_iter {int} - limit of iterations
+        derivative {string} - derivative backend (see Differentiable)
+        x1 {float, int} - interval low value (only sne_fd_2)
+        x2 {float, int} - interval high value (only sne_fd_2)
+
+    Returns:
+
+        steps {generator} - (k, xk, error) tuples, starting with k = 0
+    """
+    return prepare(f, x0, method, tol, max_iter, derivative, x1, x2)[3]
+
+
+def prepare(f, x0, method='sne_ud_3', tol=0, max_iter=ITER_LIMIT,
+            derivative='auto', x1=None, x2=None):
+    """
+    Validates the arguments of a solve and sets it up. This is what solve,
+    iterate and the other solvers built on the registry share
+
+    Arguments:
+
+        f {string} - polynomial whose solution must be found
+        x0 {float, int} - initial value to start iterations
+        method {string, Method} - name of the method (see METHODS)
+        tol {float, int} - tolerance that indicates the stop condition
+        max_iter {int} - limit of iterations
+        derivative {string} - derivative backend (see Differentiable)
+        x1 {float, int} - interval low value (only sne_fd_2)
+        x2 {float, int} - interval high value (only sne_fd_2)
+
+    Returns:
+
+        method {Method} - registered method
+        counter {EvaluationCounter} - counter of the evaluations of f
+        fx {Differentiable} - f with its derivatives (fx.derivative_evaluations
+                              counts the derivatives)
+        steps {generator} - (k, xk, error) tuples (see iterate)
+    """
+    if (not isinstance(f, str)):
+        raise ValueError('f must be a string')
+
+    if (not isinstance(x0, (int, float))):
+        raise ValueError('x0 must be a int or float')
+
+    if (not isinstance(tol, (int, float))):
+        raise ValueError('tol must be a int or float')
+
+    if (not isinstance(max_iter, int) or max_iter < 0):
+        raise ValueError('max_iter must be a non negative int')
+
+    method = get_method(method)
+    counter = EvaluationCounter(compile_function(f))
+    fx = Differentiable(counter, derivative)
+    state = method.init(x0, x1, x2) if method.init is not None else ()
+
+    return method, counter, fx, _iterate(fx, x0, method, tol, max_iter, state)
+
+
+def _iterate(fx, xAprox, method, tol, max_iter, state):
+    """
+    Generator behind prepare. Floating point warnings are only
+    silenced while a step runs, never while the caller holds the iterate
+    """
+    try:
+        with np.errstate(all='ignore'):
+            fk = fx(xAprox)
+            error = abs(fk)
+        yield 0, float(xAprox), float(error)
+
+        _iter = 0
+        while (error > tol and _iter < max_iter):
+            with np.errstate(all='ignore'):
+                if state:
+                    xAprox, *state = method.advance(fx, xAprox, fk, *state)
+                else:
+                    xAprox = method.advance(fx, xAprox, fk)
+                fk = fx(xAprox)
+                error = abs(fk)
+            _iter += 1
+
+            yield _iter, float(xAprox), float(error)
+
+            if not np.isfinite(error):
+                break
+
+    except ZeroDivisionError:
+        return                              # Ends like a failed solve
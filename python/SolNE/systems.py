@@ -0,0 +1,365 @@
+# ============ Nonlinear systems: Newton and Broyden methods ==================
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+from derivative import DX, Jet
+from expression import (CACHE_SIZE, NUMERIC_NAMESPACE, canonical,
+                        symbolic_function)
+from ud import ITER_LIMIT
+
+
+# ========================== Global variables ================================
+global BROYDEN_RESTART                      # Broyden updates per Jacobian
+
+BROYDEN_RESTART = 20
+
+JACOBIANS = ('auto', 'symbolic', 'dual', 'finite')
+
+SystemResult = namedtuple('SystemResult', ['root', 'iterations',
+                                           'evaluations', 'jacobians',
+                                           'converged', 'error', 'method'])
+SystemResult.__doc__ = """
+Outcome of solve_system
+
+    root {ndarray} - root approximation, one value per variable
+    iterations {int} - amount of iterations done
+    evaluations {int} - evaluations of F (Jacobians not included)
+    jacobians {int} - evaluations of the Jacobian
+    converged {bool} - true if max |F(root)| <= tol
+    error {float} - max |F(root)|
+    method {string} - 'newton' or 'broyden'
+"""
+
+
+# ============================== System ======================================
+class System:
+    """
+    A system of equations F(v) = 0 compiled once, with its Jacobian
+
+    Jacobians:
+
+        'symbolic' - derived once with Sympy; only the non zero entries are
+                     lambdified, which keeps sparse Jacobians cheap
+        'dual' - forward-mode automatic differentiation with one Jet pass
+                 (the gradients are carried as vectors)
+        'finite' - forward finite differences with step DX
+        'auto' - 'symbolic' when Sympy understands the equations, 'dual'
+                 otherwise
+
+    Arguments:
+
+        equations {iterable} - expressions of the variables (like
+                               ['x**2 + y**2 - 4', 'x*y - 1'])
+        variables {iterable} - names of the variables, in the order of v
+        jacobian {string} - one of JACOBIANS
+        sparse {bool} - true to build scipy.sparse CSR Jacobians
+    """
+
+    def __init__(self, equations, variables, jacobian='auto', sparse=False):
+        if (jacobian not in JACOBIANS):
+            raise ValueError('jacobian must be one of ' + ', '.join(JACOBIANS))
+
+        self.variables = tuple(variables)
+
+        for name in self.variables:
+            if (not isinstance(name, str) or not name.isidentifier() or
+                    name in NUMERIC_NAMESPACE):
+                raise ValueError('variables must be names, not ' + repr(name))
+
+        self.equations = tuple(canonical(e, self.variables)
+                               for e in equations)
+
+        if (len(set(self.variables)) != len(self.variables) or
+                len(self.variables) != len(self.equations)):
+            raise ValueError('there must be as many distinct variables as '
+                             'equations')
+
+        self.fx = _compile_system(self.equations, self.variables)
+        self.size = len(self.variables)
+        self.sparse = sparse
+        self.evaluations = 0
+        self.jacobians = 0
+
+        if jacobian == 'auto':
+            try:
+                self._symbolic = _symbolic_jacobian(self.equations,
+                                                    self.variables)
+                jacobian = 'symbolic'
+            except Exception:
+                jacobian = 'dual'
+        elif jacobian == 'symbolic':
+            self._symbolic = _symbolic_jacobian(self.equations,
+                                                self.variables)
+
+        self.jacobian_backend = jacobian
+
+    def __call__(self, v):
+        self.evaluations += 1
+        return np.array(self.fx(*v), dtype=float).reshape(self.size)
+
+    def jacobian(self, v):
+        """
+        Jacobian matrix of F at v
+
+        Arguments:
+
+            v {ndarray} - point
+
+        Returns:
+
+            J {ndarray, csr_matrix} - Jacobian (sparse if self.sparse)
+        """
+        self.jacobians += 1
+
+        if self.jacobian_backend == 'symbolic':
+            rows, columns, entries = self._symbolic
+            values = np.broadcast_to(np.asarray(entries(v), dtype=float),
+                                     rows.shape)
+            if self.sparse:
+                from scipy.sparse import csr_matrix
+                return csr_matrix((values, (rows, columns)),
+                                  shape=(self.size, self.size))
+            J = np.zeros((self.size, self.size))
+            J[rows, columns] = values
+            return J
+
+        if self.jacobian_backend == 'dual':
+            J = self._dual(v)
+        else:
+            J = self._finite(v)
+
+        if self.sparse:
+            from scipy.sparse import csr_matrix
+            return csr_matrix(J)
+        return J
+
+    def _dual(self, v):
+        identity = np.eye(self.size)
+        values = self.fx(*[Jet([v[j], identity[j]])
+                           for j in range(self.size)])
+
+        J = np.zeros((self.size, self.size))
+        for i, value in enumerate(values):
+            if isinstance(value, Jet):
+                J[i] = value.coefficients[1]
+        return J
+
+    def _finite(self, v):
+        v = np.asarray(v, dtype=float)
+        f0 = self(v)
+        J = np.empty((self.size, self.size))
+
+        for j in range(self.size):
+            h = DX * max(abs(v[j]), 1)
+            shifted = v.copy()
+            shifted[j] += h
+            J[:, j] = (self(shifted) - f0) / h
+        return J
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _compile_system(equations, variables):
+    # The equations are canonical (validated by the front-end)
+    code = 'lambda {}: ({},)'.format(', '.join(variables), ', '.join(
+        '(' + e + ')' for e in equations))
+    return eval(compile(code, '<SolNE system>', 'eval'),
+                dict(NUMERIC_NAMESPACE, __builtins__={}))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _symbolic_jacobian(equations, variables):
+    """
+    Rows, columns and a lambdified function of the non zero entries
+    """
+    import sympy
+
+    symbols = [sympy.Symbol(name, real=True) for name in variables]
+    index = {symbol: j for j, symbol in enumerate(symbols)}
+
+    rows, columns, entries = [], [], []
+    for i, equation in enumerate(equations):
+        expr = symbolic_function(equation, variables)
+        for symbol in sorted(expr.free_symbols & set(symbols), key=index.get):
+            derivative = sympy.diff(expr, symbol)
+            if derivative != 0:
+                rows.append(i)
+                columns.append(index[symbol])
+                entries.append(derivative)
+
+    values = sympy.lambdify([symbols], entries, 'numpy')
+    return np.array(rows, dtype=int), np.array(columns, dtype=int), values
+
+
+# ============================== Solvers ======================================
+def solve_system(equations, variables, x0, method='newton', tol=1e-12,
+                 max_iter=ITER_LIMIT, jacobian='auto', sparse=False):
+    """
+    Solves a system of nonlinear equations
+
+    Methods:
+
+        'newton' - a new Jacobian and linear solve on every iteration
+        'broyden' - the Jacobian is evaluated and factorized once and
+                    corrected with rank one updates (Broyden's good method
+                    on the inverse, applied through the factorization). It
+                    is evaluated again after BROYDEN_RESTART updates or when
+                    the error grows
+
+    Arguments:
+
+        equations {iterable} - expressions of the variables
+        variables {iterable} - names of the variables
+        x0 {iterable} - initial values, one per variable
+        method {string} - 'newton' or 'broyden'
+        tol {float, int} - tolerance of max |F(v)|
+        max_iter {int} - limit of iterations
+        jacobian {string} - Jacobian backend (see System)
+        sparse {bool} - true for sparse Jacobians and factorizations
+                        (needs scipy)
+
+    Returns:
+
+        result {SystemResult} - root, iterations, evaluations, converged
+                                flag and error
+    """
+    if (method not in ('newton', 'broyden')):
+        raise ValueError("method must be 'newton' or 'broyden'")
+
+    if (not isinstance(tol, (int, float))):
+        raise ValueError('tol must be a int or float')
+
+    system = System(equations, variables, jacobian, sparse)
+
+    v = np.array(x0, dtype=float).ravel()
+    if (v.size != system.size):
+        raise ValueError('x0 must have one value per variable')
+
+    with np.errstate(all='ignore'):
+        if method == 'newton':
+            v, _iter, error = _newton(system, v, tol, max_iter)
+        else:
+            v, _iter, error = _broyden(system, v, tol, max_iter)
+
+    return SystemResult(v, _iter, system.evaluations, system.jacobians,
+                        bool(error <= tol), float(error), method)
+
+
+def _newton(system, v, tol, max_iter):
+    F = system(v)
+    error = np.max(np.abs(F))
+    _iter = 0
+
+    while (error > tol and _iter < max_iter):
+        step = _factorize(system.jacobian(v), system.sparse)(F)
+        v = v - step
+        F = system(v)
+        error = np.max(np.abs(F))
+        _iter += 1
+
+        if not np.isfinite(error):
+            break
+
+    return v, _iter, error
+
+
+def _broyden(system, v, tol, max_iter):
+    F = system(v)
+    error = np.max(np.abs(F))
+    _iter = 0
+    inverse = None
+
+    while (error > tol and _iter < max_iter):
+        if inverse is None:
+            inverse = Inverse(_factorize(system.jacobian(v), system.sparse))
+
+        s = -inverse(F)
+        v_next = v + s
+        F_next = system(v_next)
+        error_next = np.max(np.abs(F_next))
+        _iter += 1
+
+        if not np.isfinite(error_next):
+            break
+
+        if error_next >= error and inverse.updates > 0:
+            # The updated inverse went wrong: restart from this point
+            inverse = None
+        elif inverse.updates >= BROYDEN_RESTART:
+            inverse = None
+        else:
+            inverse.update(s, F_next - F)
+
+        v, F, error = v_next, F_next, error_next
+
+    return v, _iter, error
+
+
+class Inverse:
+    """
+    Inverse of a Jacobian after Broyden updates, H = (I + a s^T)...H0, kept
+    as the factorization of the first Jacobian and the update vectors, so
+    applying it costs a triangular solve and a few dot products
+
+    Arguments:
+
+        solve {function} - solve(b) gives H0 b
+    """
+
+    def __init__(self, solve):
+        self.solve = solve
+        self.steps = []
+        self.corrections = []
+
+    @property
+    def updates(self):
+        return len(self.steps)
+
+    def __call__(self, b):
+        z = self.solve(b)
+        for s, a in zip(self.steps, self.corrections):
+            z = z + np.dot(s, z) * a
+        return z
+
+    def update(self, s, y):
+        """
+        Broyden's good update with step s and change y of F
+
+        Arguments:
+
+            s {ndarray} - step
+            y {ndarray} - F(v + s) - F(v)
+
+        Returns:
+
+            This function doesn't return
+        """
+        Hy = self(y)
+        denominator = np.dot(s, Hy)
+        if denominator != 0 and np.isfinite(denominator):
+            self.steps.append(s)
+            self.corrections.append((s - Hy) / denominator)
+
+
+def _factorize(J, sparse):
+    """
+    LU factorization of a Jacobian, as a function that solves J x = b
+    """
+    if sparse:
+        from scipy.sparse.linalg import splu
+        try:
+            return splu(J.tocsc()).solve
+        except RuntimeError:
+            # Exactly singular: like the dense path, the step is not finite
+            # and the solvers stop without converging
+            return lambda b: np.full(np.shape(b), np.inf)
+
+    try:
+        from scipy.linalg import lu_factor, lu_solve
+    except ImportError:
+        inverse = np.linalg.inv(J)
+        return lambda b: inverse @ b
+
+    factorization = lu_factor(J, check_finite=False)
+    return lambda b: lu_solve(factorization, b, check_finite=False)
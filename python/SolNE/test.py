@@ -1,6 +1,38 @@
 from fd import *
 from ud import *
 
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+import plot
+from asynchronous import solve_async
+from basins import basin_map, basin_maps, basin_statistics, load_basins
+from batch import sne_batch
+from benchmark import FUNCTIONS, run_benchmark, summary
+from continuation import solve_continuation
+from derivative import Differentiable
+from expression import FUNCTIONS as FUNCTIONS_BY_NAME
+from expression import (cache_clear, cache_info, canonical, compile_expression,
+                        compile_mpmath, symbolic_expression)
+from history import History
+from interval import find_roots
+import kernels
+from kernels import batch_jit, compile_kernel, jit_available, solve_jit
+import metrics
+from memo import ResultCache, solve_cached
+from memo import canonical as memo_canonical
+from parallel import Failure, solve_many
+from polynomial import compile_function, polynomial_coefficients, roots
+from safeguard import solve_safe
+from selection import select_method, selection_clear
+from solver import METHODS, iterate, solve
+from systems import solve_system
+
 
 def test_sne_ud_3():
     x0 = 3 / 4
@@ -42,6 +74,610 @@ def test_sne_ud_6():
     print('xAprox = {}\nIteraciones = {}'.format(xAprox, _iter))
 
 
+def test_sne_fd_evaluations():
+    x0 = 3 / 4
+    tol = 0.000000000001
+    func = 'np.cos(2 * x)**2 - x**2'
+    graf = 0
+
+    for method in (sne_fd_3, sne_fd_4, sne_fd_5):
+        xAprox, _iter, evaluations = method(func, x0, tol, graf, 1)
+        print('xAprox = {}\nIteraciones = {}\nEvaluaciones = {}'.format(
+            xAprox, _iter, evaluations))
+
+        assert abs(xAprox - 0.5149332646611294) < tol
+        assert evaluations == 1 + 3 * _iter
+
+    xAprox, _iter, evaluations = sne_fd_6(func, x0, tol, graf, 1)
+    assert evaluations == 1 + 4 * _iter
+
+    # Through the registry they reuse f(xk) too
+    for name in ('sne_fd_3', 'sne_fd_4', 'sne_fd_5', 'sne_fd_6'):
+        result = solve(func, x0, name, tol)
+        assert result.evaluations == (1 + result.iterations *
+                                      METHODS[name].evaluations)
+
+
+def test_symbolic_derivatives():
+    cache_clear()
+    x0 = 3 / 4
+    tol = 0.000001
+    func = 'cos(2*x)^2-x^2'
+    graf = 1
+
+    for method in (sne_ud_1, sne_ud_2, sne_ud_1):
+        xAprox, _iter = method(func, x0, tol, graf)
+        print('xAprox = {}\nIteraciones = {}'.format(xAprox, _iter))
+        assert abs(xAprox - 0.5149332646611294) < tol
+
+    info = cache_info()
+    assert info['derivatives'].misses == 3
+    assert info['lambdified'].hits == 1
+
+
+def test_precision_tiers():
+    x0 = 3 / 4
+    tol = 0.000000000001
+    func = 'cos(2*x)^2-x^2'
+    graf = 1
+
+    xFloat, _ = sne_ud_1(func, x0, tol, graf)
+    xAuto, _ = sne_ud_1(func, x0, tol, graf, 'auto')
+    xDigits, _ = sne_ud_1(func, x0, 1e-38, graf, 40)
+    print('float = {}\nauto = {}\ndigits = {}'.format(xFloat, xAuto, xDigits))
+
+    assert isinstance(xFloat, float)
+    assert abs(xFloat - 0.5149332646611294) < tol
+    assert abs(xAuto - xDigits) < 1e-35
+
+
+def test_expression_cache():
+    cache_clear()
+    x0 = 3 / 4
+    tol = 0.0000000000000001
+    graf = 0
+
+    sne_ud_3('np.cos(2 * x)**2 - x**2', x0, tol, graf)
+    sne_fd_6('np.cos(2*x)**2 - x**2', x0, tol, graf)
+
+    info = cache_info()['numeric']
+    print('Cache = {}'.format(info))
+    assert info.misses == 1 and info.hits == 1
+
+
+def test_expression_front_end():
+    # Both dialects share the same tree and evaluators
+    sympy_style = 'cos(2*x)^2-x^2'
+    numpy_style = 'np.cos(2 * x)**2 - x**2'
+    assert canonical(sympy_style) == canonical(numpy_style)
+
+    x = np.array([0.25, 0.5149332646611294])
+    assert np.allclose(compile_expression(sympy_style)(x),
+                       np.cos(2 * x)**2 - x**2)
+    assert symbolic_expression(sympy_style) == symbolic_expression(
+        numpy_style)
+
+    import mpmath
+    with mpmath.workdps(50):
+        assert abs(compile_mpmath('x - 0.1')(mpmath.mpf('0.1'))) == 0
+
+    assert canonical('np.power(x, 2) + ln(x)') == 'power(x, 2) + ln(x)'
+
+    for f in ('__import__("os").getcwd()', 'x.__class__', 'unknown(x)',
+              'np.load(x)', 'x + y', 'x // 2', '(lambda: x)()', 'log(x, 2)',
+              'power(x)', 'sin()'):
+        try:
+            compile_expression(f)
+            assert False
+        except ValueError as e:
+            assert str(e).startswith('f ')
+
+    # Errors of numpy inside the evaluators are not lost
+    class Opaque:
+        def __array_ufunc__(self, *args, **kwargs):
+            return NotImplemented
+
+    try:
+        compile_expression('cbrt(x)')(Opaque())
+        assert False
+    except TypeError:
+        pass
+
+
+def test_derivative_backends():
+    fx = compile_expression('np.exp(x) * np.sin(x) / (1 + x**2)')
+    x0 = np.array([-1.5, 0.75, 2.0])
+
+    symbolic = Differentiable(fx, 'symbolic').derivatives(x0, 3)
+    dual = Differentiable(fx, 'dual').derivatives(x0, 3)
+    finite = Differentiable(fx, 'finite').derivatives(x0, 2)
+
+    for n in range(4):
+        assert np.allclose(symbolic[n], dual[n], rtol=1e-12)
+    for n in range(3):
+        assert np.allclose(symbolic[n], finite[n], rtol=1e-3)
+
+    xAprox, _iter = sne_ud_5('np.cos(2 * x)**2 - x**2', 3 / 4, 1e-12, 0,
+                             'dual')
+    assert abs(xAprox - 0.5149332646611294) < 1e-12
+
+
+def test_sne_batch():
+    x0 = np.array([-1.5, -0.75, 0.75, 1.5])
+    tol = 0.000000000001
+    func = 'np.cos(2 * x)**2 - x**2'
+
+    xAprox, _iter, converged = sne_batch(func, x0, tol, method='sne_ud_3')
+    print('xAprox = {}\nIteraciones = {}'.format(xAprox, _iter))
+
+    assert converged.all()
+    assert np.allclose(abs(xAprox), 0.5149332646611294)
+    for i in range(x0.size):
+        assert (xAprox[i], _iter[i]) == sne_ud_3(func, x0[i], tol, 0)
+
+
+def test_solve():
+    x0 = 3 / 4
+    tol = 0.000000000001
+    func = 'np.cos(2 * x)**2 - x**2'
+
+    for method in METHODS:
+        result = solve(func, x0, method, tol)
+        print(result)
+
+        assert result.converged and result.method == method
+        assert abs(result.root - 0.5149332646611294) < tol
+        assert result.evaluations > result.iterations > 0
+
+    result = solve('x**2 + 1', x0, 'sne_fd_3', tol, max_iter=20)
+    assert not result.converged and result.iterations == 20
+
+
+def test_select_method():
+    selection_clear()
+    x0 = 3 / 4
+    func = 'np.cos(2 * x)**2 - x**2'
+
+    method = select_method(func, x0)
+    print('Method = {}'.format(method))
+
+    assert method in METHODS
+    assert select_method(func, 5.0) == method
+
+    # The candidates and the derivative backend are part of the choice
+    assert select_method(func, x0, methods=['sne_fd_3']) == 'sne_fd_3'
+    assert select_method(func, x0, methods=[]) is None
+    assert select_method(func, x0, derivative='finite') in METHODS
+
+
+def test_solve_many():
+    tasks = [('np.cos(2 * x)**2 - x**2', 3 / 4), ('unknown(x)', 1.0),
+             ('x**2 - 2', 1.0), ('x**3 - 2', 1.0)] * 3
+
+    results = solve_many(tasks, 'sne_fd_3', processes=2, chunksize=2)
+
+    assert len(results) == len(tasks)
+    assert isinstance(results[1], Failure)
+    assert [r.converged for r in results] == [True, False, True, True] * 3
+    assert abs(results[2].root - np.sqrt(2)) < 1e-10
+    assert abs(results[-1].root - 2**(1 / 3)) < 1e-10
+
+
+def test_import_time():
+    # Importing the solvers and running a numeric method must not load
+    # Sympy or matplotlib
+    code = ('import sys, time\n'
+            'start = time.perf_counter()\n'
+            'import fd, ud, solver\n'
+            'elapsed = time.perf_counter() - start\n'
+            'fd.sne_fd_3("x**2 - 2", 1.0, 1e-12, 0)\n'
+            'print(elapsed, "sympy" in sys.modules, '
+            '"matplotlib" in sys.modules)\n')
+
+    output = subprocess.run([sys.executable, '-c', code], check=True,
+                            capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    elapsed, sympy, matplotlib = output.stdout.split()
+    print('Import time = {} s'.format(elapsed))
+
+    assert sympy == 'False'
+    assert matplotlib == 'False'
+
+
+def test_plot(tmp_path, monkeypatch):
+    monkeypatch.setattr(plot, 'PLOT_DIRECTORY', str(tmp_path))
+    func = 'np.cos(2 * x)**2 - x**2'
+
+    for _ in range(3):
+        sne_fd_3(func, 3 / 4, 1e-12, 1)
+        sne_fd_4(func, 3 / 4, 1e-12, 1)
+    plot.wait()
+    assert len(list(tmp_path.glob('jain-method-*.png'))) == 3
+    assert len(list(tmp_path.glob('liu-method-*.png'))) == 3
+
+    # By default the plots stay in memory and pending ones are replaced
+    monkeypatch.setattr(plot, 'PLOT_DIRECTORY', None)
+    trace = plot.Trace('Jain Method', None, [1, 1e-3, 1e-9])
+    futures = [plot.plot_convergence(trace) for _ in range(50)]
+    plot.wait()
+    assert futures[-1].result().startswith(b'\x89PNG')
+    assert sum(future.cancelled() for future in futures) >= 48
+    assert len(list(tmp_path.iterdir())) == 6
+
+    # Nobody reads the image of a graf=1 solve: it is not drawn
+    sne_fd_3(func, 3 / 4, 1e-12, 1)
+    assert plot._pending is None
+
+    traces = [solve(func, 3 / 4, method, trace=True).trace
+              for method in ('sne_ud_3', 'sne_fd_4')]
+    assert traces[0].title == 'Chebyshev Method'
+    assert len(traces[1].x) == len(traces[1].error)
+
+    path = plot.save_async(traces, str(tmp_path / 'all.svg')).result()
+    assert open(path).read().startswith('<?xml')
+
+    plot.export_traces(traces, str(tmp_path / 'traces.json'))
+    plot.export_traces(traces, str(tmp_path / 'traces.csv'))
+    rows = open(str(tmp_path / 'traces.csv')).read().splitlines()
+    assert len(rows) == 1 + sum(len(trace.error) for trace in traces)
+
+
+def test_iterate():
+    func = 'np.cos(2 * x)**2 - x**2'
+    steps = list(iterate(func, 3 / 4, 'sne_fd_4', tol=1e-12))
+    result = solve(func, 3 / 4, 'sne_fd_4', tol=1e-12)
+
+    assert [k for k, xk, error in steps] == list(range(len(steps)))
+    assert steps[-1] == (result.iterations, result.root, result.error)
+
+    # Stopped early by the caller
+    for k, xk, error in iterate(func, 3 / 4, 'sne_fd_4'):
+        if error < 1e-3:
+            break
+    assert k < result.iterations and error < 1e-3
+
+
+def test_solve_async():
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        task = asyncio.ensure_future(ticker())
+        converged = await solve_async('np.cos(2 * x)**2 - x**2', 3 / 4)
+        diverged = await solve_async('x**2 + 1', 0.5, 'sne_fd_4',
+                                     max_iter=10**9, timeout=0.05,
+                                     yield_every=10)
+        offloaded = await solve_async('x**2 + 1', 0.5, 'sne_fd_4',
+                                      max_iter=10**9, timeout=0.05,
+                                      offload=True)
+        task.cancel()
+        return converged, diverged, offloaded, ticks
+
+    converged, diverged, offloaded, ticks = asyncio.run(main())
+
+    assert converged.converged
+    assert not diverged.converged and not offloaded.converged
+    assert diverged.elapsed < 1 and offloaded.elapsed < 1
+    assert diverged.error <= abs(0.5**2 + 1)
+    assert ticks > 1
+
+    assert converged.reason == 'converged'
+    assert diverged.reason == offloaded.reason == 'deadline'
+    limited = asyncio.run(solve_async('x**2 + 1', 0.5, 'sne_fd_4',
+                                      max_iter=5))
+    assert limited.reason == 'iteration limit'
+
+
+def test_find_roots():
+    roots = find_roots('np.sin(x)', -10, 10)
+    assert np.allclose(roots, np.pi * np.arange(-3, 4))
+
+    roots = find_roots('(x - 1) * (x - 2) * (x - 3)', 0, 4, method='sne_ud_3')
+    assert np.allclose(roots, [1, 2, 3])
+
+    # Sign changes at poles are not roots
+    assert find_roots('1 / x', -1, 1.3).size == 0
+
+    roots = find_roots('np.sin(50 * x)', 0, 100, points=10**6)
+    assert roots.size == 1592 and np.all(np.abs(np.sin(50 * roots)) < 1e-11)
+
+
+def test_polynomial_roots():
+    assert polynomial_coefficients('(x - 1) * (x + 2) * x') == (1, 1, -2, 0)
+    assert polynomial_coefficients('np.cos(x)') is None
+    assert polynomial_coefficients('1 / x') is None
+
+    fx = compile_function('x**5 - 3*x**4 + 2*x**2 - 7')
+    assert fx.coefficients == (1, -3, 0, 2, 0, -7)
+    assert abs(fx(1.5) - (1.5**5 - 3 * 1.5**4 + 2 * 1.5**2 - 7)) < 1e-12
+
+    assert compile_function('-0.5*x**3 + x - 2').coefficients == (-0.5, 0, 1,
+                                                                   -2)
+
+    # Factored polynomials keep their form (expanded they lose accuracy)
+    assert not hasattr(compile_function('(x - 2)**9'), 'coefficients')
+    for method in ('sne_fd_3', 'sne_fd_4'):
+        assert solve('(x - 2)**9', 2.5, method, 1e-12).converged
+
+    for method in ('aberth', 'companion'):
+        z = roots('x**4 - 1', method)
+        assert np.allclose(z, [-1, -1j, 1j, 1])
+
+    coefficients = np.random.default_rng(0).normal(size=21)
+    f = ' + '.join('({!r}) * x**{}'.format(c, 20 - k)
+                   for k, c in enumerate(coefficients))
+    z = roots(f)
+    assert z.size == 20
+    assert np.allclose(np.abs(np.polyval(coefficients, z)), 0, atol=1e-8)
+
+
+def test_solve_safe():
+    # Chebyshev divides by zero at f'(0) = 0, the bracket recovers it
+    result = solve('x**2 - 2', 0.0, 'sne_ud_3')
+    assert not result.converged and result.reason == 'division by zero'
+
+    result = solve_safe('x**2 - 2', 0.0, 'sne_ud_3')
+    assert result.converged and abs(abs(result.root) - np.sqrt(2)) < 1e-12
+    assert result.reason == 'bracketed after division by zero'
+
+    # Without real roots the solve gives up after a few evaluations
+    result = solve_safe('x**2 + 1', 0.5, 'sne_fd_4')
+    assert not result.converged and result.evaluations < 100
+    assert result.reason == 'stagnated, no bracket'
+
+    assert solve_safe('np.cos(2 * x)**2 - x**2', 3 / 4).reason == 'converged'
+
+
+def test_solve_cached(tmp_path):
+    assert memo_canonical('cos(2*x)^2-x^2') == memo_canonical(
+        'np.cos(2 * x)**2 - x**2')
+
+    path = str(tmp_path / 'results.db')
+    cache = ResultCache(path=path)
+    first = solve_cached('cos(2*x)^2-x^2', 3 / 4, cache=cache)
+    second = solve_cached('np.cos(2 * x)**2 - x**2', 3 / 4, cache=cache)
+
+    assert first.converged and first == second
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert solve_cached('x**2 - 2', 1.0, cache=cache) != first
+
+    # The disk cache survives the process, the TTL makes entries expire
+    disk = ResultCache(path=path)
+    assert solve_cached('np.cos(2*x)**2 - x**2', 3 / 4, cache=disk) == first
+    assert disk.hits == 1
+
+    expired = ResultCache(ttl=-1)
+    solve_cached('x**2 - 2', 1.0, cache=expired)
+    solve_cached('x**2 - 2', 1.0, cache=expired)
+    assert expired.hits == 0
+
+
+def test_solve_continuation():
+    a = np.linspace(1, 3, 200)
+    func = 'np.cos(a * x)**2 - x**2'
+
+    for chunk in (1, 20):
+        roots, _iter, converged = solve_continuation(func, 'a', a, 3 / 4,
+                                                     'sne_ud_3', chunk=chunk)
+        assert converged.all()
+        assert np.all(np.abs(np.cos(a * roots)**2 - roots**2) <= 1e-12)
+
+    # Warm starts need about one iteration per value
+    roots, _iter, converged = solve_continuation(func, 'a', a, 3 / 4,
+                                                 'sne_fd_4')
+    assert converged.all() and _iter[1:].max() <= 2
+
+    # The dual backend knows every function of the expressions
+    x = np.array([1.0, 1.5])
+    for name, names in FUNCTIONS_BY_NAME.items():
+        argument = '1 + x' if name == 'arccosh' else '0.25 * x'
+        arguments = ', '.join([argument] * names[3])
+        fx = compile_expression('{}({})'.format(name, arguments))
+        dual = Differentiable(fx, 'dual').derivatives(x, 3)
+        symbolic = Differentiable(fx, 'symbolic').derivatives(x, 3)
+        for n in range(4):
+            assert np.allclose(dual[n], symbolic[n], rtol=1e-10)
+
+    roots, _iter, converged = solve_continuation('np.cbrt(a*x) - 1', 'a',
+                                                 [1, 2, 3], 1.0)
+    assert converged.all() and np.allclose(roots, [1, 1 / 2, 1 / 3])
+
+
+def test_benchmark():
+    report = run_benchmark(FUNCTIONS[1:2], ['sne_ud_5', 'sne_fd_2'], repeat=1)
+    print(summary(report))
+
+    cases = json.loads(json.dumps(report))['cases']
+    assert len(cases) == 2 * len(FUNCTIONS[1][3])
+
+    for case in cases:
+        assert case['converged'] and case['root_error'] < 1e-12
+        assert abs(case['order'] - case['theoretical_order']) < 0.5
+
+    assert all(case['derivative_evaluations'] == 0 for case in cases
+               if case['method'] == 'sne_fd_2')
+
+    # The evaluations of the sne_* functions
+    jain = run_benchmark(FUNCTIONS[1:2], ['sne_fd_3'], repeat=1)['cases']
+    for case in jain:
+        _, _iter, evaluations = sne_fd_3(case['expression'], case['x0'],
+                                         report['tol'], 0, 1)
+        assert case['function_evaluations'] == evaluations
+
+    # The same evaluations as solve
+    for case in cases:
+        result = solve(case['expression'], case['x0'], case['method'],
+                       report['tol'])
+        assert (case['function_evaluations'] +
+                case['derivative_evaluations'] == result.evaluations)
+
+
+def test_solve_system():
+    equations = ['x**2 + y**2 - 4', 'x*y - 1']
+    root = np.array([1.9318516525781366, 0.5176380902050415])
+
+    for method in ('newton', 'broyden'):
+        for jacobian in ('symbolic', 'dual', 'finite'):
+            result = solve_system(equations, ['x', 'y'], [2, 0.5], method,
+                                  jacobian=jacobian)
+            assert result.converged and np.allclose(result.root, root)
+
+    # Broyden's tridiagonal function: a sparse Jacobian factorized once
+    n = 200
+    names = ['v{}'.format(i) for i in range(n)]
+    equations = ['(3 - 2*{1})*{1} - {0} - 2*{2} + 1'.format(*(
+        ['0'] + names + ['0'])[i:i + 3]) for i in range(n)]
+
+    newton = solve_system(equations, names, -np.ones(n), sparse=True)
+    broyden = solve_system(equations, names, -np.ones(n), 'broyden',
+                           sparse=True)
+    assert newton.converged and broyden.converged
+    assert np.allclose(newton.root, broyden.root)
+    assert broyden.jacobians == 1 < newton.jacobians
+
+    # A singular Jacobian stops the solve (dense or sparse) without raising
+    for method in ('newton', 'broyden'):
+        for sparse in (False, True):
+            result = solve_system(['x**2 - 1', 'y'], ['x', 'y'], [0, 0],
+                                  method, sparse=sparse)
+            assert not result.converged
+
+    try:
+        solve_system(['x + z', 'y'], ['x', 'y'], [1, 1])
+        assert False
+    except ValueError as e:
+        assert 'unknown symbol' in str(e)
+
+
+def test_basin_map(tmp_path):
+    basins = basin_map('x**3 - 1', 'sne_ud_1', size=(64, 48), processes=1)
+    assert basins.labels.shape == basins.iterations.shape == (48, 64)
+    assert np.allclose(np.sort_complex(basins.roots**3), [1, 1, 1])
+    assert basin_statistics(basins)['converged'] > 0.99
+
+    # Start points on the real axis right of 0 reach the real root
+    real = np.argmin(np.abs(basins.roots - 1))
+    row = np.argmin(np.abs(basins.im))
+    assert np.all(basins.labels[row, basins.re > 0.1] == real)
+
+    path = str(tmp_path / 'basins.npz')
+    maps = basin_maps('np.cos(x) - x', ['sne_ud_1', 'sne_fd_4'], path,
+                      size=32, processes=2)
+    loaded = load_basins(path)
+    assert set(loaded) == {'sne_ud_1', 'sne_fd_4'}
+    for method, basins in maps.items():
+        assert np.array_equal(loaded[method].labels, basins.labels)
+        assert np.array_equal(loaded[method].roots, basins.roots)
+        assert loaded[method].f == 'np.cos(x) - x'
+
+
+def test_kernels(monkeypatch):
+    f = 'np.cos(2 * x)**2 - x**2'
+
+    # The generated kernels run as plain Python too, step by step like the
+    # registered methods
+    for name, method in METHODS.items():
+        if method.init is None:
+            kernel = compile_kernel(f, name, jit=False)
+            result = solve(f, 0.75, name, 1e-14)
+            assert kernel.solve(0.75, 1e-14) == (result.root,
+                                                 result.iterations,
+                                                 result.error)
+
+    kernel = compile_kernel('x**3 - 1', 'sne_ud_3', jit=False)
+    xAprox, _iter, error = kernel.batch([[0.5, 2.0], [3.0, 0.0]], 1e-12)
+    assert xAprox.shape == (2, 2) and np.allclose(xAprox[error <= 1e-12], 1)
+    assert np.isnan(xAprox[1, 1])
+
+    # Native when Numba is installed, interpreted otherwise
+    result = solve_jit(f, 0.75, 'sne_fd_4', 1e-14)
+    assert result.converged and abs(result.root - 0.5149332646611294) < 1e-14
+    xAprox, _iter, converged = batch_jit(f, [0.75, 1.0], 1e-14, 'sne_fd_4')
+    assert converged.all() and np.allclose(xAprox, 0.5149332646611294)
+
+    if not jit_available():
+        try:
+            compile_kernel(f)
+            assert False
+        except ValueError as e:
+            assert 'numba' in str(e)
+
+    # Numba reports typing errors on the first call of a kernel: they must
+    # happen while it is built, so the solvers can fall back
+    class Numba:
+        prange = range
+
+        @staticmethod
+        def njit(function, **options):
+            def compiled(*args):
+                raise TypeError('cannot determine Numba type')
+            return compiled
+
+    monkeypatch.setattr(kernels, '_numba', lambda: Numba)
+    result = solve_jit(f, 0.75, 'sne_fd_4', 1e-14)
+    assert result.converged and abs(result.root - 0.5149332646611294) < 1e-14
+    xAprox, _iter, converged = batch_jit(f, [0.75, 1.0], 1e-14, 'sne_fd_4')
+    assert converged.all()
+
+
+def test_metrics(tmp_path):
+    func = 'np.cos(2 * x)**2 - x**2'
+    metrics.enable(reset=True)
+    try:
+        _, _, evaluations = sne_fd_3(func, 3 / 4, 1e-14, 0, 1)
+        sne_ud_3(func, 3 / 4, 1e-14, 0, 'symbolic')
+    finally:
+        metrics.disable()
+    sne_fd_3(func, 3 / 4, 1e-14, 0)
+
+    series = {(entry['name'], tuple(sorted(entry['labels'].items()))): entry
+              for entry in metrics.snapshot()}
+
+    solves = series['solne_solve_seconds', (('method', 'sne_fd_3'),)]
+    assert solves['count'] == 1 and solves['counts'][-1] == 1
+
+    evaluated = series['solne_evaluations', (('kind', 'function'),
+                                             ('method', 'sne_fd_3'))]
+    assert evaluated['sum'] == evaluations
+    assert series['solne_evaluations', (('kind', 'derivative'),
+                                        ('method', 'sne_ud_3'))]['sum'] > 0
+
+    # The phases of a solve add up to its time
+    phases = sum(entry['sum'] for (name, labels), entry in series.items()
+                 if name == 'solne_phase_seconds' and
+                 ('method', 'sne_ud_3') in labels)
+    total = series['solne_solve_seconds', (('method', 'sne_ud_3'),)]['sum']
+    assert abs(phases - total) < 1e-6
+
+    text = metrics.to_prometheus()
+    assert '# TYPE solne_phase_seconds histogram' in text
+    assert ('solne_solve_seconds_count{method="sne_fd_3"} 1' in text)
+    assert 'le="+Inf"' in text
+
+    path = metrics.export(str(tmp_path / 'metrics.json'))
+    with open(path) as file:
+        assert len(json.load(file)['metrics']) == len(series)
+
+
+def test_history():
+    history = History(0.0, 1.0, capacity=1)
+    for k in range(1, 100):
+        history.append(k, 1 / (k + 1))
+
+    assert len(history) == 100
+    assert np.array_equal(history.x, np.arange(100))
+    assert history.error[-1] == 1 / 100
+
+    skipped = History(0.0, 1.0, enabled=False)
+    skipped.append(1.0, 0.5)
+    assert len(skipped) == 2 and skipped.error.size == 0
+
+
 if __name__ == '__main__':
     x0 = 3 / 4
     tol = 0.000001
@@ -1,22 +1,43 @@
 # =========== Important: ¡must install Sympy! (pip install sympy) ============
-import matplotlib.pyplot as plt
-import numpy as np
-from scipy import misc
-from sympy import *
+
+from derivative import Differentiable
+from expression import symbolic_expression
+from history import History
+from metrics import instrumented
+from plot import Trace, plot_convergence
+from polynomial import compile_function
+from precision import solve_precision
 
 
 # ========================== Global variables ================================
-global x                                    # x (is a global symbol)
 global ITER_LIMIT                           # Limit of iterations
 global DECIMAL_PRECISION                    # Amount of decimal values
 
-x = symbols('x')
 ITER_LIMIT = 10000
 DECIMAL_PRECISION = 50
 
 
+def __getattr__(name):
+    """
+    Sympy (and the global symbol x) used to be star imported here; it is now
+    only imported the first time one of its names is requested, so the
+    numeric methods don't pay for it
+    """
+    if name.startswith('__'):
+        raise AttributeError(name)
+
+    import sympy
+    if name == 'x':
+        return sympy.symbols('x')
+    if hasattr(sympy, name):
+        return getattr(sympy, name)
+    raise AttributeError(
+        'module {!r} has no attribute {!r}'.format(__name__, name))
+
+
 # ============================== Method 1 ====================================
-def sne_ud_1(f, x0, tol, graf):
+@instrumented
+def sne_ud_1(f, x0, tol, graf, precision='float'):
     """Halley's Method
 
     Arguments:
@@ -24,53 +45,45 @@ def sne_ud_1(f, x0, tol, graf):
         x0 {float, int} -- initial value to start iterations
         tol {float, int} -- tolerance that indicates the stop condition
         graf {int} -- flag that indicates if a graph must be done
+        precision {string, int} -- 'float' (float64), 'auto' (float64
+            polished with DECIMAL_PRECISION digits) or an amount of digits
 
     Returns:
-        xAprox {float} -- root approximation
+        xAprox {float, Float} -- root approximation
         _iter {int} -- amount of iterations required
     """
 
     # -------------------------- Validations ---------------------------------
     if (validator(f, x0, tol) != True):
         return x0, 0
-    # ------------------------ Local variables -------------------------------
-    funct = sympify(f)                      # Transforms string to function
-    _iter = 0                               # Amount of iterations
-    xAprox = sympify(x0)                    # xAprox is a Sympy variable
-    xNext = sympify(0)                      # xNext (x_(n+1))
-    error = abs(funct.subs(x, xAprox))      # calculates the error of x0
+    # ---------------------- Halley's Method ---------------------------------
+    return solve_precision(halley_update, f, x0, tol, 2, precision,
+                           ITER_LIMIT, DECIMAL_PRECISION)
 
-    try:
-        # ---------------------- Halley's Method -----------------------------
-        while (error > tol):
-            if(_iter >= ITER_LIMIT):
-                print("WARNING: Iteration limit reached")
-                return N(xAprox, DECIMAL_PRECISION), _iter
-            fDiff = diff(f, x)              # First derivative
-            fDiff2 = diff(fDiff, x)         # Second derivative
-            div = (2*(fDiff.subs(x, xAprox))*(fDiff.subs(x, xAprox)) -
-                   funct.subs(x, xAprox)*fDiff2.subs(x, xAprox))
-            if (div != 0):
-                xNext = xAprox - (2*(funct.subs(x, xAprox))
-                                  * (fDiff.subs(x, xAprox))) / div
-            else:
-                print("WARNING: [Math error] Division by zero")
-                return N(xAprox, DECIMAL_PRECISION), _iter
-            xAprox = N(xNext, DECIMAL_PRECISION)
-            error = abs(funct.subs(x, xAprox))
-            _iter += 1                      # New iteration
-        graph = 1                           # Graph can be displayed
 
-    except Exception as exception:
-        print("WARNING: [Math error]", type(
-            exception).__name__, "-", str(exception))
+def halley_update(functions, xAprox):
+    """
+    One iteration of Halley's Method
 
-    return N(xAprox, DECIMAL_PRECISION), _iter
+    Arguments:
+        functions {tuple} -- lambdified f, f' and f''
+        xAprox {float, mpf} -- current iterate
+
+    Returns:
+        xNext {float, mpf} -- next iterate
+    """
+    funct, fDiff, fDiff2 = functions
+    fx = funct(xAprox)
+    df = fDiff(xAprox)                      # First derivative
+    df2 = fDiff2(xAprox)                    # Second derivative
+
+    return xAprox - (2*fx*df) / (2*df*df - fx*df2)
 
 # ============================== Method 2 ====================================
 
 
-def sne_ud_2(f, x0, tol, graf):
+@instrumented
+def sne_ud_2(f, x0, tol, graf, precision='float'):
     """Frontini's y Sormani's Method
 
     Arguments:
@@ -78,57 +91,43 @@ def sne_ud_2(f, x0, tol, graf):
         x0 {float, int} -- initial value to start iterations
         tol {float, int} -- tolerance that indicates the stop condition
         graf {int} -- flag that indicates if a graph must be done
+        precision {string, int} -- 'float' (float64), 'auto' (float64
+            polished with DECIMAL_PRECISION digits) or an amount of digits
 
     Returns:
-        xAprox {float} -- root approximation
+        xAprox {float, Float} -- root approximation
         _iter {int} -- amount of iterations required
     """
 
     # -------------------------- Validations ---------------------------------
     if (validator(f, x0, tol) != True):
         return x0, 0
-    # ------------------------ Local variables -------------------------------
-    funct = sympify(f)                      # Transforms string to function
-    _iter = 0                               # Amount of iterations
-    xAprox = sympify(x0)                    # xAprox is a Sympy variable
-    xNext = sympify(0)                      # xNext (x_(n+1))
-    error = abs(funct.subs(x, xAprox))      # calculates the error of x0
+    # ---------------- Frontini's y Sormani's Method -------------------------
+    return solve_precision(frontini_sormani_update, f, x0, tol, 1, precision,
+                           ITER_LIMIT, DECIMAL_PRECISION)
 
-    try:
-        # ---------------- Frontini's y Sormani's Method ---------------------
-        while (error > tol):
-            if(_iter >= ITER_LIMIT):
-                print("WARNING: Iteration limit reached")
-                return N(xAprox, DECIMAL_PRECISION), _iter
-            fDiff = diff(f, x)
-            div = fDiff.subs(x, xAprox)
-            if (div != 0):
-                div2 = fDiff.subs(
-                    x, (xAprox - 0.5 * funct.subs(x, xAprox)/div))
-                if (div2 != 0):
-                    xNext = xAprox - (funct.subs(x, xAprox) / div2)
-                else:
-                    print("WARNING: [Math error] Division by zero")
-                    return N(xAprox, DECIMAL_PRECISION), _iter
-            else:
-                print("WARNING: [Math error] Division by zero")
-                return N(xAprox, DECIMAL_PRECISION), _iter
-
-            xAprox = N(xNext, DECIMAL_PRECISION)
-            error = abs(funct.subs(x, xAprox))
-            _iter += 1                      # New iteration
-        graph = 1                           # Graph can be displayed
 
-    except Exception as exception:
-        print("WARNING: [Math error]", type(
-            exception).__name__, "-", str(exception))
+def frontini_sormani_update(functions, xAprox):
+    """
+    One iteration of Frontini's y Sormani's Method
 
-    return N(xAprox, DECIMAL_PRECISION), _iter
+    Arguments:
+        functions {tuple} -- lambdified f and f'
+        xAprox {float, mpf} -- current iterate
+
+    Returns:
+        xNext {float, mpf} -- next iterate
+    """
+    funct, fDiff = functions
+    fx = funct(xAprox)
+
+    return xAprox - fx / fDiff(xAprox - 0.5 * fx / fDiff(xAprox))
 
 # ============================== Method 3 ====================================
 
 
-def sne_ud_3(f, x0, tol, graf=1):
+@instrumented
+def sne_ud_3(f, x0, tol, graf=1, derivative='auto'):
     """
     Chebyshev Method
 
@@ -140,6 +139,8 @@ def sne_ud_3(f, x0, tol, graf=1):
         x0 {float, int} - initial value to start iterations
         tol {float, int} - tolerance that indicates the stop condition
         graf {int} - flag that indicates if a graf must be done
+        derivative {string} - derivative backend: 'auto', 'symbolic', 'dual'
+                              or 'finite' (see derivative.Differentiable)
 
     Returns:
 
@@ -158,43 +159,57 @@ def sne_ud_3(f, x0, tol, graf=1):
     if (graf != 0 and graf != 1):
         raise ValueError('graf must be 0 or 1')
 
-    xAprox = np.array([x0])
+    xAprox = x0
     _iter = 0
 
     try:
-        fx = lambda x: eval(f)
-        error = np.array([abs(fx(xAprox[-1]))])
-
-        while (abs(fx(xAprox[-1])) > tol):
-            xk = xAprox[-1]
-
-            y = fx(xk)
-            df = misc.derivative(fx, xk, dx=1e-6)
-            df2 = misc.derivative(fx, xk, n=2, dx=1e-6)
-
-            Lf = y * df2 / df**2
+        fx = Differentiable(compile_function(f), derivative)
+        error = abs(fx(xAprox))
+        history = History(xAprox, error, graf == 1)
 
-            xk_next = xk - (1 + 0.5 * Lf) * y / df
-
-            xAprox = np.append(xAprox, xk_next)
-            error = np.append(error, abs(fx(xk_next)))
+        while (error > tol):
+            xAprox = chebyshev_step(fx, xAprox)
+            error = abs(fx(xAprox))
 
+            history.append(xAprox, error)
             _iter += 1
 
         if graf == 1:
-            k = np.linspace(0, _iter, _iter + 1)
-            plotFunction(k, error, 'Chebyshev Method')
+            plot_convergence(Trace('Chebyshev Method', history.x,
+                                   history.error), image=False)
 
-        return xAprox[-1], _iter
+        return xAprox, _iter
     except AttributeError as e:
         raise ValueError('f has an unknown function. ' + str(e).capitalize())
     except TypeError as e:
         raise ValueError('f has an unknown symbol. ' + str(e).capitalize())
 
+
+def chebyshev_step(fx, xk):
+    """
+    One iteration of Chebyshev Method. xk can be a float or a numpy array of
+    iterates, which are updated element-wise
+
+    Arguments:
+
+        fx {Differentiable} - function f(x) with its derivatives
+        xk {float, ndarray} - current iterate
+
+    Returns:
+
+        xk_next {float, ndarray} - next iterate
+    """
+    y, df, df2 = fx.derivatives(xk, 2)
+
+    Lf = y * df2 / df**2
+
+    return xk - (1 + 0.5 * Lf) * y / df
+
 # ============================== Method 4 ====================================
 
 
-def sne_ud_4(f, x0, tol, graf=1):
+@instrumented
+def sne_ud_4(f, x0, tol, graf=1, derivative='auto'):
     """
     Newton-Secant Method
 
@@ -204,6 +219,8 @@ def sne_ud_4(f, x0, tol, graf=1):
         x0 {float, int} - initial value to start iterations
         tol {float, int} - tolerance that indicates the stop condition
         graf {int} - flag that indicates if a graf must be done
+        derivative {string} - derivative backend: 'auto', 'symbolic', 'dual'
+                              or 'finite' (see derivative.Differentiable)
 
     Returns:
 
@@ -222,41 +239,56 @@ def sne_ud_4(f, x0, tol, graf=1):
     if (graf != 0 and graf != 1):
         raise ValueError('graf must be 0 or 1')
 
-    xAprox = np.array([x0])
+    xAprox = x0
     _iter = 0
 
     try:
-        fx = lambda x: eval(f)
-        error = np.array([abs(fx(xAprox[-1]))])
-
-        while (abs(fx(xAprox[-1])) > tol):
-            xk = xAprox[-1]
-
-            y = fx(xk)
-            df = misc.derivative(fx, xk, dx=1e-6)
-            yk = xk - y / df
+        fx = Differentiable(compile_function(f), derivative)
+        error = abs(fx(xAprox))
+        history = History(xAprox, error, graf == 1)
 
-            xk_next = xk - (y / (y - fx(yk))) * y / df
-
-            xAprox = np.append(xAprox, xk_next)
-            error = np.append(error, abs(fx(xk_next)))
+        while (error > tol):
+            xAprox = newton_secant_step(fx, xAprox)
+            error = abs(fx(xAprox))
 
+            history.append(xAprox, error)
             _iter += 1
 
         if graf == 1:
-            k = np.linspace(0, _iter, _iter + 1)
-            plotFunction(k, error, 'Newton-Secant Method')
+            plot_convergence(Trace('Newton-Secant Method', history.x,
+                                   history.error), image=False)
 
-        return xAprox[-1], _iter
+        return xAprox, _iter
     except AttributeError as e:
         raise ValueError('f has an unknown function. ' + str(e).capitalize())
     except TypeError as e:
         raise ValueError('f has an unknown symbol. ' + str(e).capitalize())
 
+
+def newton_secant_step(fx, xk):
+    """
+    One iteration of Newton-Secant Method. xk can be a float or a numpy array
+    of iterates, which are updated element-wise
+
+    Arguments:
+
+        fx {Differentiable} - function f(x) with its derivatives
+        xk {float, ndarray} - current iterate
+
+    Returns:
+
+        xk_next {float, ndarray} - next iterate
+    """
+    y, df = fx.derivatives(xk, 1)
+    yk = xk - y / df
+
+    return xk - (y / (y - fx(yk))) * y / df
+
 # ============================== Method 5 ====================================
 
 
-def sne_ud_5(f, x0, tol, graf=1):
+@instrumented
+def sne_ud_5(f, x0, tol, graf=1, derivative='auto'):
     """
     Danby Burkardt Method
 
@@ -268,6 +300,8 @@ def sne_ud_5(f, x0, tol, graf=1):
         x0 {float, int} - initial value to start iterations
         tol {float, int} - tolerance that indicates the stop condition
         graf {int} - flag that indicates if a graf must be done
+        derivative {string} - derivative backend: 'auto', 'symbolic', 'dual'
+                              or 'finite' (see derivative.Differentiable)
 
     Returns:
 
@@ -286,46 +320,59 @@ def sne_ud_5(f, x0, tol, graf=1):
     if (graf != 0 and graf != 1):
         raise ValueError('graf must be 0 or 1')
 
-    xAprox = np.array([x0])
+    xAprox = x0
     _iter = 0
 
     try:
-        fx = lambda x: eval(f)
-        error = np.array([abs(fx(xAprox[-1]))])
-
-        while (abs(fx(xAprox[-1])) > tol):
-            xk = xAprox[-1]
-
-            yk = fx(xk)
-            df = misc.derivative(fx, xk, dx=1e-6)
-            df2 = misc.derivative(fx, xk, n=2, dx=1e-6)
-            df3 = misc.derivative(fx, xk, n=3, order=5, dx=1e-6)
+        fx = Differentiable(compile_function(f), derivative)
+        error = abs(fx(xAprox))
+        history = History(xAprox, error, graf == 1)
 
-            Lf = yk * df2 / df**2
-            Ldf = df * df3 / df2**2
-
-            xk_next = xk - 1.5 * ((2 - Lf)**2 /
-                                  (6 - 9 * Lf + 3 * Lf**2 + Lf**2 * Ldf)) * (yk / df)
-
-            xAprox = np.append(xAprox, xk_next)
-            error = np.append(error, abs(fx(xk_next)))
+        while (error > tol):
+            xAprox = danby_burkardt_step(fx, xAprox)
+            error = abs(fx(xAprox))
 
+            history.append(xAprox, error)
             _iter += 1
 
         if graf == 1:
-            k = np.linspace(0, _iter, _iter + 1)
-            plotFunction(k, error, 'Danby Burkardt Method')
+            plot_convergence(Trace('Danby Burkardt Method', history.x,
+                                   history.error), image=False)
 
-        return xAprox[-1], _iter
+        return xAprox, _iter
     except AttributeError as e:
         raise ValueError('f has an unknown function. ' + str(e).capitalize())
     except TypeError as e:
         raise ValueError('f has an unknown symbol. ' + str(e).capitalize())
 
+
+def danby_burkardt_step(fx, xk):
+    """
+    One iteration of Danby Burkardt Method. xk can be a float or a numpy array
+    of iterates, which are updated element-wise
+
+    Arguments:
+
+        fx {Differentiable} - function f(x) with its derivatives
+        xk {float, ndarray} - current iterate
+
+    Returns:
+
+        xk_next {float, ndarray} - next iterate
+    """
+    yk, df, df2, df3 = fx.derivatives(xk, 3)
+
+    Lf = yk * df2 / df**2
+    Ldf = df * df3 / df2**2
+
+    return xk - 1.5 * ((2 - Lf)**2 /
+                       (6 - 9 * Lf + 3 * Lf**2 + Lf**2 * Ldf)) * (yk / df)
+
 # ============================== Method 6 ====================================
 
 
-def sne_ud_6(f, x0, tol, graf=1):
+@instrumented
+def sne_ud_6(f, x0, tol, graf=1, derivative='auto'):
     """
     Richmond Method
 
@@ -340,6 +387,8 @@ def sne_ud_6(f, x0, tol, graf=1):
         x0 {float, int} - initial value to start iterations
         tol {float, int} - tolerance that indicates the stop condition
         graf {int} - flag that indicates if a graf must be done
+        derivative {string} - derivative backend: 'auto', 'symbolic', 'dual'
+                              or 'finite' (see derivative.Differentiable)
 
     Returns:
 
@@ -358,38 +407,51 @@ def sne_ud_6(f, x0, tol, graf=1):
     if (graf != 0 and graf != 1):
         raise ValueError('graf must be 0 or 1')
 
-    xAprox = np.array([x0])
+    xAprox = x0
     _iter = 0
 
     try:
-        fx = lambda x: eval(f)
-        error = np.array([abs(fx(xAprox[-1]))])
-
-        while (abs(fx(xAprox[-1])) > tol):
-            xk = xAprox[-1]
-
-            yk = fx(xk)
-            df = misc.derivative(fx, xk, dx=1e-6)
-            df2 = misc.derivative(fx, xk, n=2, dx=1e-6)
-            zk = -yk / df
+        fx = Differentiable(compile_function(f), derivative)
+        error = abs(fx(xAprox))
+        history = History(xAprox, error, graf == 1)
 
-            xk_next = xk - yk * (df + 0.5 * zk * df2)**-1
-
-            xAprox = np.append(xAprox, xk_next)
-            error = np.append(error, abs(fx(xk_next)))
+        while (error > tol):
+            xAprox = richmond_step(fx, xAprox)
+            error = abs(fx(xAprox))
 
+            history.append(xAprox, error)
             _iter += 1
 
         if graf == 1:
-            k = np.linspace(0, _iter, _iter + 1)
-            plotFunction(k, error, 'Newton-Secant Method')
+            plot_convergence(Trace('Newton-Secant Method', history.x,
+                                   history.error), image=False)
 
-        return xAprox[-1], _iter
+        return xAprox, _iter
     except AttributeError as e:
         raise ValueError('f has an unknown function. ' + str(e).capitalize())
     except TypeError as e:
         raise ValueError('f has an unknown symbol. ' + str(e).capitalize())
 
+
+def richmond_step(fx, xk):
+    """
+    One iteration of Richmond Method. xk can be a float or a numpy array of
+    iterates, which are updated element-wise
+
+    Arguments:
+
+        fx {Differentiable} - function f(x) with its derivatives
+        xk {float, ndarray} - current iterate
+
+    Returns:
+
+        xk_next {float, ndarray} - next iterate
+    """
+    yk, df, df2 = fx.derivatives(xk, 2)
+    zk = -yk / df
+
+    return xk - yk * (df + 0.5 * zk * df2)**-1
+
 # =========================== Auxiliary functions =============================
 
 
@@ -419,7 +481,7 @@ def validator(f, x0, tol):
         return False
 
     try:
-        f = sympify(f)
+        f = symbolic_expression(f)
     except Exception as exception:
         print("WARNING: [invalid expression]: ", type(
             exception).__name__, "-", str(exception))
@@ -429,20 +491,19 @@ def validator(f, x0, tol):
 
 def plotFunction(k, error, title):
     """
-    This function is used to plot iterations vs error
+    This function is used to plot iterations vs error. The plot is drawn
+    in the background (see plot.plot_convergence) instead of being shown,
+    so it doesn't block (or need a display)
 
     Arguments:
 
-        k {iterable} - an iterable with x axis values
+        k {iterable} - an iterable with x axis values (the iterations)
         error {iterable} - an iterable with y axis values
         title {string} - plot title
 
     Returns:
 
-        This function doesn't return
+        future {Future} - its result is the image, or its path when
+                          plot.PLOT_DIRECTORY is set
     """
-    plt.title(title)
-    plt.xlabel('Iterations k')
-    plt.ylabel('Error |f(xk)|')
-    plt.plot(k, error)
-    plt.show()
+    return plot_convergence(Trace(title, None, error))